@@ -0,0 +1,210 @@
+# Build_Pipeline_Benchmark.py
+# This file times each phase of the database build against synthetic mockups of several sizes
+# Copyright (C) 2022, PICMG
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import json
+import time
+import pathlib
+import argparse
+import platform
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import initializeRedfishServer
+import Synthetic_Mockup
+
+baseline_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+benchmark_database = 'RedfishBenchmarkDB'
+
+# the phases of the build that are timed, in the order that the build runs them, for each build
+# engine
+phases = {
+    'serial': [
+        ('mockups', 'download_and_initialize_redfish_mockups'),
+        ('schema_cache', 'generate_schema_cache_and_security_table'),
+        ('schema_version_index', 'generate_schema_version_index'),
+        ('indexes', 'create_indexes'),
+    ],
+    'async': [
+        ('pipeline', 'run_async_build'),
+        ('schema_version_index', 'generate_schema_version_index'),
+        ('indexes', 'create_indexes'),
+    ],
+}
+
+
+# The below function returns a RedfishDbBuilder that builds the benchmark database from the
+# synthetic bundles in a folder.  The bundles are fetched through the artifact cache with file
+# urls, so the download phase reads them without network access.  client is the MongoClient of the
+# benchmark database, or None to open one from the configuration.
+def configure_build(config, bundle_folder, work_folder, client=None):
+    build_options = dict(config.get('build_options', {}))
+    if client is not None:
+        # the in-process stand-in has no async api, so the async build engine writes in threads
+        build_options['async_driver'] = 'threads'
+    build_options.update({'incremental': False, 'staged': False, 'offline': False, 'update_lockfile': False,
+                          'artifact_cache_dir': os.path.join(work_folder, 'cache'),
+                          'artifact_lockfile': os.path.join(work_folder, 'artifacts.lock.json'),
+                          'metrics_file': '', 'metrics_textfile': ''})
+    bundle_url = pathlib.Path(bundle_folder).absolute().as_uri() + '/'
+    credentials = json.loads(json.dumps(config['credentials']))
+    credentials['redfish_creds'].update({'mockup_url': bundle_url, 'mockup_file_name': 'DSP2043_2022.2',
+                                         'privilege_file_name': 'DSP8011_2022.2', 'mockup_dir_name': 'public-rackmount1'})
+    credentials['schema_bundle_url'] = bundle_url + 'DSP8010_2023.2.zip'
+    return initializeRedfishServer.RedfishDbBuilder(
+        {'mockup_file_path': '', 'local_schema_path': '', 'build_options': build_options, 'credentials': credentials},
+        client, benchmark_database)
+
+
+# The below function builds the benchmark database from the synthetic bundles in a folder and
+# returns the build metrics report.  When in_process is set, the database is built with mongomock
+# in place of a server, and phases that the in-process stand-in does not support (for example,
+# aggregation stages that it does not implement) are recorded as skipped.  A report with skipped
+# phases is marked as not valid, since its timings cannot be compared with a complete build.
+def run_build(config, bundle_folder, work_folder, in_process=False):
+    client = None
+    if in_process:
+        import mongomock
+        client = mongomock.MongoClient()
+    builder = configure_build(config, bundle_folder, work_folder, client)
+    builder.get_mongo_client().drop_database(benchmark_database)
+    skipped = []
+    for name, function_name in phases[builder.get_build_option('build_engine', 'serial')]:
+        try:
+            with builder.build_phase(name):
+                getattr(builder, function_name)()
+        except (NotImplementedError, initializeRedfishServer.pymongo.errors.OperationFailure) as e:
+            if not in_process:
+                raise
+            skipped.append(name)
+            print('Skipped phase', name, ':', e)
+    database = builder.get_mongo_database()
+    report = builder.metrics.report()
+    report['skipped_phases'] = skipped
+    report['valid'] = not skipped
+    report['resource_count'] = database['RedfishObject'].count_documents({})
+    builder.get_mongo_client().drop_database(benchmark_database)
+    builder.close()
+    return report
+
+
+# The below function prints the timings of a build report
+def print_report(size, report):
+    print('%d resources (%d loaded), %.3f s, peak rss %s bytes' % (
+        size, report['resource_count'], report['wall_seconds'], report['peak_rss_bytes']))
+    for phase in report['phases']:
+        print('    %-32s %10.3f s wall %10.3f s cpu' % (phase['phase'], phase['wall_seconds'], phase['cpu_seconds']))
+    for stage in report['stages']:
+        print('    stage %-26s %10.3f s wall, from %.3f s to %.3f s' % (
+            stage['stage'], stage['wall_seconds'], stage['start_seconds'], stage['end_seconds']))
+
+
+# The below function compares the phase timings of the results with a baseline and returns a list
+# of the phases that are slower than the baseline by more than the given fraction.  Phases that
+# took less than min_seconds in the baseline are ignored, since their timings are mostly noise.
+# Phases of the baseline that are missing from the results are also reported.
+def find_regressions(results, baseline, tolerance, min_seconds=0.05):
+    regressions = []
+    for size, report in results['sizes'].items():
+        baseline_report = baseline['sizes'].get(size)
+        if baseline_report is None:
+            continue
+        baseline_phases = {phase['phase']: phase['wall_seconds'] for phase in baseline_report['phases']}
+        result_phases = set(phase['phase'] for phase in report['phases'])
+        for phase_name in baseline_phases:
+            if phase_name not in result_phases:
+                regressions.append('%s resources, %s: not run' % (size, phase_name))
+        for phase in report['phases']:
+            baseline_seconds = baseline_phases.get(phase['phase'])
+            if baseline_seconds is None or baseline_seconds < min_seconds:
+                continue
+            if phase['wall_seconds'] > baseline_seconds * (1 + tolerance):
+                regressions.append('%s resources, %s: %.3f s (baseline %.3f s)' % (
+                    size, phase['phase'], phase['wall_seconds'], baseline_seconds))
+    return regressions
+
+
+# The below function is the entry point of this file.  By default the benchmark database is built
+# in the MongoDB server named in the configuration file.  With --in-process, the mongomock package
+# is used in place of a server.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the phases of the database build.')
+    parser.add_argument('--config', default='config.json', help='the path of the build configuration file')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='the comma separated mockup sizes (resources)')
+    parser.add_argument('--processors', type=int, default=4, help='the number of processors of each system')
+    parser.add_argument('--sensors', type=int, default=16, help='the number of sensors of each system')
+    parser.add_argument('--log-entries', type=int, default=20, help='the number of log entries of each system')
+    parser.add_argument('--schema-versions', type=int, default=5, help='the number of versions of each schema')
+    parser.add_argument('--in-process', action='store_true', help='use mongomock in place of a MongoDB server')
+    parser.add_argument('--build-engine', default=None, choices=['serial', 'async'],
+                        help='the build engine to benchmark (by default, the one selected in the configuration file)')
+    parser.add_argument('--save-baseline', default=None, help='save the results as the named baseline')
+    parser.add_argument('--compare', default=None, help='compare the results with the named baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='the fraction by which a phase may be slower than the baseline before it is reported')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = json.load(f)
+    if args.build_engine is not None:
+        config.setdefault('build_options', {})['build_engine'] = args.build_engine
+
+    results = {'created': time.time(), 'python': platform.python_version(), 'platform': platform.platform(),
+               'in_process': args.in_process, 'build_options': config.get('build_options', {}),
+               'generator': {'processors': args.processors, 'sensors': args.sensors,
+                             'log_entries': args.log_entries, 'schema_versions': args.schema_versions},
+               'sizes': {}}
+    for size in [int(size) for size in args.sizes.split(',')]:
+        with tempfile.TemporaryDirectory() as work_folder:
+            bundle_folder = os.path.join(work_folder, 'bundles')
+            systems = Synthetic_Mockup.systems_for_resources(size, args.processors, args.sensors, args.log_entries)
+            Synthetic_Mockup.write_bundles(bundle_folder, systems, args.processors, args.sensors,
+                                           args.log_entries, args.schema_versions)
+            report = run_build(config, bundle_folder, work_folder, args.in_process)
+        results['sizes'][str(size)] = report
+        print_report(size, report)
+
+    results['valid'] = all(report['valid'] for report in results['sizes'].values())
+    if not results['valid']:
+        # timings with skipped phases are neither saved as a baseline nor compared with one
+        print('The benchmark is not valid, phases were skipped :',
+              ', '.join('%s resources: %s' % (size, ', '.join(report['skipped_phases']))
+                        for size, report in results['sizes'].items() if not report['valid']))
+        sys.exit(1)
+
+    if args.save_baseline is not None:
+        os.makedirs(baseline_dir, exist_ok=True)
+        baseline_path = os.path.join(baseline_dir, args.save_baseline + '.json')
+        with open(baseline_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print('Saved baseline', baseline_path)
+
+    if args.compare is not None:
+        with open(os.path.join(baseline_dir, args.compare + '.json'), 'r') as f:
+            baseline = json.load(f)
+        if not baseline.get('valid', False):
+            print('The baseline', args.compare, 'is not valid, phases were skipped when it was saved')
+            sys.exit(1)
+        if baseline.get('in_process') != args.in_process:
+            print('The baseline', args.compare, 'was not run with the same --in-process setting')
+            sys.exit(1)
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for regression in regressions:
+            print('Regression :', regression)
+        if regressions:
+            sys.exit(1)
+        print('No regressions against baseline', args.compare)
@@ -0,0 +1,124 @@
+# Payload_Storage_Benchmark.py
+# This file compares the size and serving latency of the plain and compressed storage profiles
+# Copyright (C) 2022, PICMG
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import json
+import gzip
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import initializeRedfishServer
+
+plain_table = '_benchmark_payload_plain'
+compressed_table = '_benchmark_payload_compressed'
+
+
+# The below function returns the text of each payload in the database, keyed by a name
+def read_payloads(database):
+    payloads = {}
+    for table in ['odata_file', 'metadata_file']:
+        entry = database[table].find_one({}, {'_id': 0})
+        if entry is not None:
+            payloads[table] = initializeRedfishServer.read_stored_payload(entry)
+    for entry in database['json_schema'].find({}, {'source': 1}):
+        schema = initializeRedfishServer.read_cached_schema(database, entry['source'])
+        payloads['json_schema/' + entry['source']] = json.dumps(schema)
+    return payloads
+
+
+# The below function returns the storage size of a table, or None if the database does not
+# report it
+def storage_size(database, table):
+    try:
+        for stats in database[table].aggregate([{'$collStats': {'storageStats': {}}}]):
+            return stats['storageStats'].get('storageSize')
+    except initializeRedfishServer.pymongo.errors.PyMongoError:
+        return None
+    return None
+
+
+# The below function times serving each payload from the plain table, uncompressed or gzip
+# encoded (compressed for each request), and returns the mean latency in microseconds
+def time_plain(database, names, encoding):
+    start = time.perf_counter()
+    for name in names:
+        body = database[plain_table].find_one({'name': name}, {'_id': 0, 'data': 1})['data'].encode('utf-8')
+        if encoding == 'gzip':
+            body = gzip.compress(body)
+    return (time.perf_counter() - start) * 1e6 / len(names)
+
+
+# The below function times serving each payload from the compressed table, uncompressed
+# (decompressed for each request) or gzip encoded (the precompressed variant), and returns the
+# mean latency in microseconds
+def time_compressed(database, names, encoding):
+    start = time.perf_counter()
+    for name in names:
+        if encoding == 'gzip':
+            body = database[compressed_table].find_one({'name': name}, {'_id': 0, 'variants.gzip': 1})
+            body = body['variants']['gzip']['data']
+        else:
+            entry = database[compressed_table].find_one(
+                {'name': name}, {'_id': 0, 'encoding': 1, 'data': 1, 'content_length': 1})
+            body = initializeRedfishServer.decompress_payload(entry)
+    return (time.perf_counter() - start) * 1e6 / len(names)
+
+
+# The below function is the entry point of this file.  It expects the database to have been built
+# with initializeRedfishServer.py.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the plain and compressed storage profiles.')
+    parser.add_argument('--config', default='config.json', help='the path of the build configuration file')
+    args = parser.parse_args()
+
+    builder = initializeRedfishServer.RedfishDbBuilder(initializeRedfishServer.load_config_json_file(args.config))
+    compressor = builder.get_build_option('payload_compressor', 'zstd')
+    database = builder.get_mongo_database()
+
+    # copy the payloads into a table for each storage profile
+    database[plain_table].drop()
+    database[compressed_table].drop()
+    payloads = read_payloads(database)
+    plain_bytes = 0
+    compressed_bytes = 0
+    for name, text in payloads.items():
+        plain_entry = {'name': name, 'data': text}
+        compressed_entry = initializeRedfishServer.compress_payload(text.encode('utf-8'), compressor)
+        compressed_entry['name'] = name
+        plain_bytes += len(initializeRedfishServer.bson.encode(plain_entry))
+        compressed_bytes += len(initializeRedfishServer.bson.encode(compressed_entry))
+        database[plain_table].insert_one(plain_entry)
+        database[compressed_table].insert_one(compressed_entry)
+    database[plain_table].create_index('name')
+    database[compressed_table].create_index('name')
+
+    names = list(payloads.keys())
+    if names:
+        print('Payload count                 :', len(names))
+        print('Document size (plain)         :', plain_bytes, 'bytes')
+        print('Document size (compressed)    :', compressed_bytes, 'bytes')
+        print('Storage size (plain)          :', storage_size(database, plain_table), 'bytes')
+        print('Storage size (compressed)     :', storage_size(database, compressed_table), 'bytes')
+        print('Identity (plain)              : %10.1f us/request' % time_plain(database, names, 'identity'))
+        print('Identity (compressed)         : %10.1f us/request' % time_compressed(database, names, 'identity'))
+        print('gzip (plain)                  : %10.1f us/request' % time_plain(database, names, 'gzip'))
+        print('gzip (compressed)             : %10.1f us/request' % time_compressed(database, names, 'gzip'))
+
+    database[plain_table].drop()
+    database[compressed_table].drop()
+    builder.close()
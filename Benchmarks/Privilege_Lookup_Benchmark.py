@@ -0,0 +1,80 @@
+# Privilege_Lookup_Benchmark.py
+# This file compares the privileges_table regular expression scan with the uri trie lookup
+# Copyright (C) 2022, PICMG
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import initializeRedfishServer
+
+
+# The below function returns a concrete request path for each uri in the security table
+def example_paths(rows):
+    return [row['uri'].replace(initializeRedfishServer.PrivilegeTrie.wildcard_segment, 'Example1') for row in rows]
+
+
+# The below function resolves a path by testing it against each regular expression in turn
+def regex_scan(compiled_rows, path):
+    for pattern, row in compiled_rows:
+        if pattern.fullmatch(path):
+            return row['Entity']
+    return None
+
+
+# The below function times a lookup function over all of the paths and returns the mean
+# lookup time in microseconds
+def time_lookups(lookup, paths, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        for path in paths:
+            lookup(path)
+    return (time.perf_counter() - start) * 1e6 / (repeat * len(paths))
+
+
+# The below function is the entry point of this file.  It expects the database to have been built
+# with initializeRedfishServer.py.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark privileges_table lookups.')
+    parser.add_argument('--config', default='config.json', help='the path of the build configuration file')
+    parser.add_argument('--repeat', type=int, default=5, help='the number of times each path is resolved')
+    args = parser.parse_args()
+
+    builder = initializeRedfishServer.RedfishDbBuilder(initializeRedfishServer.load_config_json_file(args.config))
+    database = builder.get_mongo_database()
+
+    rows = list(database['privileges_table'].find({}, {'_id': 0}))
+    compiled_rows = [(re.compile(row['uri']), row) for row in rows]
+    trie = initializeRedfishServer.PrivilegeTrie.load(database)
+    paths = example_paths(rows)
+    print('Resolving', len(paths), 'paths against', len(rows), 'security table uris')
+
+    mismatches = 0
+    for path in paths:
+        resolved = trie.resolve(path)
+        if regex_scan(compiled_rows, path) != (resolved[0] if resolved is not None else None):
+            mismatches += 1
+
+    regex_time = time_lookups(lambda path: regex_scan(compiled_rows, path), paths, args.repeat)
+    trie_time = time_lookups(trie.resolve, paths, args.repeat)
+    print('regex scan : %10.2f us/lookup' % regex_time)
+    print('uri trie   : %10.2f us/lookup' % trie_time)
+    print('speedup    : %10.1fx' % (regex_time / trie_time))
+    print('paths where the first matching regex and the trie disagree :', mismatches)
+
+    builder.close()
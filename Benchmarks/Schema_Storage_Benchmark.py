@@ -0,0 +1,83 @@
+# Schema_Storage_Benchmark.py
+# This file compares the fetch and decode latency of the json_schema storage formats
+# Copyright (C) 2022, PICMG
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import initializeRedfishServer
+
+string_table = '_benchmark_schema_string'
+document_table = '_benchmark_schema_document'
+
+
+# The below function times reading each (source, definition) pair through
+# read_cached_schema from a schema table and returns the mean latency in microseconds
+def time_reads(database, table, reads):
+    start = time.perf_counter()
+    for source, definition in reads:
+        initializeRedfishServer.read_cached_schema(database, source, definition, table)
+    return (time.perf_counter() - start) * 1e6 / len(reads)
+
+
+# The below function is the entry point of this file.  It expects the database to have been built
+# with initializeRedfishServer.py.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the json_schema storage formats.')
+    parser.add_argument('--config', default='config.json', help='the path of the build configuration file')
+    args = parser.parse_args()
+
+    builder = initializeRedfishServer.RedfishDbBuilder(initializeRedfishServer.load_config_json_file(args.config))
+    database = builder.get_mongo_database()
+
+    # copy the schema cache into a table for each format
+    database[string_table].drop()
+    database[document_table].drop()
+    reads = []
+    string_bytes = 0
+    document_bytes = 0
+    for entry in database['json_schema'].find({}, {'source': 1}):
+        source = entry['source']
+        schema = initializeRedfishServer.read_cached_schema(database, source)
+        string_entry = {'source': source, 'schema': json.dumps(schema)}
+        document_entry = {'source': source, 'schema': initializeRedfishServer.escape_schema_keys(schema),
+                          'format': 'document'}
+        string_bytes += len(initializeRedfishServer.bson.encode(string_entry))
+        document_bytes += len(initializeRedfishServer.bson.encode(document_entry))
+        database[string_table].insert_one(string_entry)
+        database[document_table].insert_one(document_entry)
+        definition = source.split('.')[0]
+        reads.append((source, definition if definition in schema.get('definitions', {}) else None))
+    database[string_table].create_index('source')
+    database[document_table].create_index('source')
+
+    whole_reads = [(source, None) for source, definition in reads]
+    definition_reads = [(source, definition) for source, definition in reads if definition is not None]
+    print('Schema count              :', len(reads))
+    print('Stored size (string)      :', string_bytes, 'bytes')
+    print('Stored size (document)    :', document_bytes, 'bytes')
+    print('Whole schema (string)     : %10.1f us/read' % time_reads(database, string_table, whole_reads))
+    print('Whole schema (document)   : %10.1f us/read' % time_reads(database, document_table, whole_reads))
+    if definition_reads:
+        print('One definition (string)   : %10.1f us/read' % time_reads(database, string_table, definition_reads))
+        print('One definition (document) : %10.1f us/read' % time_reads(database, document_table, definition_reads))
+
+    database[string_table].drop()
+    database[document_table].drop()
+    builder.close()
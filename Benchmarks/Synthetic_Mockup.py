@@ -0,0 +1,276 @@
+# Synthetic_Mockup.py
+# This file generates synthetic Redfish mockup, schema and registry bundles for benchmarking
+# Copyright (C) 2022, PICMG
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import json
+import argparse
+from zipfile import ZipFile, ZIP_DEFLATED
+
+# the resource types of the synthetic mockup, with the uri of each type's resources
+resource_uris = {
+    'ServiceRoot': '/redfish/v1',
+    'ComputerSystemCollection': '/redfish/v1/Systems',
+    'ComputerSystem': '/redfish/v1/Systems/{ComputerSystemId}',
+    'ProcessorCollection': '/redfish/v1/Systems/{ComputerSystemId}/Processors',
+    'Processor': '/redfish/v1/Systems/{ComputerSystemId}/Processors/{ProcessorId}',
+    'LogServiceCollection': '/redfish/v1/Systems/{ComputerSystemId}/LogServices',
+    'LogService': '/redfish/v1/Systems/{ComputerSystemId}/LogServices/{LogServiceId}',
+    'LogEntryCollection': '/redfish/v1/Systems/{ComputerSystemId}/LogServices/{LogServiceId}/Entries',
+    'LogEntry': '/redfish/v1/Systems/{ComputerSystemId}/LogServices/{LogServiceId}/Entries/{LogEntryId}',
+    'ChassisCollection': '/redfish/v1/Chassis',
+    'Chassis': '/redfish/v1/Chassis/{ChassisId}',
+    'SensorCollection': '/redfish/v1/Chassis/{ChassisId}/Sensors',
+    'Sensor': '/redfish/v1/Chassis/{ChassisId}/Sensors/{SensorId}',
+    'AccountService': '/redfish/v1/AccountService',
+    'ManagerAccountCollection': '/redfish/v1/AccountService/Accounts',
+    'ManagerAccount': '/redfish/v1/AccountService/Accounts/{ManagerAccountId}',
+}
+
+# the number of mockup resources that do not depend on the number of systems
+fixed_resource_count = 6
+
+
+# The below function returns the number of mockup resources for a system with the given number of
+# processors, sensors and log entries
+def resources_per_system(processors, sensors, log_entries):
+    return 7 + processors + sensors + log_entries
+
+
+# The below function returns the number of systems needed for a mockup of about the given number
+# of resources
+def systems_for_resources(resources, processors, sensors, log_entries):
+    per_system = resources_per_system(processors, sensors, log_entries)
+    return max(1, round((resources - fixed_resource_count) / per_system))
+
+
+# The below function returns the @odata.type of a resource type (version 1.<latest>.0 for
+# resources, unversioned for collections)
+def odata_type(type_name, latest_minor):
+    if type_name.endswith('Collection'):
+        return '#' + type_name + '.' + type_name
+    return '#' + type_name + '.v1_' + str(latest_minor) + '_0.' + type_name
+
+
+# The below function returns a collection resource
+def collection(uri, type_name, member_uris):
+    return {'@odata.id': uri, '@odata.type': '#' + type_name + '.' + type_name,
+            'Name': type_name.replace('Collection', ' Collection'),
+            'Members': [{'@odata.id': member} for member in member_uris],
+            'Members@odata.count': len(member_uris)}
+
+
+# The below function yields the (relative path, resource) of each resource of a synthetic mockup
+# of the given number of systems.  Each system has one chassis, and the given number of
+# processors, sensors (in its chassis) and log entries.
+def generate_resources(systems, processors, sensors, log_entries, latest_minor=4):
+    def typed(type_name, uri, properties):
+        resource = {'@odata.id': uri, '@odata.type': odata_type(type_name, latest_minor)}
+        resource.update(properties)
+        return resource
+
+    system_ids = ['System%d' % index for index in range(systems)]
+    chassis_ids = ['Chassis%d' % index for index in range(systems)]
+    yield '', typed('ServiceRoot', '/redfish/v1/', {
+        'Id': 'RootService', 'Name': 'Root Service', 'RedfishVersion': '1.15.0',
+        'Systems': {'@odata.id': '/redfish/v1/Systems'}, 'Chassis': {'@odata.id': '/redfish/v1/Chassis'},
+        'AccountService': {'@odata.id': '/redfish/v1/AccountService'}})
+    yield 'Systems', collection('/redfish/v1/Systems', 'ComputerSystemCollection',
+                                ['/redfish/v1/Systems/' + system_id for system_id in system_ids])
+    yield 'Chassis', collection('/redfish/v1/Chassis', 'ChassisCollection',
+                                ['/redfish/v1/Chassis/' + chassis_id for chassis_id in chassis_ids])
+    yield 'AccountService', typed('AccountService', '/redfish/v1/AccountService', {
+        'Id': 'AccountService', 'Name': 'Account Service', 'Accounts': {'@odata.id': '/redfish/v1/AccountService/Accounts'}})
+    yield 'AccountService/Accounts', collection('/redfish/v1/AccountService/Accounts', 'ManagerAccountCollection',
+                                                ['/redfish/v1/AccountService/Accounts/1'])
+    yield 'AccountService/Accounts/1', typed('ManagerAccount', '/redfish/v1/AccountService/Accounts/1', {
+        'Id': '1', 'Name': 'User Account', 'UserName': 'Administrator', 'RoleId': 'Administrator', 'Enabled': True})
+
+    for system_id, chassis_id in zip(system_ids, chassis_ids):
+        system_uri = '/redfish/v1/Systems/' + system_id
+        chassis_uri = '/redfish/v1/Chassis/' + chassis_id
+        log_uri = system_uri + '/LogServices/Log'
+        yield 'Systems/' + system_id, typed('ComputerSystem', system_uri, {
+            'Id': system_id, 'Name': 'Compute System', 'SystemType': 'Physical', 'PowerState': 'On',
+            'Status': {'State': 'Enabled', 'Health': 'OK'},
+            'ProcessorSummary': {'Count': processors, 'Model': 'Synthetic CPU'},
+            'Processors': {'@odata.id': system_uri + '/Processors'},
+            'LogServices': {'@odata.id': system_uri + '/LogServices'},
+            'Links': {'Chassis': [{'@odata.id': chassis_uri}]}})
+        processor_uris = [system_uri + '/Processors/CPU%d' % index for index in range(processors)]
+        yield 'Systems/' + system_id + '/Processors', collection(
+            system_uri + '/Processors', 'ProcessorCollection', processor_uris)
+        for index, uri in enumerate(processor_uris):
+            yield uri[len('/redfish/v1/'):], typed('Processor', uri, {
+                'Id': 'CPU%d' % index, 'Name': 'Processor', 'Socket': 'CPU %d' % index, 'ProcessorType': 'CPU',
+                'TotalCores': 16, 'TotalThreads': 32, 'MaxSpeedMHz': 3700, 'Status': {'State': 'Enabled', 'Health': 'OK'}})
+        yield 'Systems/' + system_id + '/LogServices', collection(
+            system_uri + '/LogServices', 'LogServiceCollection', [log_uri])
+        yield log_uri[len('/redfish/v1/'):], typed('LogService', log_uri, {
+            'Id': 'Log', 'Name': 'System Log Service', 'MaxNumberOfRecords': log_entries,
+            'Entries': {'@odata.id': log_uri + '/Entries'}})
+        entry_uris = [log_uri + '/Entries/%d' % index for index in range(log_entries)]
+        yield log_uri[len('/redfish/v1/'):] + '/Entries', collection(log_uri + '/Entries', 'LogEntryCollection', entry_uris)
+        for index, uri in enumerate(entry_uris):
+            yield uri[len('/redfish/v1/'):], typed('LogEntry', uri, {
+                'Id': str(index), 'Name': 'Log Entry %d' % index, 'EntryType': 'Event', 'Severity': 'OK',
+                'Created': '2022-01-01T00:00:%02d+00:00' % (index % 60), 'Message': 'Synthetic event %d' % index,
+                'MessageId': 'Base.1.0.Success'})
+        yield 'Chassis/' + chassis_id, typed('Chassis', chassis_uri, {
+            'Id': chassis_id, 'Name': 'Chassis', 'ChassisType': 'RackMount',
+            'Sensors': {'@odata.id': chassis_uri + '/Sensors'},
+            'Links': {'ComputerSystems': [{'@odata.id': system_uri}]}})
+        sensor_uris = [chassis_uri + '/Sensors/Temp%d' % index for index in range(sensors)]
+        yield 'Chassis/' + chassis_id + '/Sensors', collection(chassis_uri + '/Sensors', 'SensorCollection', sensor_uris)
+        for index, uri in enumerate(sensor_uris):
+            yield uri[len('/redfish/v1/'):], typed('Sensor', uri, {
+                'Id': 'Temp%d' % index, 'Name': 'Temperature Sensor %d' % index, 'ReadingType': 'Temperature',
+                'Reading': 30.0 + index % 40, 'ReadingUnits': 'Cel', 'Status': {'State': 'Enabled', 'Health': 'OK'}})
+
+
+# The below function writes a synthetic mockup bundle (like DSP2043) holding the mockup in the
+# mockup_dir_name folder, and returns the number of resources written
+def write_mockup_zip(path, mockup_dir_name, systems, processors, sensors, log_entries, latest_minor=4):
+    count = 0
+    with ZipFile(path, 'w', ZIP_DEFLATED) as archive:
+        for relative_path, resource in generate_resources(systems, processors, sensors, log_entries, latest_minor):
+            member = mockup_dir_name + '/' + (relative_path + '/' if relative_path else '') + 'index.json'
+            archive.writestr(member, json.dumps(resource, indent=4))
+            count += 1
+        archive.writestr(mockup_dir_name + '/odata/index.json', json.dumps({
+            '@odata.context': '/redfish/v1/$metadata', 'value': [
+                {'name': name, 'kind': 'Singleton', 'url': '/redfish/v1/' + name}
+                for name in ['Systems', 'Chassis', 'AccountService']]}, indent=4))
+        archive.writestr(mockup_dir_name + '/$metadata/index.xml', '\n'.join(
+            ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<edmx:Edmx xmlns:edmx="http://docs.oasis-open.org/odata/ns/edmx" Version="4.0">'] +
+            ['  <edmx:Reference Uri="http://redfish.dmtf.org/schemas/v1/%s_v1.xml">'
+             '<edmx:Include Namespace="%s"/></edmx:Reference>' % (type_name, type_name)
+             for type_name in resource_uris] +
+            ['</edmx:Edmx>']))
+    return count
+
+
+# The below function yields the (file name, schema) of each file of a synthetic json schema
+# bundle, with versions v1_0_0 through v1_<versions - 1>_0 of each resource type.  The versioned
+# schema refer to the shared Resource.json and odata-v4.json definitions.
+def generate_schema(versions):
+    yield 'odata-v4.json', {'$id': 'http://redfish.dmtf.org/schemas/v1/odata-v4.json', 'definitions': {
+        'idRef': {'type': 'object', 'properties': {'@odata.id': {'$ref': '#/definitions/id'}}},
+        'id': {'type': 'string', 'format': 'uri-reference'},
+        'type': {'type': 'string'}}}
+    yield 'Resource.json', {'$id': 'http://redfish.dmtf.org/schemas/v1/Resource.json', 'definitions': {
+        'Id': {'type': 'string'}, 'Name': {'type': 'string'},
+        'Status': {'type': 'object', 'properties': {'State': {'type': 'string'}, 'Health': {'type': 'string'}}},
+        'Links': {'type': 'object', 'properties': {
+            'Related': {'type': 'array', 'items': {'$ref': 'http://redfish.dmtf.org/schemas/v1/odata-v4.json#/definitions/idRef'}}}}}}
+    for type_name, uri in resource_uris.items():
+        if type_name.endswith('Collection'):
+            yield type_name + '.json', {'definitions': {type_name: {
+                'type': 'object', 'uris': [uri],
+                'properties': {'Members': {'type': 'array', 'items': {
+                    '$ref': 'http://redfish.dmtf.org/schemas/v1/odata-v4.json#/definitions/idRef'}}}}}}
+            continue
+        yield type_name + '.json', {'definitions': {type_name: {
+            'anyOf': [{'$ref': 'http://redfish.dmtf.org/schemas/v1/%s.v1_%d_0.json#/definitions/%s' % (type_name, minor, type_name)}
+                      for minor in range(versions)],
+            'uris': [uri]}}}
+        for minor in range(versions):
+            properties = {
+                '@odata.id': {'$ref': 'http://redfish.dmtf.org/schemas/v1/odata-v4.json#/definitions/id'},
+                '@odata.type': {'$ref': 'http://redfish.dmtf.org/schemas/v1/odata-v4.json#/definitions/type'},
+                'Id': {'$ref': 'http://redfish.dmtf.org/schemas/v1/Resource.json#/definitions/Id'},
+                'Name': {'$ref': 'http://redfish.dmtf.org/schemas/v1/Resource.json#/definitions/Name'},
+                'Status': {'$ref': 'http://redfish.dmtf.org/schemas/v1/Resource.json#/definitions/Status'},
+                'Links': {'$ref': '#/definitions/Links'}}
+            for index in range(minor):
+                properties['Property%d' % index] = {'type': ['string', 'null'], 'description': 'Added in v1_%d_0.' % (index + 1)}
+            yield '%s.v1_%d_0.json' % (type_name, minor), {'definitions': {
+                type_name: {'type': 'object', 'additionalProperties': False, 'properties': properties},
+                'Links': {'type': 'object', 'properties': {
+                    'Oem': {'type': 'object'},
+                    'Related': {'$ref': 'http://redfish.dmtf.org/schemas/v1/Resource.json#/definitions/Links'}}}}}
+
+
+# The below function writes a synthetic schema bundle (like DSP8010) and returns the number of
+# schema files written
+def write_schema_zip(path, versions=5):
+    count = 0
+    with ZipFile(path, 'w', ZIP_DEFLATED) as archive:
+        for name, schema in generate_schema(versions):
+            archive.writestr('json-schema/' + name, json.dumps(schema, indent=4))
+            count += 1
+        archive.writestr('openapi/openapi.yaml', 'openapi: 3.0.1\n')
+    return count
+
+
+# The below function writes a synthetic privilege and message registry bundle (like DSP8011),
+# holding versions 1.0.0 through 1.<versions - 1>.0 of each registry, and returns the number of
+# registry files written
+def write_registry_zip(path, versions=5, messages=50):
+    count = 0
+    with ZipFile(path, 'w', ZIP_DEFLATED) as archive:
+        for minor in range(versions):
+            version = '1.%d.0' % minor
+            mappings = [{'Entity': type_name, 'OperationMap': {
+                'GET': [{'Privilege': ['Login']}], 'HEAD': [{'Privilege': ['Login']}],
+                'PATCH': [{'Privilege': ['ConfigureComponents']}], 'POST': [{'Privilege': ['ConfigureComponents']}],
+                'PUT': [{'Privilege': ['ConfigureComponents']}], 'DELETE': [{'Privilege': ['ConfigureComponents']}]}}
+                for type_name in resource_uris]
+            archive.writestr('DSP8011/json/Redfish_%s_PrivilegeRegistry.json' % version, json.dumps({
+                '@odata.type': '#PrivilegeRegistry.v1_1_4.PrivilegeRegistry',
+                'Id': 'Redfish_%s_PrivilegeRegistry' % version, 'Name': 'Redfish Privilege Mapping',
+                'PrivilegesUsed': ['Login', 'ConfigureManager', 'ConfigureUsers', 'ConfigureComponents', 'ConfigureSelf'],
+                'Mappings': mappings}, indent=4))
+            count += 1
+            for registry in ['Base', 'ResourceEvent', 'TaskEvent']:
+                archive.writestr('DSP8011/json/%s.%s.json' % (registry, version), json.dumps({
+                    '@odata.type': '#MessageRegistry.v1_6_0.MessageRegistry',
+                    'Id': registry + '.' + version, 'Name': registry + ' Message Registry',
+                    'RegistryPrefix': registry, 'RegistryVersion': version, 'Language': 'en',
+                    'Messages': {'Message%d' % index: {
+                        'Description': 'Synthetic message %d.' % index, 'Message': 'Synthetic message %1.',
+                        'Severity': 'OK', 'NumberOfArgs': 1, 'ParamTypes': ['string'],
+                        'Resolution': 'None.'} for index in range(messages)}}, indent=4))
+                count += 1
+    return count
+
+
+# The below function writes a synthetic mockup, schema and registry bundle into a folder, named
+# after the bundles of the default configuration (DSP2043_2022.2, DSP8010_2023.2 and
+# DSP8011_2022.2), and returns the number of mockup resources
+def write_bundles(folder, systems, processors, sensors, log_entries, schema_versions=5, registry_versions=5,
+                  mockup_dir_name='public-rackmount1'):
+    os.makedirs(folder, exist_ok=True)
+    write_schema_zip(os.path.join(folder, 'DSP8010_2023.2.zip'), schema_versions)
+    write_registry_zip(os.path.join(folder, 'DSP8011_2022.2.zip'), registry_versions)
+    return write_mockup_zip(os.path.join(folder, 'DSP2043_2022.2.zip'), mockup_dir_name,
+                            systems, processors, sensors, log_entries, schema_versions - 1)
+
+
+# The below function is the entry point of this file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate synthetic Redfish mockup, schema and registry bundles.')
+    parser.add_argument('folder', help='the folder to write the bundles to')
+    parser.add_argument('--resources', type=int, default=1000, help='the approximate number of mockup resources')
+    parser.add_argument('--processors', type=int, default=4, help='the number of processors of each system')
+    parser.add_argument('--sensors', type=int, default=16, help='the number of sensors of each system')
+    parser.add_argument('--log-entries', type=int, default=20, help='the number of log entries of each system')
+    parser.add_argument('--schema-versions', type=int, default=5, help='the number of versions of each schema')
+    args = parser.parse_args()
+
+    systems = systems_for_resources(args.resources, args.processors, args.sensors, args.log_entries)
+    count = write_bundles(args.folder, systems, args.processors, args.sensors, args.log_entries, args.schema_versions)
+    print('Wrote', count, 'mockup resources for', systems, 'systems to', args.folder)
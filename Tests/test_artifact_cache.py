@@ -0,0 +1,205 @@
+# test_artifact_cache.py
+# This file tests the artifact cache, lockfile and offline mode against a local http server
+# Copyright (C) 2022, PICMG
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+import unittest
+import http.server
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import initializeRedfishServer
+
+
+# The below class serves the artifacts of an ArtifactServer, with ETag and Last-Modified
+# validators, and answers conditional requests for an unchanged artifact with 304 Not Modified
+class ArtifactRequestHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, self.headers.get('If-None-Match')))
+        body = server.artifacts.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', 'Mon, 02 Jan 2023 00:00:00 GMT')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# The below class is a local http server that stands in for dmtf.org.  artifacts maps each path to
+# the content served for it, and requests records the (path, If-None-Match) of each request.
+class ArtifactServer(http.server.ThreadingHTTPServer):
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), ArtifactRequestHandler)
+        self.artifacts = {}
+        self.requests = []
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        return 'http://127.0.0.1:%d%s' % (self.server_port, path)
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class ArtifactCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.server = ArtifactServer()
+        self.server.artifacts['/DSP8010_2023.2.zip'] = b'schema bundle ' * 1000
+        self.url = self.server.url('/DSP8010_2023.2.zip')
+        self.sha256 = hashlib.sha256(self.server.artifacts['/DSP8010_2023.2.zip']).hexdigest()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.folder)
+
+    # returns a RedfishDbBuilder whose artifact cache and lockfile are in the test folder
+    def make_builder(self, **build_options):
+        options = {'artifact_cache_dir': os.path.join(self.folder, 'cache'),
+                   'artifact_lockfile': os.path.join(self.folder, 'artifacts.lock.json')}
+        options.update(build_options)
+        return initializeRedfishServer.RedfishDbBuilder({'build_options': options}, database_name='RedfishDB')
+
+    def write_lockfile(self, lockfile):
+        with open(os.path.join(self.folder, 'artifacts.lock.json'), 'w') as f:
+            json.dump(lockfile, f)
+
+    def read_lockfile(self):
+        with open(os.path.join(self.folder, 'artifacts.lock.json'), 'r') as f:
+            return json.load(f)
+
+    def test_first_download(self):
+        builder = self.make_builder()
+        path = builder.fetch_artifact_to_cache(self.url)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), self.server.artifacts['/DSP8010_2023.2.zip'])
+        self.assertEqual(os.path.basename(path), self.sha256)
+        entry = builder.load_artifact_index()[self.url]
+        self.assertEqual(entry['sha256'], self.sha256)
+        self.assertIsNotNone(entry['etag'])
+        self.assertEqual(self.server.requests, [('/DSP8010_2023.2.zip', None)])
+
+    def test_not_modified_revalidation_uses_cache(self):
+        first_path = self.make_builder().fetch_artifact_to_cache(self.url)
+        modified_time = os.stat(first_path).st_mtime_ns
+        path = self.make_builder().fetch_artifact_to_cache(self.url)
+        self.assertEqual(path, first_path)
+        self.assertEqual(os.stat(path).st_mtime_ns, modified_time)
+        # the second request is conditional, and is answered with 304 Not Modified
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertIsNotNone(self.server.requests[1][1])
+
+    def test_changed_artifact_is_downloaded_again(self):
+        first_path = self.make_builder().fetch_artifact_to_cache(self.url)
+        self.server.artifacts['/DSP8010_2023.2.zip'] = b'new schema bundle'
+        path = self.make_builder().fetch_artifact_to_cache(self.url)
+        self.assertNotEqual(path, first_path)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'new schema bundle')
+
+    def test_lockfile_checksum_mismatch(self):
+        self.write_lockfile({self.url: '0' * 64})
+        with self.assertRaises(RuntimeError):
+            self.make_builder().fetch_artifact_to_cache(self.url)
+
+    def test_lockfile_checksum_match(self):
+        self.write_lockfile({self.url: self.sha256})
+        self.make_builder().fetch_artifact_to_cache(self.url)
+
+    def test_offline_with_cached_artifact(self):
+        first_path = self.make_builder().fetch_artifact_to_cache(self.url)
+        self.server.requests.clear()
+        path = self.make_builder(offline=True).fetch_artifact_to_cache(self.url)
+        self.assertEqual(path, first_path)
+        self.assertEqual(self.server.requests, [])
+
+    def test_offline_without_cached_artifact(self):
+        with self.assertRaises(RuntimeError):
+            self.make_builder(offline=True).fetch_artifact_to_cache(self.url)
+        self.assertEqual(self.server.requests, [])
+
+    def test_offline_checks_lockfile(self):
+        self.make_builder().fetch_artifact_to_cache(self.url)
+        self.write_lockfile({self.url: '0' * 64})
+        with self.assertRaises(RuntimeError):
+            self.make_builder(offline=True).fetch_artifact_to_cache(self.url)
+
+    def test_update_lockfile(self):
+        self.write_lockfile({self.url: '0' * 64, self.server.url('/other.zip'): '1' * 64})
+        builder = self.make_builder(update_lockfile=True)
+        builder.fetch_artifact_to_cache(self.url)
+        builder.update_artifact_lockfile()
+        self.assertEqual(self.read_lockfile(), {self.url: self.sha256, self.server.url('/other.zip'): '1' * 64})
+        # the updated lockfile is then enforced
+        self.make_builder().fetch_artifact_to_cache(self.url)
+
+    # artifacts fetched at the same time (as the async build engine and batch builds do) are all
+    # recorded in the index, and an artifact fetched by several builds is downloaded once
+    def test_concurrent_fetches(self):
+        urls = []
+        for index in range(3):
+            self.server.artifacts['/bundle%d.zip' % index] = b'bundle %d' % index
+            urls.append(self.server.url('/bundle%d.zip' % index))
+        builders = [self.make_builder() for url in urls + urls]
+        threads = [threading.Thread(target=builder.fetch_artifact_to_cache, args=(url,))
+                   for builder, url in zip(builders, urls + urls)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(self.make_builder().load_artifact_index()), sorted(urls))
+        downloads = sorted(path for path, etag in self.server.requests if etag is None)
+        self.assertEqual(downloads, ['/bundle0.zip', '/bundle1.zip', '/bundle2.zip'])
+        self.assertEqual(len(os.listdir(os.path.join(self.folder, 'cache', 'objects'))), 3)
+
+    # the --offline and --update-lockfile command line options set the build options
+    def test_command_line_options(self):
+        config = {'build_options': {'offline': False}}
+        initializeRedfishServer.apply_command_line_options(
+            config, argparse.Namespace(config='config.json', batch=None, offline=True, update_lockfile=True, incremental=None))
+        self.assertEqual(config['build_options'], {'offline': True, 'update_lockfile': True})
+
+    # the one-shot actions are not copied into the build options
+    def test_command_line_actions(self):
+        config = {'build_options': {}}
+        initializeRedfishServer.apply_command_line_options(
+            config, argparse.Namespace(config='config.json', batch=None, export=None, restore='RedfishDB.snapshot.zip',
+                                       rollback=None, log_level='DEBUG'))
+        self.assertEqual(config['build_options'], {'log_level': 'DEBUG'})
+
+
+if __name__ == '__main__':
+    unittest.main()
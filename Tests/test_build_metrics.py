@@ -0,0 +1,75 @@
+# test_build_metrics.py
+# This file tests the json and Prometheus reports of the build metrics
+# Copyright (C) 2022, PICMG
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import initializeRedfishServer
+
+
+class BuildMetricsTests(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    # returns the samples of a Prometheus textfile, as a list of (series, value)
+    def read_samples(self, path):
+        samples = []
+        with open(path, 'r') as f:
+            for line in f:
+                if line.startswith('#') or line.strip() == '':
+                    continue
+                series, value = line.rsplit(' ', 1)
+                samples.append((series, float(value)))
+        return samples
+
+    # a phase that runs more than once is written to the textfile once, with its total time, and
+    # is kept once for each run in the json report
+    def test_repeated_phase(self):
+        metrics = initializeRedfishServer.BuildMetrics()
+        with metrics.phase('prepare_shared_artifacts'):
+            for bundle in range(2):
+                with metrics.phase('download'):
+                    pass
+        metrics.record_write('RedfishObject', 10, 1000, 0.002)
+        textfile = os.path.join(self.folder, 'build.prom')
+        metrics.write_prometheus(textfile)
+        samples = self.read_samples(textfile)
+        series = [name for name, value in samples]
+        self.assertEqual(len(series), len(set(series)))
+        download = 'redfish_build_phase_wall_seconds{phase="prepare_shared_artifacts/download"}'
+        self.assertAlmostEqual(dict(samples)[download], sum(
+            phase['wall_seconds'] for phase in metrics.phases if phase['phase'] == 'prepare_shared_artifacts/download'))
+        self.assertIn('redfish_build_write_latency_seconds_count{collection="RedfishObject"}', series)
+
+        report_path = os.path.join(self.folder, 'build.json')
+        metrics.write_json(report_path)
+        with open(report_path, 'r') as f:
+            report = json.load(f)
+        self.assertEqual([phase['phase'] for phase in report['phases']],
+                         ['prepare_shared_artifacts/download', 'prepare_shared_artifacts/download',
+                          'prepare_shared_artifacts'])
+
+
+if __name__ == '__main__':
+    unittest.main()
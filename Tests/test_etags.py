@@ -0,0 +1,77 @@
+# test_etags.py
+# This file tests the ETags of the Redfish resources stored by the database build
+# Copyright (C) 2022, PICMG
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import initializeRedfishServer
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+
+# The below function returns a shaped ManagerAccount resource, as the build stores it
+def account(user_name):
+    return initializeRedfishServer.add_odata_fields({
+        '@odata.id': '/redfish/v1/AccountService/Accounts/1',
+        '@odata.type': '#ManagerAccount.v1_0_0.ManagerAccount',
+        'Id': '1', 'UserName': user_name, 'Password': None})
+
+
+class EtagTests(unittest.TestCase):
+    def test_etag_ignores_internal_fields(self):
+        data = account('Administrator')
+        self.assertEqual(data['@odata.etag'], data['_etag'])
+        self.assertEqual(initializeRedfishServer.compute_etag(dict(data, _extra=1)), data['_etag'])
+        self.assertNotEqual(account('Operator')['_etag'], data['_etag'])
+
+    # a resource changed in the database gets a new top-level @odata.etag, and no nested @odata
+    # document
+    @unittest.skipIf(mongomock is None, 'the mongomock package is not installed')
+    def test_refresh_etags_after_update(self):
+        collection = mongomock.MongoClient()['RedfishDB']['RedfishObject']
+        collection.insert_one(account('Administrator'))
+        original = collection.find_one({})
+        collection.update_one({'UserName': 'Administrator'}, {'$set': {'Password': 'test'}})
+        initializeRedfishServer.refresh_etags(collection, {'UserName': 'Administrator'})
+        data = collection.find_one({})
+        self.assertNotIn('@odata', data)
+        self.assertEqual(data['@odata.etag'], data['_etag'])
+        self.assertEqual(data['_etag'], initializeRedfishServer.compute_etag(data))
+        self.assertNotEqual(data['_etag'], original['_etag'])
+        self.assertEqual(data['Password'], 'test')
+
+    # set_administrator_password refreshes the ETag of the Administrator account
+    @unittest.skipIf(mongomock is None, 'the mongomock package is not installed')
+    def test_set_administrator_password(self):
+        client = mongomock.MongoClient()
+        builder = initializeRedfishServer.RedfishDbBuilder({'build_options': {}}, client, 'RedfishDB')
+        collection = client['RedfishDB']['RedfishObject']
+        collection.insert_one(account('Administrator'))
+        builder.set_administrator_password('secret')
+        data = collection.find_one({})
+        self.assertNotIn('@odata', data)
+        self.assertEqual(data['Password'], 'secret')
+        self.assertEqual(data['@odata.etag'], data['_etag'])
+        self.assertEqual(data['_etag'], initializeRedfishServer.compute_etag(data))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+# test_incremental_build.py
+# This file tests the build manifest of incremental builds
+# Copyright (C) 2022, PICMG
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import json
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import initializeRedfishServer
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+payload = json.dumps({'@odata.id': '/redfish/v1/odata', 'value': [{'name': 'Service', 'url': '/redfish/v1/'}]})
+
+
+# The below class counts the writes queued by a BuildManifest and applies them to the database
+class CountingWriter(initializeRedfishServer.BulkWriter):
+    def __init__(self, database):
+        super().__init__(database, initializeRedfishServer.BuildMetrics())
+        self.writes = {}
+
+    def add(self, table, operation, data=None, size=None):
+        self.writes[table] = self.writes.get(table, 0) + 1
+        super().add(table, operation, data, size)
+
+
+class IncrementalBuildTests(unittest.TestCase):
+    # the entries of the "compressed" storage profile hold bytes, which must hash like any other value
+    def test_document_hash_of_compressed_entry(self):
+        entry, size = initializeRedfishServer.shape_payload_entry(payload, 'application/json', 'zlib')
+        same_entry, size = initializeRedfishServer.shape_payload_entry(payload, 'application/json', 'zlib')
+        changed_entry, size = initializeRedfishServer.shape_payload_entry(payload + ' ', 'application/json', 'zlib')
+        self.assertIsInstance(entry['data'], bytes)
+        self.assertEqual(initializeRedfishServer.document_hash(entry), initializeRedfishServer.document_hash(same_entry))
+        self.assertNotEqual(initializeRedfishServer.document_hash(entry), initializeRedfishServer.document_hash(changed_entry))
+
+    # an incremental build with the "compressed" storage profile writes a compressed entry once, and
+    # skips it in the next build if it has not changed
+    @unittest.skipIf(mongomock is None, 'the mongomock package is not installed')
+    def test_incremental_build_with_compressed_storage(self):
+        database = mongomock.MongoClient()['RedfishDB']
+        for build in range(2):
+            writer = CountingWriter(database)
+            manifest = initializeRedfishServer.BuildManifest(database, writer)
+            entry, size = initializeRedfishServer.shape_payload_entry(payload, 'application/json', 'zlib')
+            manifest.write_document('odata_file', 'odata', entry, size)
+            manifest.finish()
+            self.assertEqual(writer.writes.get('odata_file', 0), 1 if build == 0 else 0)
+        stored = database['odata_file'].find_one({'_id': 'odata'})
+        self.assertEqual(initializeRedfishServer.read_stored_payload(stored), payload)
+
+
+    # the stale documents of a collection can be deleted before the build finishes, while the
+    # documents of the excluded (derived) collections are kept until the end of the build
+    @unittest.skipIf(mongomock is None, 'the mongomock package is not installed')
+    def test_remove_stale_documents_before_finish(self):
+        database = mongomock.MongoClient()['RedfishDB']
+        for build, keys in enumerate([['a', 'b'], ['a']]):
+            writer = CountingWriter(database)
+            manifest = initializeRedfishServer.BuildManifest(database, writer)
+            for key in keys:
+                manifest.write_document('RedfishObject', key, {'Id': key})
+                manifest.write_document('odata_type_schema', key, {'odata_type': key})
+            if build == 1:
+                manifest.remove_stale_documents(exclude=['odata_type_schema'])
+                self.assertEqual(sorted(entry['_id'] for entry in database['RedfishObject'].find()), ['a'])
+                self.assertEqual(sorted(entry['_id'] for entry in database['odata_type_schema'].find()), ['a', 'b'])
+            manifest.finish()
+        self.assertEqual(sorted(entry['_id'] for entry in database['odata_type_schema'].find()), ['a'])
+        self.assertEqual(sorted(entry['_id'] for entry in database['build_manifest'].find()),
+                         ['document:RedfishObject:a', 'document:odata_type_schema:a'])
+
+    # the privileges trie of an incremental build is built without the security table rows that are
+    # no longer generated
+    @unittest.skipIf(mongomock is None, 'the mongomock package is not installed')
+    def test_privileges_trie_without_removed_rows(self):
+        client = mongomock.MongoClient()
+        builder = initializeRedfishServer.RedfishDbBuilder({'build_options': {'incremental': True}}, client, 'RedfishDB')
+        rows = {'/redfish/v1/Systems': 'ComputerSystemCollection', '/redfish/v1/Chassis': 'ChassisCollection'}
+        for build in range(2):
+            builder.begin_incremental_build()
+            security_table = initializeRedfishServer.SecurityTable(client['RedfishDB'], {'Mappings': []})
+            security_table.rows = {uri: ({'uri': uri, 'Entity': entity, 'OperationMap': {}}, None)
+                                   for uri, entity in rows.items()}
+            builder.write_security_table(security_table)
+            trie = initializeRedfishServer.PrivilegeTrie.load(client['RedfishDB'])
+            self.assertIsNotNone(trie.resolve('/redfish/v1/Systems'))
+            self.assertEqual(trie.resolve('/redfish/v1/Chassis') is None, build == 1)
+            builder.finish_incremental_build()
+            rows.pop('/redfish/v1/Chassis', None)
+        self.assertEqual(client['RedfishDB']['privileges_table'].count_documents({}), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+# test_memory_limit.py
+# This file tests that a build with a memory limit fails instead of using more memory than the limit
+# Copyright (C) 2022, PICMG
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import initializeRedfishServer
+
+
+@unittest.skipIf(initializeRedfishServer.resource is None, 'the resource module is not available')
+class MemoryLimitTests(unittest.TestCase):
+    def builder(self, build_options):
+        return initializeRedfishServer.RedfishDbBuilder({'build_options': build_options}, None, 'RedfishDB')
+
+    # the build fails at the end of a phase after which the build process is over the limit
+    def test_build_process_over_limit(self):
+        builder = self.builder({'memory_limit_mb': 1})
+        with self.assertRaisesRegex(RuntimeError, 'exceeded the memory limit .* in phase mockups'):
+            with builder.build_phase('mockups'):
+                pass
+        self.assertEqual([phase['phase'] for phase in builder.metrics.phases], ['mockups'])
+        builder = self.builder({})
+        with builder.build_phase('mockups'):
+            pass
+
+    # a parse worker that allocates more than its share of the limit fails with a MemoryError
+    def test_parse_worker_over_limit(self):
+        builder = self.builder({'memory_limit_mb': 512, 'parse_workers': 2})
+        try:
+            executor = builder.get_parse_executor()
+            self.assertEqual(executor.submit(len, 'worker').result(), 6)
+            with self.assertRaises(MemoryError):
+                executor.submit(bytearray, 512 * 1024 * 1024).result()
+        finally:
+            builder.shutdown_parse_executor()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+# test_privilege_trie.py
+# This file tests that the privileges trie resolves request paths as the privileges_table regular
+# expressions do
+# Copyright (C) 2022, PICMG
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import re
+import sys
+import unittest
+
+import bson
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import initializeRedfishServer
+
+# the uris of each Entity, in the form of the schema's uris property
+entity_uris = {
+    'ServiceRoot': ['/redfish/v1'],
+    'ComputerSystemCollection': ['/redfish/v1/Systems'],
+    'ComputerSystem': ['/redfish/v1/Systems/{ComputerSystemId}'],
+    'Bios': ['/redfish/v1/Systems/{ComputerSystemId}/Bios', '/redfish/v1/Systems/Self/Bios'],
+    'Processor': ['/redfish/v1/Systems/{ComputerSystemId}/Processors/{ProcessorId}',
+                  '/redfish/v1/Systems/{ComputerSystemId}/Processors/{ProcessorId}/SubProcessors/{ProcessorId2}'],
+    'LogService': ['/redfish/v1/Systems/{ComputerSystemId}/LogServices/{LogServiceId}',
+                   '/redfish/v1/Managers/{ManagerId}/LogServices/{LogServiceId}'],
+    'ManagerAccount': ['/redfish/v1/AccountService/Accounts/{ManagerAccountId}'],
+    'AccountService': ['/redfish/v1/AccountService', '/redfish/v1/AccountService/Accounts/Administrator/Service'],
+    'SoftwareInventory': ['/redfish/v1/UpdateService/FirmwareInventory/{SoftwareInventoryId}'],
+    'SoftwareInventoryVersion': ['/redfish/v1/UpdateService/FirmwareInventory/{SoftwareInventoryId}/v{Major}_{Minor}'],
+}
+
+# request paths that are resolved, including paths that several uris match, paths that only a
+# wildcard matches after a literal segment leads to a dead end, and paths that no uri matches
+paths = [
+    '/redfish/v1', '/redfish/v1/', '/redfish/v1/Systems', '/redfish/v1/Systems/1', '/redfish/v1/Systems/Self',
+    '/redfish/v1/Systems/1/Bios', '/redfish/v1/Systems/Self/Bios', '/redfish/v1/Systems/Self/Processors/CPU1',
+    '/redfish/v1/Systems/1/Processors/CPU1/SubProcessors/Core1', '/redfish/v1/Systems/1/Processors/CPU1?$expand=.',
+    '/redfish/v1/Managers/BMC/LogServices/SEL', '/redfish/v1/Systems/1/LogServices/SEL',
+    '/redfish/v1/AccountService/Accounts/Administrator', '/redfish/v1/AccountService/Accounts/Administrator/Service',
+    '/redfish/v1/AccountService/Accounts/operator/Service', '/redfish/v1/UpdateService/FirmwareInventory/BMC',
+    '/redfish/v1/UpdateService/FirmwareInventory/BMC/v1_2', '/redfish/v1/UpdateService/FirmwareInventory/BMC/v1',
+    '/redfish/v1/Systems//Processors/CPU1', '/redfish/v1/Chassis/1', '/redfish/v2', '/redfish/v1/Systems/1/Processors',
+]
+
+
+class PrivilegeTrieTests(unittest.TestCase):
+    def setUp(self):
+        registry = {'Mappings': [{'Entity': entity, 'OperationMap': {'GET': [{'Privilege': ['Login']}], 'Entity': entity}}
+                                 for entity in entity_uris]}
+        security_table = initializeRedfishServer.SecurityTable(None, registry)
+        for entity, uris in entity_uris.items():
+            security_table.add_entry(entity, {'uris': uris})
+        self.rows = [result for result, source_key in security_table.rows.values()]
+        self.trie = initializeRedfishServer.PrivilegeTrie(self.rows)
+
+    # returns the entities of the security table rows whose regular expression matches a path, the
+    # way the rows are matched without the trie
+    def matching_entities(self, path):
+        path = path.split('?')[0].rstrip('/')
+        return set(row['Entity'] for row in self.rows if re.fullmatch(row['uri'], path))
+
+    # a path resolves to the entity of a matching row, or to None if no row matches it
+    def test_same_as_regex_table(self):
+        for path in paths:
+            with self.subTest(path=path):
+                resolved = self.trie.resolve(path)
+                matching = self.matching_entities(path)
+                if not matching:
+                    self.assertIsNone(resolved)
+                else:
+                    self.assertIn(resolved[0], matching)
+                    self.assertEqual(resolved[1]['Entity'], resolved[0])
+
+    # when several uris match a path, the one with a literal segment is preferred over a pattern,
+    # and a pattern over a wildcard.  A literal segment that leads to a dead end falls back to the
+    # wildcard.
+    def test_overlapping_uris(self):
+        expected = {'/redfish/v1/Systems/Self/Bios': 'Bios',
+                    '/redfish/v1/Systems/Self/Processors/CPU1': 'Processor',
+                    '/redfish/v1/Systems/Self': 'ComputerSystem',
+                    '/redfish/v1/AccountService/Accounts/Administrator': 'ManagerAccount',
+                    '/redfish/v1/AccountService/Accounts/Administrator/Service': 'AccountService',
+                    '/redfish/v1/AccountService/Accounts/operator/Service': None,
+                    '/redfish/v1/UpdateService/FirmwareInventory/BMC/v1_2': 'SoftwareInventoryVersion',
+                    '/redfish/v1/UpdateService/FirmwareInventory/BMC/v1': None,
+                    '/redfish/v1/Systems//Processors/CPU1': None}
+        for path, entity in expected.items():
+            with self.subTest(path=path):
+                resolved = self.trie.resolve(path)
+                self.assertEqual(resolved[0] if resolved is not None else None, entity)
+
+    # the trie resolves the same paths after it is stored in the database and loaded again
+    def test_document_round_trip(self):
+        document = bson.decode(bson.encode(self.trie.to_document()))
+        loaded = initializeRedfishServer.PrivilegeTrie.from_document(document)
+        for path in paths:
+            with self.subTest(path=path):
+                self.assertEqual(loaded.resolve(path), self.trie.resolve(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+# test_schema_closure.py
+# This file tests the self-contained schema closures built by SchemaClosureBuilder
+# Copyright (C) 2022, PICMG
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import initializeRedfishServer
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+base_url = 'http://redfish.dmtf.org/schemas/v1/'
+
+# a small schema cache: Processor refers to an odata definition and its Actions once, to the
+# Resource Status twice, to itself (SubProcessors), to a pair of definitions that refer to each
+# other, and to a schema that is not in the cache
+schemas = {
+    'odata-v4.json': {'definitions': {'id': {'type': 'string', 'format': 'uri-reference'}}},
+    'Resource.json': {'definitions': {
+        'Health': {'enum': ['OK', 'Warning', 'Critical']},
+        'Status': {'type': 'object', 'properties': {'Health': {'$ref': '#/definitions/Health'},
+                                                    'HealthRollup': {'$ref': '#/definitions/Health'}}}}},
+    'Processor.json': {'definitions': {'ProcessorCollection': {'type': 'object', 'properties': {
+        'Members': {'type': 'array', 'items': {'$ref': base_url + 'odata-v4.json#/definitions/id'}}}}}},
+    'Processor.v1_1_0.json': {
+        '$schema': 'http://redfish.dmtf.org/schemas/v1/redfish-schema-v1.json', 'title': '#Processor.v1_1_0.Processor',
+        'definitions': {
+            'Processor': {'type': 'object', 'additionalProperties': False, 'properties': {
+                '@odata.id': {'$ref': base_url + 'odata-v4.json#/definitions/id'},
+                'Status': {'$ref': base_url + 'Resource.json#/definitions/Status'},
+                'SubProcessors': {'type': 'array', 'items': {'$ref': '#/definitions/Processor'}},
+                'Actions': {'$ref': '#/definitions/Actions', 'description': 'The actions.'},
+                'Links': {'$ref': '#/definitions/Links', 'description': 'The links.'},
+                'Metrics': {'$ref': base_url + 'ProcessorMetrics.json#/definitions/ProcessorMetrics'},
+                'Oem': {'$ref': '#/definitions/OemActions'}}},
+            'Links': {'type': 'object', 'properties': {'Chassis': {'$ref': '#/definitions/ChassisLink'},
+                                                       'Status': {'$ref': base_url + 'Resource.json#/definitions/Status'}}},
+            'ChassisLink': {'type': 'object', 'properties': {'Back': {'$ref': '#/definitions/Links'}}},
+            'Actions': {'type': 'object', 'properties': {'#Processor.Reset': {'type': 'object'}}},
+            'OemActions': {'type': 'object'}}},
+}
+
+
+# The below function returns each $ref within a json value
+def refs(value):
+    return list(initializeRedfishServer.SchemaClosureBuilder.find_refs(value))
+
+
+class SchemaClosureTests(unittest.TestCase):
+    def setUp(self):
+        self.closure = initializeRedfishServer.SchemaClosureBuilder(schemas).build('Processor.v1_1_0.json')
+        self.schema = self.closure['schema']
+
+    def test_closure_document(self):
+        self.assertEqual((self.closure['source'], self.closure['type'], self.closure['version'], self.closure['odata_type']),
+                         ('Processor.v1_1_0.json', 'Processor', 'v1_1_0', '#Processor.v1_1_0.Processor'))
+        self.assertEqual(self.schema['title'], '#Processor.v1_1_0.Processor')
+        self.assertEqual(self.schema['$schema'], schemas['Processor.v1_1_0.json']['$schema'])
+
+    # a definition that is referenced once is expanded in place
+    def test_single_reference_is_inlined(self):
+        self.assertEqual(self.schema['properties']['@odata.id'], {'type': 'string', 'format': 'uri-reference'})
+        self.assertEqual(self.schema['properties']['Oem'], {'type': 'object'})
+        self.assertNotIn('odata-v4.id', self.schema['definitions'])
+
+    # keywords next to a reference are kept, with the expanded definition under allOf, or with
+    # the reference to the closure's definitions if the definition is not inlined
+    def test_reference_with_keywords(self):
+        self.assertEqual(self.schema['properties']['Actions'], {'description': 'The actions.', 'allOf': [
+            {'type': 'object', 'properties': {'#Processor.Reset': {'type': 'object'}}}]})
+        links = self.schema['properties']['Links']
+        self.assertEqual(links['$ref'], '#/definitions/Processor.v1_1_0.Links')
+        self.assertEqual(links['description'], 'The links.')
+
+    # a definition that is referenced from more than one place is copied once into the closure's
+    # definitions, along with the definitions that it refers to more than once
+    def test_shared_definition(self):
+        definitions = self.schema['definitions']
+        self.assertEqual(self.schema['properties']['Status'], {'$ref': '#/definitions/Resource.Status'})
+        self.assertEqual(definitions['Resource.Status']['properties']['Health'], {'$ref': '#/definitions/Resource.Health'})
+        self.assertEqual(definitions['Resource.Health'], {'enum': ['OK', 'Warning', 'Critical']})
+
+    # references to the root, and definitions on a reference cycle, are referenced within the
+    # closure instead of being expanded without limit
+    def test_recursive_definitions(self):
+        definitions = self.schema['definitions']
+        self.assertEqual(self.schema['properties']['SubProcessors']['items'], {'$ref': '#'})
+        self.assertEqual(definitions['Processor.v1_1_0.Links']['properties']['Chassis'],
+                         {'$ref': '#/definitions/Processor.v1_1_0.ChassisLink'})
+        self.assertEqual(definitions['Processor.v1_1_0.ChassisLink']['properties']['Back'],
+                         {'$ref': '#/definitions/Processor.v1_1_0.Links'})
+        self.assertEqual(self.closure['recursive_definitions'],
+                         ['Processor.v1_1_0.ChassisLink', 'Processor.v1_1_0.Links', 'Processor.v1_1_0.Processor'])
+
+    # references that cannot be resolved are left unchanged and reported; every other reference
+    # of the closure is to the closure itself
+    def test_unresolved_references(self):
+        unresolved = base_url + 'ProcessorMetrics.json#/definitions/ProcessorMetrics'
+        self.assertEqual(self.closure['unresolved_refs'], [unresolved])
+        self.assertEqual(self.schema['properties']['Metrics'], {'$ref': unresolved})
+        for ref in refs(self.schema):
+            if ref != unresolved:
+                self.assertTrue(ref == '#' or ref[len('#/definitions/'):] in self.schema['definitions'], ref)
+
+    def test_unversioned_and_missing_types(self):
+        builder = initializeRedfishServer.SchemaClosureBuilder(schemas)
+        self.assertIsNone(builder.build('Processor.json'))
+        self.assertIsNone(builder.build('Processor.v1_1_0.json', 'ProcessorMetrics'))
+        collection = builder.build('Processor.json', 'ProcessorCollection')
+        self.assertEqual(collection['odata_type'], '#ProcessorCollection.ProcessorCollection')
+        self.assertEqual(collection['schema']['properties']['Members']['items'], schemas['odata-v4.json']['definitions']['id'])
+        self.assertEqual(refs(collection['schema']), [])
+
+    # schema read from the schema cache as the closure refers to them give the same closure
+    @unittest.skipIf(mongomock is None, 'the mongomock package is not installed')
+    def test_cached_schema_reader(self):
+        database = mongomock.MongoClient()['RedfishDB']
+        for source, schema in schemas.items():
+            entry = {'source': source}
+            initializeRedfishServer.store_schema(entry, schema, 'document' if source.startswith('Processor') else 'string')
+            database['json_schema'].insert_one(entry)
+        reader = initializeRedfishServer.CachedSchemaReader(database)
+        closure = initializeRedfishServer.SchemaClosureBuilder(reader).build('Processor.v1_1_0.json')
+        self.assertEqual(closure, self.closure)
+        self.assertNotIn('Processor.json', reader.schemas)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+# test_schema_version_index.py
+# This file tests the schema version index and the removal of superseded schema versions
+# Copyright (C) 2022, PICMG
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import initializeRedfishServer
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+
+# The below function returns the unversioned schema of a namespace, which refers to each of its
+# versions with anyOf, as the DMTF schema do
+def unversioned_schema(namespace, versions):
+    return {'title': '#%s.%s' % (namespace, namespace), 'definitions': {namespace: {
+        'anyOf': [{'$ref': 'http://redfish.dmtf.org/schemas/v1/Resource.json#/definitions/Resource'}] +
+                 [{'$ref': 'http://redfish.dmtf.org/schemas/v1/%s.%s.json#/definitions/%s' % (namespace, version, namespace)}
+                  for version in versions]}}}
+
+
+# The below function returns a versioned schema of a namespace, whose properties refer to the
+# definitions of other schema files
+def versioned_schema(namespace, refs=()):
+    properties = {'Id': {'type': 'string'}}
+    for index, ref in enumerate(refs):
+        properties['Link%d' % index] = {'$ref': 'http://redfish.dmtf.org/schemas/v1/' + ref}
+    return {'title': '#%s' % namespace, 'definitions': {namespace: {'type': 'object', 'properties': properties}}}
+
+
+@unittest.skipIf(mongomock is None, 'the mongomock package is not installed')
+class SchemaVersionIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.client = mongomock.MongoClient()
+        self.database = self.client['RedfishDB']
+        versions = ['v1_0_0', 'v1_1_0', 'v1_2_0', 'v1_3_0']
+        schemas = {'Processor.json': unversioned_schema('Processor', versions),
+                   'Resource.json': {'definitions': {'Resource': {'type': 'object'}}},
+                   'Memory.json': unversioned_schema('Memory', ['v1_0_0', 'v1_1_0']),
+                   'Memory.v1_0_0.json': versioned_schema('Memory'),
+                   'Memory.v1_1_0.json': versioned_schema('Memory'),
+                   'Processor.v1_0_0.json': versioned_schema('Processor'),
+                   # the mockup's version refers to an older version of another namespace
+                   'Processor.v1_1_0.json': versioned_schema('Processor', ['Memory.v1_0_0.json#/definitions/Memory']),
+                   'Processor.v1_2_0.json': versioned_schema('Processor'),
+                   'Processor.v1_3_0.json': versioned_schema('Processor', ['Resource.json#/definitions/Resource'])}
+        for source, schema in schemas.items():
+            entry = {'source': source}
+            initializeRedfishServer.store_schema(entry, schema, 'document')
+            self.database['json_schema'].insert_one(entry)
+        self.database['RedfishObject'].insert_one(initializeRedfishServer.add_odata_fields(
+            {'@odata.id': '/redfish/v1/Systems/1/Processors/1', '@odata.type': '#Processor.v1_1_0.Processor', 'Id': '1'}))
+
+    def build_index(self, schema_versions):
+        builder = initializeRedfishServer.RedfishDbBuilder(
+            {'build_options': {'schema_versions': schema_versions}}, self.client, 'RedfishDB')
+        builder.generate_schema_version_index()
+        return sorted(entry['source'] for entry in self.database['json_schema'].find({}, {'source': 1}))
+
+    def test_all_versions_are_kept(self):
+        self.assertEqual(len(self.build_index('all')), 9)
+        self.assertEqual(self.database['json_schema_index'].count_documents({}), 6)
+
+    # superseded versions that are neither used by the mockup nor referenced by a kept schema are
+    # removed, even though the unversioned schema refers to every version
+    def test_latest_and_referenced(self):
+        self.assertEqual(self.build_index('latest_and_referenced'),
+                         ['Memory.json', 'Memory.v1_0_0.json', 'Memory.v1_1_0.json', 'Processor.json',
+                          'Processor.v1_1_0.json', 'Processor.v1_3_0.json', 'Resource.json'])
+        index = {entry['source']: entry for entry in self.database['json_schema_index'].find({}, {'_id': 0})}
+        self.assertEqual(sorted(index), ['Memory.v1_0_0.json', 'Memory.v1_1_0.json',
+                                         'Processor.v1_1_0.json', 'Processor.v1_3_0.json'])
+        self.assertTrue(index['Processor.v1_3_0.json']['latest'])
+        self.assertEqual(index['Processor.v1_1_0.json']['odata_types'], ['#Processor.v1_1_0.Processor'])
+        odata_type = self.database['odata_type_schema'].find_one({'odata_type': '#Processor.v1_1_0.Processor'})
+        self.assertEqual(odata_type['source'], 'Processor.v1_1_0.json')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+# test_snapshot.py
+# This file tests that a snapshot archive written by export_database restores the documents, indexes
+# and collection options of the Redfish database
+# Copyright (C) 2022, PICMG
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import json
+import shutil
+import datetime
+import tempfile
+import unittest
+import unittest.mock
+import zipfile
+
+import bson
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import initializeRedfishServer
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+# the collection options of a collection compressed with zstd
+compressed = {'storageEngine': {'wiredTiger': {'configString': 'block_compressor=zstd'}}}
+
+
+@unittest.skipIf(mongomock is None, 'the mongomock package is not installed')
+class SnapshotTests(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.snapshot_path = os.path.join(self.folder, 'redfish.snapshot')
+        self.client = mongomock.MongoClient()
+        self.database = self.client['RedfishDB']
+        self.collection_options = {'RedfishObject': compressed}
+        self.database['RedfishObject'].insert_many([
+            {'_odata_id': '/redfish/v1', 'Name': 'Root', 'Count': 2, 'Ratio': 0.5, 'Missing': None,
+             'Created': datetime.datetime(2022, 1, 1), 'Links': {'Members': [{'@odata.id': '/redfish/v1/Systems'}]}},
+            {'_odata_id': '/redfish/v1/Systems', 'Raw': b'\x00\x01', 'Members': []}])
+        self.database['RedfishObject'].create_index([('_odata_id', 1)], unique=True)
+        self.database['json_schema'].insert_one({'source': 'Resource.json', 'version': [1, 0, 0]})
+        self.database['json_schema'].create_index([('source', 1), ('version', -1)])
+        self.database['privileges_table'].insert_one({'uri': '/redfish/v1'})
+        # collections of a staged build and of the previous build are not part of a snapshot
+        self.database['staging.RedfishObject'].insert_one({'build': 'new'})
+        self.database['previous.RedfishObject'].insert_one({'build': 'old'})
+        self.builder = initializeRedfishServer.RedfishDbBuilder({'build_options': {'mongo_batch_size': 1}},
+                                                               self.client, 'RedfishDB')
+        self.created_options = {}
+        self.patches = self.mongomock_snapshot_support()
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        shutil.rmtree(self.folder)
+
+    # returns patches for what mongomock does not implement: listing collections with their options,
+    # creating a collection with options (which are recorded), and reading and inserting raw BSON
+    # documents
+    def mongomock_snapshot_support(self):
+        test = self
+        create_collection = mongomock.database.Database.create_collection
+        insert_many = mongomock.collection.Collection.insert_many
+
+        def list_collections(database):
+            return [{'name': name, 'type': 'collection', 'options': test.collection_options.get(name, {})}
+                    for name in database.list_collection_names()]
+
+        def create_collection_with_options(database, name, **options):
+            test.created_options[(database.name, name)] = options
+            return create_collection(database, name)
+
+        def insert_raw_documents(collection, documents, *args, **kwargs):
+            documents = [bson.decode(document.raw) if isinstance(document, bson.raw_bson.RawBSONDocument) else document
+                         for document in documents]
+            return insert_many(collection, documents, *args, **kwargs)
+
+        return [unittest.mock.patch.object(mongomock.database.Database, 'list_collections', list_collections),
+                unittest.mock.patch.object(mongomock.database.Database, 'create_collection', create_collection_with_options),
+                unittest.mock.patch.object(mongomock.collection.Collection, 'with_options', lambda collection, **kwargs: collection),
+                unittest.mock.patch.object(mongomock.collection.Collection, 'insert_many', insert_raw_documents)]
+
+    # returns the documents of each collection of a database, keyed by collection name
+    def documents(self, database_name):
+        database = self.client[database_name]
+        return {name: sorted(bson.encode(document) for document in database[name].find())
+                for name in database.list_collection_names()}
+
+    # returns the indexes of each collection of a database, keyed by collection name
+    def indexes(self, database_name):
+        database = self.client[database_name]
+        return {name: {index_name: (index['key'], index.get('unique', False))
+                       for index_name, index in database[name].index_information().items()}
+                for name in database.list_collection_names()}
+
+    def test_round_trip(self):
+        expected_documents = self.documents('RedfishDB')
+        expected_indexes = self.indexes('RedfishDB')
+        for name in ['staging.RedfishObject', 'previous.RedfishObject']:
+            del expected_documents[name]
+            del expected_indexes[name]
+        manifest = self.builder.export_database(self.snapshot_path)
+        self.assertEqual(sorted(manifest['collections']), ['RedfishObject', 'json_schema', 'privileges_table'])
+        self.assertEqual(manifest['collections']['RedfishObject']['documents'], 2)
+
+        self.builder.restore_database(self.snapshot_path, 'RestoredDB')
+        self.assertEqual(self.documents('RestoredDB'), expected_documents)
+        self.assertEqual(self.indexes('RestoredDB'), expected_indexes)
+        self.assertEqual(self.created_options, {('RestoredDB', 'RedfishObject'): compressed,
+                                                ('RestoredDB', 'json_schema'): {},
+                                                ('RestoredDB', 'privileges_table'): {}})
+
+    # restoring into the Redfish database replaces the collections it had
+    def test_restore_replaces_database(self):
+        self.builder.export_database(self.snapshot_path)
+        expected = self.documents('RedfishDB')
+        self.database['RedfishObject'].delete_many({})
+        self.database['validation_report'].insert_one({'resource': '/redfish/v1'})
+        self.builder.restore_database(self.snapshot_path)
+        restored = self.documents('RedfishDB')
+        self.assertEqual(restored, {name: documents for name, documents in expected.items()
+                                    if not name.startswith(('staging.', 'previous.'))})
+
+    # a snapshot whose documents do not match the manifest is not restored, and the database is left
+    # unchanged
+    def test_corrupt_snapshot(self):
+        self.builder.export_database(self.snapshot_path)
+        with zipfile.ZipFile(self.snapshot_path) as archive:
+            members = {name: archive.read(name) for name in archive.namelist()}
+        manifest = json.loads(members['manifest.json'])
+        manifest['collections']['json_schema']['sha256'] = '0' * 64
+        members['manifest.json'] = json.dumps(manifest).encode()
+        with zipfile.ZipFile(self.snapshot_path, 'w') as archive:
+            for name, data in members.items():
+                archive.writestr(name, data)
+        before = self.documents('RedfishDB')
+        with self.assertRaises(RuntimeError):
+            self.builder.restore_database(self.snapshot_path)
+        self.assertEqual(self.documents('RedfishDB'), before)
+
+    def test_unsupported_format_version(self):
+        with zipfile.ZipFile(self.snapshot_path, 'w') as archive:
+            archive.writestr('manifest.json', json.dumps({'format_version': 0, 'collections': {}}))
+        with self.assertRaises(RuntimeError):
+            self.builder.restore_database(self.snapshot_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+# test_staged_build.py
+# This file tests the cutover and rollback of staged builds, and the recovery of an interrupted
+# cutover
+# Copyright (C) 2022, PICMG
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import unittest
+import unittest.mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import initializeRedfishServer
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+
+# The below exception stands in for the build process being stopped part way through a cutover
+class Interrupted(Exception):
+    pass
+
+
+@unittest.skipIf(mongomock is None, 'the mongomock package is not installed')
+class StagedBuildTests(unittest.TestCase):
+    def setUp(self):
+        self.client = mongomock.MongoClient()
+        self.database = self.client['RedfishDB']
+        self.builder = initializeRedfishServer.RedfishDbBuilder({'build_options': {}}, self.client, 'RedfishDB')
+        # the live build, with a collection that the staged build does not have
+        for name in ['RedfishObject', 'json_schema', 'validation_report']:
+            self.database[name].insert_one({'build': 'old', 'name': name})
+        # the staged build, with a collection that the live build does not have
+        for name in ['RedfishObject', 'json_schema', 'json_schema_closure']:
+            self.database['staging.' + name].insert_one({'build': 'new', 'name': name})
+        self.database['staging.RedfishObject'].create_index([('_odata_id', 1)], unique=True)
+        # the previous build kept by the cutover before, with a collection that no build has now
+        self.database['previous.RedfishObject'].insert_one({'build': 'older'})
+        self.database['previous.privileges_trie'].insert_one({'build': 'older'})
+
+    # returns the build that each collection holds, keyed by collection name
+    def state(self):
+        return {name: sorted(document.get('build') for document in self.database[name].find())
+                for name in sorted(self.database.list_collection_names())}
+
+    def swap(self, source_prefix='staging.', displaced_prefix='previous.'):
+        self.builder.swap_collection_generations(self.database, source_prefix, displaced_prefix)
+
+    def test_cutover(self):
+        self.swap()
+        self.assertEqual(self.state(), {
+            'RedfishObject': ['new'], 'json_schema': ['new'], 'json_schema_closure': ['new'],
+            'previous.RedfishObject': ['old'], 'previous.json_schema': ['old'], 'previous.validation_report': ['old']})
+        # the indexes of the staged collections are kept
+        self.assertIn('_odata_id_1', self.database['RedfishObject'].index_information())
+
+    def test_rollback(self):
+        self.swap()
+        self.swap('previous.', 'staging.')
+        self.assertEqual(self.state(), {
+            'RedfishObject': ['old'], 'json_schema': ['old'], 'validation_report': ['old'],
+            'staging.RedfishObject': ['new'], 'staging.json_schema': ['new'], 'staging.json_schema_closure': ['new']})
+
+    # no documents are copied by a cutover
+    def test_cutover_does_not_copy(self):
+        with unittest.mock.patch.object(mongomock.collection.Collection, 'aggregate') as aggregate, \
+                unittest.mock.patch.object(mongomock.collection.Collection, 'insert_many') as insert_many:
+            self.swap()
+        aggregate.assert_not_called()
+        insert_many.assert_not_called()
+
+    # a cutover that is stopped after any number of renames is completed by the next staged build
+    # (or rollback), with the same result as a cutover that was not interrupted
+    def test_recover_interrupted_cutover(self):
+        self.swap()
+        expected = self.state()
+        # three live collections are renamed aside, and three staged collections into their place
+        rename_count = 6
+        for completed in range(rename_count):
+            with self.subTest(completed=completed):
+                self.client.drop_database('RedfishDB')
+                self.setUp()
+                original_rename = mongomock.collection.Collection.rename
+                calls = []
+
+                def rename(collection, new_name, **kwargs):
+                    if len(calls) == completed:
+                        raise Interrupted()
+                    calls.append(new_name)
+                    return original_rename(collection, new_name, **kwargs)
+
+                with unittest.mock.patch.object(mongomock.collection.Collection, 'rename', rename):
+                    with self.assertRaises(Interrupted):
+                        self.swap()
+                self.assertIsNotNone(self.database[initializeRedfishServer.cutover_collection].find_one())
+                self.builder.recover_staged_cutover()
+                self.assertEqual(self.state(), expected)
+
+    def test_recover_without_cutover(self):
+        before = self.state()
+        self.builder.recover_staged_cutover()
+        self.assertEqual(self.state(), before)
+
+    def test_begin_staged_build_recovers_cutover(self):
+        with unittest.mock.patch.object(mongomock.collection.Collection, 'rename', side_effect=Interrupted()):
+            with self.assertRaises(Interrupted):
+                self.swap()
+        self.builder.config['build_options']['staged'] = True
+        self.builder.begin_staged_build()
+        state = self.state()
+        self.assertEqual(state['RedfishObject'], ['new'])
+        self.assertFalse(any(name.startswith('staging.') for name in state))
+        self.assertNotIn(initializeRedfishServer.cutover_collection, state)
+
+
+if __name__ == '__main__':
+    unittest.main()
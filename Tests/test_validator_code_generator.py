@@ -0,0 +1,193 @@
+# test_validator_code_generator.py
+# This file tests that the validators generated by ValidatorCodeGenerator accept and reject the
+# same documents as the jsonschema package
+# Copyright (C) 2022, PICMG
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import initializeRedfishServer
+
+try:
+    import jsonschema
+except ImportError:
+    jsonschema = None
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+
+# each case is a schema and the documents that are validated against it
+cases = [
+    # type
+    ({'type': 'integer'}, [1, -3, 1.0, 1.5, True, False, '1', None]),
+    ({'type': 'number'}, [1, 1.5, True, '1.5', None]),
+    ({'type': 'string'}, ['', 'a', 1, None]),
+    ({'type': 'boolean'}, [True, False, 0, 1, 'true']),
+    ({'type': 'null'}, [None, 0, False, '']),
+    ({'type': 'object'}, [{}, {'a': 1}, [], 'a']),
+    ({'type': 'array'}, [[], [1], {}, 'a']),
+    ({'type': ['string', 'null']}, ['a', None, 1, False]),
+    # enum and const
+    ({'enum': [1, 2]}, [1, 2, 1.0, 3, True, False, '1']),
+    ({'enum': [0, None]}, [0, 0.0, False, None]),
+    ({'enum': [True]}, [True, 1, 1.0, False]),
+    ({'enum': ['Enabled', 'Disabled']}, ['Enabled', 'Absent', None, 1, ['Enabled']]),
+    ({'enum': [[1, 2], {'a': 1}]}, [[1, 2], [True, 2], {'a': 1}, {'a': True}, [1]]),
+    ({'const': 0}, [0, 0.0, False, None, '0']),
+    ({'const': False}, [False, 0, None]),
+    ({'const': [1, True]}, [[1, True], [True, 1], [1, 1]]),
+    ({'const': {'a': [0]}}, [{'a': [0]}, {'a': [False]}, {'a': [0], 'b': 1}]),
+    # pattern and string lengths
+    ({'pattern': '^[A-Z][a-z]+$'}, ['Enabled', 'enabled', 'EnabledX', 5, None]),
+    ({'pattern': 'b'}, ['abc', 'xyz']),
+    ({'minLength': 2, 'maxLength': 3}, ['a', 'ab', 'abc', 'abcd', 5]),
+    # numeric limits
+    ({'minimum': 0, 'maximum': 10}, [-1, 0, 10, 11, 5.5, 'a']),
+    ({'exclusiveMinimum': 0, 'exclusiveMaximum': 10}, [0, 0.1, 9.9, 10, 'a']),
+    # required
+    ({'required': ['Id', 'Name']}, [{'Id': '1', 'Name': 'a'}, {'Id': '1'}, {}, [], 'a']),
+    # properties, patternProperties and additionalProperties
+    ({'type': 'object', 'properties': {'Id': {'type': 'string'}, 'Count': {'type': 'integer'}}},
+     [{'Id': 'a', 'Count': 1}, {'Id': 1}, {'Count': True}, {'Other': None}]),
+    ({'properties': {'Id': {'type': 'string'}}, 'additionalProperties': False},
+     [{'Id': 'a'}, {'Id': 'a', 'Other': 1}, {}]),
+    ({'properties': {'Id': {}}, 'patternProperties': {'^[A-Za-z]+@odata\\.count$': {'type': 'integer'}},
+      'additionalProperties': False},
+     [{'Id': 1, 'Members@odata.count': 2}, {'Members@odata.count': 'a'}, {'@odata.count': 1}]),
+    ({'properties': {'Id': {}}, 'additionalProperties': {'type': 'string'}},
+     [{'Id': 1, 'Other': 'a'}, {'Other': 1}]),
+    # items
+    ({'type': 'array', 'items': {'type': 'integer'}, 'minItems': 1, 'maxItems': 2},
+     [[1], [1, 2], [], [1, 2, 3], [1, 'a'], [True]]),
+    # $ref to the definitions and to the root of the schema
+    ({'definitions': {'Status': {'type': 'object', 'properties': {'State': {'enum': ['Enabled', 'Disabled']}},
+                                 'additionalProperties': False}},
+      'type': 'object', 'properties': {'Status': {'$ref': '#/definitions/Status'}}},
+     [{'Status': {'State': 'Enabled'}}, {'Status': {'State': 'Absent'}}, {'Status': {'Health': 'OK'}}, {'Status': 1}]),
+    ({'type': 'object', 'properties': {'Name': {'type': 'string'}, 'Child': {'$ref': '#'}}, 'additionalProperties': False},
+     [{'Name': 'a', 'Child': {'Name': 'b', 'Child': {}}}, {'Child': {'Child': {'Name': 1}}}, {'Child': {'Other': 1}}]),
+    # combinators
+    ({'anyOf': [{'type': 'string'}, {'type': 'null'}]}, ['a', None, 1]),
+    ({'anyOf': [{'$ref': '#/definitions/Id'}, {'type': 'object', 'required': ['Id']}],
+      'definitions': {'Id': {'type': 'string', 'pattern': '^[0-9]+$'}}},
+     ['12', 'a', {'Id': 1}, {}, None]),
+    ({'oneOf': [{'type': 'integer'}, {'minimum': 2}]}, [1, 3, 2.5, 'a']),
+    ({'allOf': [{'type': 'string'}, {'maxLength': 2}]}, ['a', 'abc', 1]),
+    ({'not': {'type': 'string'}}, ['a', 1, None]),
+]
+
+
+# The below function returns the validate function of the validator generated for a schema
+def generated_validator(schema):
+    namespace = {}
+    exec(initializeRedfishServer.ValidatorCodeGenerator(schema).generate(), namespace)
+    return namespace['validate']
+
+
+@unittest.skipIf(jsonschema is None, 'the jsonschema package is not installed')
+class ValidatorCodeGeneratorTests(unittest.TestCase):
+    # each document is accepted by the generated validator if and only if jsonschema accepts it
+    def test_same_results_as_jsonschema(self):
+        for schema, documents in cases:
+            validate = generated_validator(schema)
+            reference = jsonschema.Draft7Validator(schema)
+            for document in documents:
+                with self.subTest(schema=schema, document=document):
+                    self.assertEqual(validate(document) == [], reference.is_valid(document))
+
+    # violations are reported at the path of the value that has them
+    def test_violation_paths(self):
+        schema = {'type': 'object', 'properties': {
+            'Status': {'type': 'object', 'properties': {'State': {'enum': ['Enabled']}}},
+            'Links': {'type': 'array', 'items': {'type': 'object', 'required': ['@odata.id']}}},
+            'additionalProperties': False}
+        violations = generated_validator(schema)({'Status': {'State': 'Absent'}, 'Links': [{'@odata.id': '/a'}, {}],
+                                                  'Other': 1})
+        self.assertEqual(sorted(path for path, message in violations), ['/Links/1', '/Other', '/Status/State'])
+
+    # when no branch of an anyOf matches, the violations of the closest branch are reported
+    def test_any_of_reports_closest_branch(self):
+        schema = {'anyOf': [{'type': 'null'},
+                            {'type': 'object', 'properties': {'Id': {'type': 'string'}}}]}
+        self.assertEqual(generated_validator(schema)({'Id': 1}), [('/Id', 'is not of type string')])
+        violations = generated_validator(schema)(1)
+        self.assertEqual(violations, [('', 'is not valid under any of the given schemas')])
+
+    # the fields added by the build are not validated against the schema of the resource
+    def test_validate_resource_skips_build_fields(self):
+        folder = tempfile.mkdtemp()
+        try:
+            schema = {'type': 'object', 'properties': {'@odata.id': {'type': 'string'}, '@odata.type': {'type': 'string'},
+                                                       'Id': {'type': 'string'}},
+                      'additionalProperties': False}
+            path = initializeRedfishServer.write_validator((os.path.join(folder, 'validator.bin'), 'test', schema))
+            validator_paths = {'#Thing.v1_0_0.Thing': path}
+            data = initializeRedfishServer.add_odata_fields(
+                {'@odata.id': '/redfish/v1/Things/1', '@odata.type': '#Thing.v1_0_0.Thing', 'Id': '1'})
+            self.assertIn('@odata.etag', data)
+            self.assertEqual(initializeRedfishServer.validate_resource(validator_paths, data), [])
+            data['Other'] = 1
+            self.assertEqual(initializeRedfishServer.validate_resource(validator_paths, data),
+                             [('/Other', 'is not an allowed property')])
+            self.assertIsNone(initializeRedfishServer.validate_resource({}, data))
+        finally:
+            shutil.rmtree(folder)
+
+    # validate_mockup writes one validation_report document, and one report file entry, for each
+    # resource with violations
+    @unittest.skipIf(mongomock is None, 'the mongomock package is not installed')
+    def test_validate_mockup(self):
+        folder = tempfile.mkdtemp()
+        try:
+            client = mongomock.MongoClient()
+            database = client['RedfishDB']
+            schema = {'definitions': {'Thing': {'type': 'object', 'additionalProperties': False, 'properties': {
+                '@odata.id': {'type': 'string'}, '@odata.type': {'type': 'string'}, 'Id': {'type': 'string'}}}}}
+            entry = {'source': 'Thing.v1_0_0.json'}
+            initializeRedfishServer.store_schema(entry, schema, 'document')
+            database['json_schema'].insert_one(entry)
+            database['odata_type_schema'].insert_one({'odata_type': '#Thing.v1_0_0.Thing', 'source': 'Thing.v1_0_0.json'})
+            for index, extra in enumerate([{}, {'Other': 1}, {'Id': 3, 'Other': 2}]):
+                database['RedfishObject'].insert_one(initializeRedfishServer.add_odata_fields(dict(
+                    {'@odata.id': '/redfish/v1/Things/%d' % index, '@odata.type': '#Thing.v1_0_0.Thing', 'Id': str(index)},
+                    **extra)))
+            report_path = os.path.join(folder, 'report.json')
+            builder = initializeRedfishServer.RedfishDbBuilder(
+                {'build_options': {'validation': 'report', 'validation_report_file': report_path,
+                                   'artifact_cache_dir': os.path.join(folder, 'cache')}}, client, 'RedfishDB')
+            builder.validate_mockup()
+            stored = {entry['resource']: entry['violation_count'] for entry in database['validation_report'].find()}
+            self.assertEqual(stored, {'/redfish/v1/Things/1': 1, '/redfish/v1/Things/2': 2})
+            with open(report_path, 'r') as f:
+                text = f.read()
+            report = json.loads(text)
+            self.assertEqual(text, json.dumps(report, indent=2))
+            self.assertEqual((report['checked_resources'], report['violation_count']), (3, 3))
+            self.assertEqual([entry['resource'] for entry in report['resources']],
+                             ['/redfish/v1/Things/1', '/redfish/v1/Things/2'])
+        finally:
+            shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    unittest.main()
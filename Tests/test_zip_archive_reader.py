@@ -0,0 +1,199 @@
+# test_zip_archive_reader.py
+# This file tests that ZipArchiveReader reads zip archives as ZipFile does
+# Copyright (C) 2022, PICMG
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+import json
+import shutil
+import zipfile
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import initializeRedfishServer
+
+
+# The below class is a write-only file object that cannot seek, so that ZipFile writes a data
+# descriptor after each member instead of its sizes in the local header
+class UnseekableFile:
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, data):
+        return self.f.write(data)
+
+    def flush(self):
+        self.f.flush()
+
+
+# The below function returns the json text of a synthetic mockup resource
+def resource(index):
+    return json.dumps({'@odata.id': '/redfish/v1/Systems/%d' % index, '@odata.type': '#ComputerSystem.v1_0_0.ComputerSystem',
+                       'Id': str(index), 'Name': 'System %d' % index, 'Description': 'x' * (index % 300)})
+
+
+class ZipArchiveReaderTests(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    # checks that the reader lists the same members as ZipFile, in the same order, and that each
+    # member reads the same, both from its location and by its name
+    def assert_same_as_zipfile(self, archive_path):
+        reader = initializeRedfishServer.ZipArchiveReader(archive_path)
+        try:
+            with zipfile.ZipFile(archive_path) as archive:
+                members = list(reader.members())
+                self.assertEqual([name for name, location in members], archive.namelist())
+                for name, location in members:
+                    self.assertEqual(reader.read(name, location), archive.read(name), name)
+                for name in archive.namelist()[:10]:
+                    self.assertEqual(reader.read(name), archive.read(name), name)
+                # members read the same after the pages of the map have been released
+                reader.release(0, len(reader.archive_map))
+                for name, location in members[:10]:
+                    self.assertEqual(reader.read(name, location), archive.read(name), name)
+            return members
+        finally:
+            reader.close()
+
+    def test_stored_and_deflated_members(self):
+        archive_path = os.path.join(self.folder, 'mockup.zip')
+        with zipfile.ZipFile(archive_path, 'w') as archive:
+            for index in range(50):
+                compression = zipfile.ZIP_STORED if index % 2 else zipfile.ZIP_DEFLATED
+                archive.writestr('public-rackmount1/Systems/%d/index.json' % index, resource(index), compression)
+            archive.writestr('public-rackmount1/empty.json', '', zipfile.ZIP_DEFLATED)
+            archive.writestr('public-rackmount1/Système/index.json', resource(50), zipfile.ZIP_DEFLATED)
+            archive.comment = b'synthetic mockup'
+        self.assert_same_as_zipfile(archive_path)
+
+    def test_directory_entries(self):
+        archive_path = os.path.join(self.folder, 'mockup.zip')
+        with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('public-rackmount1/', '')
+            archive.writestr('public-rackmount1/Systems/', '')
+            archive.writestr('public-rackmount1/Systems/index.json', resource(0))
+        members = self.assert_same_as_zipfile(archive_path)
+        self.assertEqual(len(members), 3)
+
+    def test_data_descriptors(self):
+        archive_path = os.path.join(self.folder, 'mockup.zip')
+        with open(archive_path, 'wb') as f:
+            with zipfile.ZipFile(UnseekableFile(f), 'w', zipfile.ZIP_DEFLATED) as archive:
+                for index in range(20):
+                    archive.writestr('public-rackmount1/Systems/%d/index.json' % index, resource(index))
+        with zipfile.ZipFile(archive_path) as archive:
+            self.assertTrue(all(info.flag_bits & 0x8 for info in archive.infolist()))
+        self.assert_same_as_zipfile(archive_path)
+
+    # more than 65535 members need the zip64 end of central directory record
+    def test_zip64_member_count(self):
+        archive_path = os.path.join(self.folder, 'mockup.zip')
+        with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_STORED) as archive:
+            for index in range(70000):
+                archive.writestr('public-rackmount1/Systems/%d/index.json' % index, '{"Id": "%d"}' % index)
+        reader = initializeRedfishServer.ZipArchiveReader(archive_path)
+        try:
+            self.assertEqual(reader.entry_count, 70000)
+        finally:
+            reader.close()
+        self.assert_same_as_zipfile(archive_path)
+
+    def test_zip64_extra_fields(self):
+        archive_path = os.path.join(self.folder, 'mockup.zip')
+        with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for index in range(10):
+                with archive.open('public-rackmount1/Systems/%d/index.json' % index, 'w', force_zip64=True) as f:
+                    f.write(resource(index).encode('utf-8'))
+        self.assert_same_as_zipfile(archive_path)
+
+    # members compressed with other methods are read with ZipFile
+    def test_bzip2_member_fallback(self):
+        archive_path = os.path.join(self.folder, 'mockup.zip')
+        with zipfile.ZipFile(archive_path, 'w') as archive:
+            archive.writestr('public-rackmount1/Systems/0/index.json', resource(0), zipfile.ZIP_BZIP2)
+            archive.writestr('public-rackmount1/Systems/1/index.json', resource(1), zipfile.ZIP_DEFLATED)
+        self.assert_same_as_zipfile(archive_path)
+
+    # encrypted members are read with ZipFile, which requires a password for them
+    def test_encrypted_member_fallback(self):
+        archive_path = os.path.join(self.folder, 'mockup.zip')
+        with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_STORED) as archive:
+            archive.writestr('public-rackmount1/Systems/0/index.json', resource(0))
+            archive.writestr('public-rackmount1/Systems/1/index.json', resource(1))
+        # mark the second member as encrypted in its local header and central directory record
+        with open(archive_path, 'r+b') as f:
+            data = bytearray(f.read())
+            for signature, flags_offset in [(b'PK\x03\x04', 6), (b'PK\x01\x02', 8)]:
+                offset = data.rfind(signature)
+                data[offset + flags_offset] |= 0x1
+            f.seek(0)
+            f.write(data)
+        reader = initializeRedfishServer.ZipArchiveReader(archive_path)
+        try:
+            with zipfile.ZipFile(archive_path) as archive:
+                members = dict(reader.members())
+                self.assertEqual(reader.read('public-rackmount1/Systems/0/index.json'),
+                                 archive.read('public-rackmount1/Systems/0/index.json'))
+                with self.assertRaises(RuntimeError):
+                    archive.read('public-rackmount1/Systems/1/index.json')
+                with self.assertRaises(RuntimeError):
+                    reader.read('public-rackmount1/Systems/1/index.json', members['public-rackmount1/Systems/1/index.json'])
+        finally:
+            reader.close()
+
+    def test_missing_member(self):
+        archive_path = os.path.join(self.folder, 'mockup.zip')
+        with zipfile.ZipFile(archive_path, 'w') as archive:
+            archive.writestr('public-rackmount1/index.json', resource(0))
+        reader = initializeRedfishServer.ZipArchiveReader(archive_path)
+        try:
+            with self.assertRaises(KeyError):
+                reader.read('public-rackmount1/missing.json')
+        finally:
+            reader.close()
+
+    def test_corrupt_member(self):
+        archive_path = os.path.join(self.folder, 'mockup.zip')
+        with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_STORED) as archive:
+            archive.writestr('public-rackmount1/index.json', resource(0))
+        with open(archive_path, 'r+b') as f:
+            data = bytearray(f.read())
+            offset = data.find(b'ComputerSystem')
+            data[offset] ^= 0xFF
+            f.seek(0)
+            f.write(data)
+        reader = initializeRedfishServer.ZipArchiveReader(archive_path)
+        try:
+            with self.assertRaises(zipfile.BadZipFile):
+                reader.read('public-rackmount1/index.json')
+        finally:
+            reader.close()
+
+    def test_not_a_zip_file(self):
+        for content in [b'', b'not a zip file']:
+            archive_path = os.path.join(self.folder, 'mockup.zip')
+            with open(archive_path, 'wb') as f:
+                f.write(content)
+            with self.assertRaises(zipfile.BadZipFile):
+                initializeRedfishServer.ZipArchiveReader(archive_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -17,325 +17,3582 @@
 
 import os
 import re
-
-import wget
+import mmap
+import posixpath
+import tempfile
+import concurrent.futures
+import functools
+import itertools
+import hashlib
+import struct
+import marshal
+import sys
+import time
+import argparse
+import multiprocessing
+import gzip
+import zlib
+import logging
+import contextlib
+import cProfile
+import tracemalloc
+import asyncio
+import inspect
+import collections
+import threading
+
+import urllib.error
+import urllib.request
+import zipfile
 from zipfile import ZipFile
-import shutil
 import json
 import pymongo
-
-credentials = {}
-configJson = {}
-
-
-# The below function gets the MongoClient URL and database name from config file
-def get_mongo_creds():
-    mongo_client_url = credentials['mongo_creds']['mongo_client_url']
-    mongo_database = credentials['mongo_creds']['mongo_database']
-    return mongo_client_url, mongo_database
-
-
-# The below function drops the MongoDB database
-def drop_mongo_collection(collection_name):
-    mongo_client_url, mongo_database = get_mongo_creds()
-    print('Dropping Collection : ', collection_name)
-    client = pymongo.MongoClient(mongo_client_url)
-    database = client[mongo_database]
-    collection = database[collection_name]
-    collection.drop()
-
-
-# The below function is used to insert data into the MongoDB database
-def execute_mongo_query(data, table):
-    mongo_client_url, mongo_database = get_mongo_creds()
-    client = pymongo.MongoClient(mongo_client_url)
-    database = client[mongo_database]
-    collection = database[table]
+import bson
+import bson.raw_bson
+
+# peak memory use is reported where the resource module is available
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# the compressed storage profile uses zstd and brotli when they are installed
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+open_archives = threading.local()
+snapshot_format_version = 1
+# the collection that records a staged build cutover while it is in progress (see
+# swap_collection_generations)
+cutover_collection = 'build_cutover'
+# the collections that are built from the other collections of the database rather than from
+# source files.  An incremental build removes the stale documents of the other collections before
+# it builds these (see BuildManifest.remove_stale_documents).
+derived_collections = ['privileges_trie', 'odata_type_schema', 'json_schema_index', 'json_schema_closure',
+                       'validation_report']
+# serializes the updates of artifact cache indexes within this process, and guards
+# artifact_url_locks.  artifact_url_locks holds a lock for each (artifact cache folder, url), so an
+# artifact fetched by several builds at the same time (e.g. in a batch build) is only downloaded
+# once, and the other builds find it in the cache.
+artifact_cache_lock = threading.Lock()
+artifact_url_locks = {}
+# the validators loaded by this process (see load_validator), keyed by the path of their cache file
+loaded_validators = {}
+logger = logging.getLogger('initializeRedfishServer')
+
+# The indexes created on the database after it has been loaded.  Each entry names a collection,
+# the index keys (as [field, direction] pairs) and, optionally, whether the index is unique.
+# Additional indexes can be listed in the "indexes" build option using the same format.
+index_specs = [
+    {'collection': 'RedfishObject', 'keys': [['_odata_id', 1]], 'unique': True},
+    {'collection': 'RedfishObject', 'keys': [['_odata_type', 1]]},
+    {'collection': 'RedfishObject', 'keys': [['_odata_id', 1], ['_etag', 1]]},
+    {'collection': 'RedfishObject', 'keys': [['_parent', 1], ['_odata_id', 1]]},
+    {'collection': 'RedfishObject', 'keys': [['_depth', 1], ['_odata_id', 1]]},
+    {'collection': 'RedfishObject', 'keys': [['_path_segments', 1]]},
+    {'collection': 'collection_members', 'keys': [['_collection', 1]], 'unique': True},
+    {'collection': 'json_schema', 'keys': [['source', 1]], 'unique': True},
+    {'collection': 'json_schema_closure', 'keys': [['source', 1]], 'unique': True},
+    {'collection': 'json_schema_closure', 'keys': [['odata_type', 1]]},
+    {'collection': 'json_schema_index', 'keys': [['namespace', 1], ['major', 1], ['minor', 1], ['errata', 1]], 'unique': True},
+    {'collection': 'json_schema_index', 'keys': [['namespace', 1], ['latest', 1]]},
+    {'collection': 'odata_type_schema', 'keys': [['odata_type', 1]], 'unique': True},
+    {'collection': 'privileges_table', 'keys': [['uri', 1]], 'unique': True},
+    {'collection': 'privileges_table', 'keys': [['Entity', 1]]},
+    {'collection': 'MessageRegistry', 'keys': [['Id', 1]]},
+    {'collection': 'PrivilegeRegistry', 'keys': [['Id', 1]]},
+    {'collection': 'registry_versions', 'keys': [['Name', 1]], 'unique': True},
+]
+
+
+# The below class wraps a database so that every collection name used through it is prefixed.
+# A staged build writes its collections under the staging prefix (e.g. staging.RedfishObject) in
+# the Redfish database itself, so the loaders use the same collection names in every build mode,
+# and the staged collections can later be renamed into place without copying them.
+class PrefixedDatabase:
+    def __init__(self, database, prefix):
+        self.database = database
+        self.prefix = prefix
+        self.name = database.name
+
+    def __getattr__(self, name):
+        return getattr(self.database, name)
+
+    def __getitem__(self, name):
+        return self.database[self.prefix + name]
+
+    def get_collection(self, name, **kwargs):
+        return self.database.get_collection(self.prefix + name, **kwargs)
+
+    def create_collection(self, name, **kwargs):
+        return self.database.create_collection(self.prefix + name, **kwargs)
+
+    def drop_collection(self, name):
+        return self.database.drop_collection(self.prefix + name)
+
+    def list_collection_names(self):
+        return [name[len(self.prefix):] for name in self.database.list_collection_names() if name.startswith(self.prefix)]
+
+    def list_collections(self):
+        for info in self.database.list_collections():
+            if info['name'].startswith(self.prefix):
+                yield dict(info, name=info['name'][len(self.prefix):])
+
+
+# The below function adds the easily searchable odata fields to a Redfish resource
+def add_odata_fields(data):
     if '@odata.id' in data:
         # create an easily searchable odata.id field
         data['_odata_id'] = data['@odata.id']
         data['_odata_type'] = data['@odata.type'].split('.')[0].replace('#', '')
-    result = collection.insert_one(data)
-    print('Query Executed for : ', table, result)
+        # the full @odata.type, which (unlike a field name containing a dot) can be used in queries
+        data['_odata_full_type'] = data['@odata.type']
+        add_hierarchy_fields(data)
+        set_etag(data)
+    return data
+
+
+# The below function returns a uri without its query, fragment and trailing '/'
+def normalize_uri(uri):
+    return uri.split('?')[0].split('#')[0].rstrip('/')
+
+
+# The below function adds the fields that place a Redfish resource in the uri hierarchy: the
+# segments of its uri (_path_segments), the number of segments (_depth) and the normalized uri of
+# its parent (_parent, None for the top of the hierarchy).  Normalized uris have no trailing '/'.
+def add_hierarchy_fields(data):
+    segments = [segment for segment in normalize_uri(data['@odata.id']).split('/') if segment != '']
+    data['_path_segments'] = segments
+    data['_depth'] = len(segments)
+    data['_parent'] = '/' + '/'.join(segments[:-1]) if segments else None
+    return data
+
+
+# The below function returns a query filter for the resources directly below a uri.  The filter
+# is answered with a range scan of the _parent index.
+def children_filter(uri):
+    return {'_parent': normalize_uri(uri)}
+
+
+# The below function returns a query filter for all the resources below a uri (not including the
+# resource at the uri).  The filter is a prefix match on _odata_id, which is answered with a range
+# scan of the _odata_id index.  If max_depth is given, only resources up to that many segments
+# below the uri are included.
+def subtree_filter(uri, max_depth=None):
+    prefix = normalize_uri(uri) + '/'
+    query = {'_odata_id': {'$regex': '^' + re.escape(prefix) + '.'}}
+    if max_depth is not None:
+        query['_depth'] = {'$lte': len([segment for segment in prefix.split('/') if segment != '']) + max_depth}
+    return query
+
+
+# The below function returns the collection membership document for a Redfish resource collection,
+# or None if the resource is not a collection.  The membership document holds the collection's
+# uri, its member uris in order and the member count.
+def collection_membership(data):
+    if '@odata.id' not in data or not isinstance(data.get('Members'), list):
+        return None
+    members = [member['@odata.id'] for member in data['Members'] if isinstance(member, dict) and '@odata.id' in member]
+    return {'collection': data['@odata.id'], '_collection': normalize_uri(data['@odata.id']),
+            'members': members, 'count': len(members)}
+
+
+# The below function returns a strong ETag for a Redfish resource.  The ETag is a hash of the
+# resource's canonical json form (sorted keys, no whitespace), excluding the internal fields
+# (those starting with '_') and the @odata.etag property itself.
+def compute_etag(data):
+    content = {key: value for key, value in data.items() if not key.startswith('_') and key != '@odata.etag'}
+    canonical = json.dumps(content, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return '"' + hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:32] + '"'
+
+
+# The below function stores the ETag of a Redfish resource in its @odata.etag property and in the
+# indexed _etag field
+def set_etag(data):
+    data['@odata.etag'] = data['_etag'] = compute_etag(data)
+    return data
+
+
+# The below function recomputes the ETag of the resources in a collection that match a filter.
+# It is used after a resource has been updated in the database.  The whole resource is written
+# back, since '@odata.etag' in an update operator would be taken as the path of a nested field.
+def refresh_etags(collection, filter):
+    for data in collection.find(filter):
+        if data.get('_etag') != compute_etag(data):
+            collection.replace_one({'_id': data['_id']}, set_etag(data))
+
+
+# The below function returns the peak resident set size of this process in bytes, or None if it
+# is not available
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# The below function returns the CPU time (user and system) of this process and of its finished
+# child processes (e.g. the parse workers)
+def cpu_seconds():
+    if resource is None:
+        return time.process_time(), 0.0
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time(), children.ru_utime + children.ru_stime
+
+
+# The below class records the instrumentation of a build: the wall and CPU time of each phase,
+# the documents, bytes and bulk write latencies of each collection, and the peak memory use.
+# Phases are nested with the phase() context manager and are named by their path (e.g.
+# "mockups/resources").  When trace_memory is set, the peak traced Python memory of each top
+# level phase and the largest allocation sites are also recorded.  The CPU time and memory are
+# those of the whole process, so the metrics of builds that run at the same time in one process
+# (see run_batch_build) include each other's CPU time and memory; only their wall clock times are
+# their own.
+class BuildMetrics:
+    latency_buckets = [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0]
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.started = time.time()
+        self.start_time = time.perf_counter()
+        self.phases = []
+        self.phase_stack = []
+        self.stages = []
+        self.collections = {}
+        self.top_allocations = []
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    # records the time taken by the enclosed block as a phase of the build
+    @contextlib.contextmanager
+    def phase(self, name):
+        path = '/'.join(self.phase_stack + [name])
+        top_level = len(self.phase_stack) == 0
+        self.phase_stack.append(name)
+        logger.info('Starting phase %s', path)
+        if self.trace_memory and top_level:
+            tracemalloc.reset_peak()
+        start_wall = time.perf_counter()
+        start_cpu, start_child_cpu = cpu_seconds()
+        try:
+            yield
+        finally:
+            self.phase_stack.pop()
+            end_cpu, end_child_cpu = cpu_seconds()
+            record = {'phase': path,
+                      'wall_seconds': time.perf_counter() - start_wall,
+                      'cpu_seconds': end_cpu - start_cpu,
+                      'child_cpu_seconds': end_child_cpu - start_child_cpu,
+                      'peak_rss_bytes': peak_rss_bytes()}
+            if self.trace_memory and top_level:
+                record['traced_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            self.phases.append(record)
+            logger.info('Finished phase %s in %.3f s (cpu %.3f s)', path, record['wall_seconds'], record['cpu_seconds'])
+
+    # records the start and end (perf_counter) times of a stage of the async build engine.  Stages
+    # run at the same time, so they are recorded as offsets from the start of the build rather than
+    # as phases.
+    def record_stage(self, name, start, end):
+        self.stages.append({'stage': name, 'start_seconds': start - self.start_time,
+                            'end_seconds': end - self.start_time, 'wall_seconds': end - start})
+        logger.info('Finished stage %s in %.3f s', name, end - start)
+
+    # records a bulk write of documents (of the given estimated size) to a collection
+    def record_write(self, table, documents, size, seconds):
+        stats = self.collections.setdefault(table, {
+            'documents': 0, 'bytes': 0, 'batches': 0, 'write_seconds': 0.0,
+            'latency_counts': [0] * (len(self.latency_buckets) + 1)})
+        stats['documents'] += documents
+        stats['bytes'] += size
+        stats['batches'] += 1
+        stats['write_seconds'] += seconds
+        bucket = 0
+        while bucket < len(self.latency_buckets) and seconds > self.latency_buckets[bucket]:
+            bucket += 1
+        stats['latency_counts'][bucket] += 1
+
+    # records the allocation sites that hold the most traced memory
+    def record_top_allocations(self, limit=10):
+        if not self.trace_memory:
+            return
+        for stat in tracemalloc.take_snapshot().statistics('lineno')[:limit]:
+            self.top_allocations.append({'location': str(stat.traceback), 'bytes': stat.size, 'blocks': stat.count})
+            logger.info('Allocated %10d bytes at %s', stat.size, stat.traceback)
+
+    # returns the report of the build as a json document
+    def report(self):
+        return {'started': self.started,
+                'wall_seconds': time.perf_counter() - self.start_time,
+                'peak_rss_bytes': peak_rss_bytes(),
+                'phases': self.phases,
+                'stages': self.stages,
+                'collections': {table: dict(stats, latency_buckets=self.latency_buckets)
+                                for table, stats in self.collections.items()},
+                'top_allocations': self.top_allocations}
+
+    # writes the report as a json file
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        logger.info('Wrote build metrics : %s', path)
+
+    # writes the report as a Prometheus textfile (e.g. for the node_exporter textfile collector).
+    # The file is replaced atomically so that a collector never reads a partial file.
+    def write_prometheus(self, path):
+        report = self.report()
+        lines = []
+
+        # samples are (name suffix, labels, value) tuples
+        def metric(name, metric_type, help_text, samples):
+            lines.append('# HELP ' + name + ' ' + help_text)
+            lines.append('# TYPE ' + name + ' ' + metric_type)
+            for suffix, labels, value in samples:
+                label_text = ','.join('%s="%s"' % (key, str(label).replace('\\', '\\\\').replace('"', '\\"'))
+                                      for key, label in labels)
+                lines.append(name + suffix + ('{' + label_text + '}' if label_text else '') + ' ' + repr(float(value)))
+
+        metric('redfish_build_wall_seconds', 'gauge', 'Wall clock time of the build.',
+               [('', [], report['wall_seconds'])])
+        metric('redfish_build_last_completion_timestamp_seconds', 'gauge', 'Time the build completed.',
+               [('', [], time.time())])
+        if report['peak_rss_bytes'] is not None:
+            metric('redfish_build_peak_rss_bytes', 'gauge', 'Peak resident set size of the build.',
+                   [('', [], report['peak_rss_bytes'])])
+        # a phase that runs more than once (e.g. prepare_shared_artifacts/download, once for each
+        # bundle) is reported once with its total times, since a textfile collector rejects a file
+        # that repeats a series
+        phase_totals = {}
+        for phase in self.phases:
+            totals = phase_totals.setdefault(phase['phase'], {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'child_cpu_seconds': 0.0})
+            for field in totals:
+                totals[field] += phase[field]
+        for field, help_text in [('wall_seconds', 'Wall clock time of each build phase.'),
+                                 ('cpu_seconds', 'CPU time of the build process in each build phase.'),
+                                 ('child_cpu_seconds', 'CPU time of the worker processes that finished in each build phase.')]:
+            metric('redfish_build_phase_' + field, 'gauge', help_text,
+                   [('', [('phase', phase_path)], totals[field]) for phase_path, totals in phase_totals.items()])
+        if self.stages:
+            metric('redfish_build_stage_wall_seconds', 'gauge', 'Wall clock time of each stage of the async build engine.',
+                   [('', [('stage', stage['stage'])], stage['wall_seconds']) for stage in self.stages])
+        metric('redfish_build_documents_total', 'counter', 'Documents written to each collection.',
+               [('', [('collection', table)], stats['documents']) for table, stats in self.collections.items()])
+        metric('redfish_build_bytes_total', 'counter', 'Estimated bytes written to each collection.',
+               [('', [('collection', table)], stats['bytes']) for table, stats in self.collections.items()])
+        samples = []
+        for table, stats in self.collections.items():
+            cumulative = 0
+            for bound, count in zip(self.latency_buckets + ['+Inf'], stats['latency_counts']):
+                cumulative += count
+                samples.append(('_bucket', [('collection', table), ('le', bound)], cumulative))
+            samples.append(('_sum', [('collection', table)], stats['write_seconds']))
+            samples.append(('_count', [('collection', table)], stats['batches']))
+        metric('redfish_build_write_latency_seconds', 'histogram', 'Latency of the bulk writes to each collection.',
+               samples)
+
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(temp_path, path)
+        logger.info('Wrote build metrics : %s', path)
+
+
+# The below class buffers write operations per collection and sends them to the database in
+# batches.  A collection's buffer is flushed with a single bulk_write call once it holds
+# batch_size operations or batch_bytes of (estimated) BSON data.  The largest buffer is also
+# flushed whenever the buffers of all the collections hold more than max_pending_bytes, so the
+# memory held by the writer does not grow with the number of collections.
+class BulkWriter:
+    def __init__(self, database, metrics, batch_size=1000, batch_bytes=8 * 1024 * 1024,
+                 max_pending_bytes=64 * 1024 * 1024):
+        self.database = database
+        self.metrics = metrics
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self.max_pending_bytes = max_pending_bytes
+        self.pending_bytes = 0
+        self.buffers = {}
+        self.buffer_bytes = {}
+
+    # queue a document to be inserted into the named collection.  size is the approximate
+    # encoded size of the document; when it is not supplied it is computed from the BSON encoding.
+    def insert(self, table, data, size=None):
+        self.add(table, pymongo.InsertOne(data), data, size)
+
+    # queue an arbitrary pymongo write operation for the named collection
+    def add(self, table, operation, data=None, size=None):
+        if size is None:
+            size = len(bson.encode(data)) if data is not None else 0
+        self.buffers.setdefault(table, []).append(operation)
+        self.buffer_bytes[table] = self.buffer_bytes.get(table, 0) + size
+        self.pending_bytes += size
+        if len(self.buffers[table]) >= self.batch_size or self.buffer_bytes[table] >= self.batch_bytes:
+            self.flush(table)
+        elif self.pending_bytes > self.max_pending_bytes:
+            self.flush(max(self.buffer_bytes, key=self.buffer_bytes.get))
+
+    # send any buffered operations for the named collection to the database
+    def flush(self, table):
+        operations = self.buffers.pop(table, [])
+        size = self.buffer_bytes.pop(table, 0)
+        self.pending_bytes -= size
+        if not operations:
+            return
+        start_time = time.perf_counter()
+        result = self.database[table].bulk_write(operations, ordered=False)
+        self.metrics.record_write(table, len(operations), size, time.perf_counter() - start_time)
+        logger.debug('Query Executed for : %s %s', table, result.bulk_api_result)
+
+    # send all buffered operations to the database
+    def flush_all(self):
+        for table in list(self.buffers.keys()):
+            self.flush(table)
+
+
+# The below function returns the upper limits of the build options that bound the memory used by a
+# build, for a memory limit in megabytes (0 for no limit).  The budgets of the loaders and writers
+# are limited to a share of the limit, and the number of parse workers (each a separate process)
+# to one for every 256 MB.  The limit itself is enforced by limit_worker_memory and
+# RedfishDbBuilder.check_memory_limit.
+def memory_limit_options(memory_limit_mb):
+    if not memory_limit_mb:
+        return {}
+    limit = memory_limit_mb * 1024 * 1024
+    max_pending_documents = max(256, limit // (256 * 1024))
+    return {'max_pending_bytes': limit // 8,
+            'max_pending_documents': max_pending_documents,
+            'mongo_batch_bytes': min(8 * 1024 * 1024, limit // 32),
+            'parse_workers': max(1, memory_limit_mb // 256),
+            'async_queue_size': max_pending_documents,
+            'async_parse_ahead': max(1, max_pending_documents // 64)}
+
+
+# The below function is the initializer of the parse worker processes of a build with a memory
+# limit.  It limits the address space of the worker to its share of the limit, so that a worker
+# that needs more memory fails with a MemoryError (and so fails the build) instead of running the
+# machine out of memory.
+def limit_worker_memory(limit_bytes):
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit_bytes = min(limit_bytes, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit_bytes, limit_bytes))
+
+
+# The below function returns a stable hash of a document.  Binary values (e.g. the compressed
+# payloads of the "compressed" storage profile) are hashed by the sha256 hash of their content.
+def document_hash(data):
+    def encode(value):
+        if isinstance(value, bytes):
+            return {'$sha256': hashlib.sha256(value).hexdigest()}
+        return str(value)
+    return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(',', ':'), default=encode).encode()).hexdigest()
+
+
+# The below function returns the hash of the contents of a source file
+def file_hash(source):
+    return hashlib.sha256(read_source(source)).hexdigest()
+
+
+# The below class tracks the content of an incremental build.  The manifest collection holds a
+# content hash for each source file and each generated document from the previous build.  During
+# the build, unchanged source files are skipped, unchanged documents are not rewritten and changed
+# documents are upserted by their stable _id.  When the build finishes, documents (and sources)
+# that were not produced by this build are deleted.  Documents are written with the BulkWriter
+# writer.
+class BuildManifest:
+    manifest_table = 'build_manifest'
+
+    def __init__(self, database, writer):
+        self.database = database
+        self.writer = writer
+        self.sources = {}
+        self.documents = {}
+        for entry in database[self.manifest_table].find({}):
+            if entry['kind'] == 'source':
+                self.sources[entry['key']] = entry
+            else:
+                self.documents[(entry['collection'], entry['key'])] = entry
+        self.seen_sources = set()
+        self.seen_documents = set()
+        self.updates = {}
+        self.current_source = None
+        self.removed_count = 0
+
+    # returns True if there is no manifest from a previous incremental build
+    def is_empty(self):
+        return not self.sources and not self.documents
+
+    # returns True if the source file is unchanged since the last build.  The documents generated
+    # from an unchanged source are kept.  extra is hashed along with the file contents and is used
+    # for sources whose output also depends on other data.
+    def source_unchanged(self, key, file, extra=''):
+        content_hash = file_hash(file) + extra
+        self.seen_sources.add(key)
+        previous = self.sources.get(key)
+        if previous is not None and previous['hash'] == content_hash:
+            for collection, document_key in previous['outputs']:
+                self.seen_documents.add((collection, document_key))
+            return True
+        self.updates['source:' + key] = {
+            'kind': 'source', 'key': key, 'hash': content_hash, 'outputs': []}
+        return False
+
+    # documents written between begin_source and end_source are recorded as outputs of the source
+    def begin_source(self, key):
+        self.current_source = self.updates['source:' + key]
+
+    def end_source(self):
+        self.current_source = None
+
+    # writes a document if it differs from the version written by the last build
+    def write_document(self, table, key, data, size=None):
+        if key is None:
+            raise ValueError('documents written by an incremental build require a stable key')
+        document_id = (table, key)
+        content_hash = document_hash(data)
+        previous = self.documents.get(document_id)
+        if self.current_source is not None:
+            self.current_source['outputs'].append([table, key])
+        # a key that is written more than once in a build is always rewritten so that the last
+        # write wins, as it does in a full build
+        if document_id not in self.seen_documents and previous is not None and previous['hash'] == content_hash:
+            self.seen_documents.add(document_id)
+            return
+        self.seen_documents.add(document_id)
+        data['_id'] = key
+        self.writer.add(table, pymongo.ReplaceOne({'_id': key}, data, upsert=True), data, size)
+        self.updates['document:' + table + ':' + key] = {
+            'kind': 'document', 'collection': table, 'key': key, 'hash': content_hash}
+
+    # forgets a document (and, optionally, the source it was generated from) that has been removed
+    # from the database outside of the manifest, so that the next build writes it again if needed
+    def discard_document(self, table, key, source_key=None):
+        document_id = (table, key)
+        self.seen_documents.discard(document_id)
+        self.documents.pop(document_id, None)
+        self.updates.pop('document:' + table + ':' + key, None)
+        self.writer.add(self.manifest_table, pymongo.DeleteOne({'_id': 'document:' + table + ':' + key}))
+        if source_key is not None:
+            self.seen_sources.discard(source_key)
+            self.sources.pop(source_key, None)
+            self.updates.pop('source:' + source_key, None)
+            self.writer.add(self.manifest_table, pymongo.DeleteOne({'_id': 'source:' + source_key}))
+
+    # deletes the documents of the last build that have not been generated by this build so far.
+    # If collections is given, only the documents of those collections are deleted, and the
+    # documents of the excluded collections are kept.  This is used once all of the documents of a
+    # collection have been written, so that the data derived from the collection (e.g. the
+    # privileges trie) is not built from documents that have been removed.
+    def remove_stale_documents(self, collections=None, exclude=()):
+        for document_id, entry in list(self.documents.items()):
+            if document_id in self.seen_documents or entry['collection'] in exclude:
+                continue
+            if collections is not None and entry['collection'] not in collections:
+                continue
+            self.writer.add(entry['collection'], pymongo.DeleteOne({'_id': entry['key']}))
+            self.writer.add(self.manifest_table, pymongo.DeleteOne({'_id': entry['_id']}))
+            del self.documents[document_id]
+            self.removed_count += 1
+        self.writer.flush_all()
+
+    # deletes the documents that were not generated by this build and saves the new manifest
+    def finish(self):
+        writer = self.writer
+        self.remove_stale_documents()
+        for key, entry in self.sources.items():
+            if key not in self.seen_sources:
+                writer.add(self.manifest_table, pymongo.DeleteOne({'_id': entry['_id']}))
+
+        # the manifest is written last so that it never records a document that was not written
+        writer.flush_all()
+        for manifest_id, entry in self.updates.items():
+            entry['_id'] = manifest_id
+            writer.add(self.manifest_table, pymongo.ReplaceOne({'_id': manifest_id}, entry, upsert=True), entry)
+        writer.flush_all()
+        logger.info('Incremental build wrote %d manifest entries and removed %d documents', len(self.updates),
+                    self.removed_count)
 
 
 # The below function is a helper function used to get the latest version of Message registries and
-# privilege registry data files.
-def compare_version_number(version1, version2):
-    version1_array = version1.split('.')
-    version2_array = version2.split('.')
-    n = min(len(version1_array), len(version2_array))
-    for i in range(n):
-        v1 = int(version1_array[i])
-        v2 = int(version2_array[i])
-        if v1 > v2:
-            return 0
-        if v1 < v2:
-            return 1
-    return 0
-
-
-# the below function is used to insert Message Registry data into the database.
-def initialize_message_registry_db(dir_path):
-    all_files = []
-    for path, currentDirectory, files in os.walk(dir_path):
-        for file in files:
-            if file.endswith('.json'):
-                all_files.append(os.path.join(path, file))
+# privilege registry data files.  It returns a version number string as a tuple of integers that
+# orders versions numerically.  Trailing zeros are removed so that 1.0 and 1.0.0 are equal.
+def version_key(version):
+    parts = []
+    for part in version.split('.'):
+        digits = re.match(r'\d*', part).group()
+        parts.append(int(digits) if digits else 0)
+    while parts and parts[-1] == 0:
+        parts.pop()
+    return tuple(parts)
+
+
+# The below function returns the version number from the Id of a registry
+def registry_version_number(registry_id):
+    if "PrivilegeRegistry" in registry_id:
+        return registry_id.split('_')[1]
+    return registry_id[registry_id.find('.') + 1:]
+
+
+# The below function decodes the members of a json object up to the point where all of the
+# requested keys have been found, and returns them as a dictionary.  This allows the header fields
+# at the top of a large file to be read without decoding the rest of the file.  Keys that are not
+# found are not included in the result.
+def read_json_header(raw, keys):
+    text = raw.decode('utf-8') if isinstance(raw, bytes) else raw
+    decoder = json.JSONDecoder()
+    header = {}
+    index = json.decoder.WHITESPACE.match(text, 0).end()
+    if text.startswith('\ufeff', index):
+        index = json.decoder.WHITESPACE.match(text, index + 1).end()
+    if text[index:index + 1] != '{':
+        return header
+    index += 1
+    while len(header) < len(keys):
+        index = json.decoder.WHITESPACE.match(text, index).end()
+        if text[index:index + 1] != '"':
+            break
+        key, index = json.decoder.scanstring(text, index + 1)
+        index = json.decoder.WHITESPACE.match(text, index).end()
+        if text[index:index + 1] != ':':
+            break
+        index = json.decoder.WHITESPACE.match(text, index + 1).end()
+        value, index = decoder.raw_decode(text, index)
+        if key in keys:
+            header[key] = value
+        index = json.decoder.WHITESPACE.match(text, index).end()
+        if text[index:index + 1] != ',':
+            break
+        index += 1
+    return header
+
+
+# The below class is a read-only memory map of a file that can be used as the file object of a
+# ZipFile (which requires file objects to report whether they are seekable)
+class MappedFile(mmap.mmap):
+    def seekable(self):
+        return True
+
+
+# The below class reads the members of a zip archive.  The archive is memory-mapped, and its
+# central directory is read one record at a time, so listing the members of an archive does not
+# build an index of all of them in memory (as ZipFile does, at several hundred bytes a member).
+# Members are read from the offsets of their local headers, which are kept in their sources (see
+# SourceTree).  The pages of the map that have been read are released after every few megabytes of
+# the central directory or of the members that are read, so the resident memory of the build does
+# not grow with the size of the archive.  Members that are encrypted or compressed with methods
+# other than stored and deflated are read with ZipFile.  Tests/test_zip_archive_reader.py checks
+# that the reader reads archives as ZipFile does.
+class ZipArchiveReader:
+    def __init__(self, archive_path):
+        with open(archive_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # an empty file cannot be mapped
+                raise zipfile.BadZipFile('File is not a zip file')
+            self.archive_map = MappedFile(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.zip_file = None
+        self.unreleased_bytes = 0
+        try:
+            self.directory_offset, self.entry_count = self.find_central_directory()
+        except zipfile.BadZipFile:
+            self.archive_map.close()
+            raise
+        except struct.error:
+            self.archive_map.close()
+            raise zipfile.BadZipFile('Truncated end of central directory record')
+
+    # returns the offset of the central directory and the number of members, from the end of
+    # central directory record (or its zip64 version)
+    def find_central_directory(self):
+        archive_map = self.archive_map
+        end = archive_map.rfind(b'PK\x05\x06', max(0, len(archive_map) - 65536 - 22))
+        if end < 0:
+            raise zipfile.BadZipFile('File is not a zip file')
+        entry_count, directory_size, directory_offset = struct.unpack('<4s4H2LH', archive_map[end:end + 22])[4:7]
+        if end >= 20 and archive_map[end - 20:end - 16] == b'PK\x06\x07':
+            zip64_end = struct.unpack('<4sLQL', archive_map[end - 20:end])[2]
+            entry_count, directory_size, directory_offset = struct.unpack(
+                '<4sQ2H2L4Q', archive_map[zip64_end:zip64_end + 56])[7:10]
+        return directory_offset, entry_count
+
+    # releases the resident pages of a range of the map.  The pages are read again from the file
+    # if they are used later.  The kernel maps the pages around each page that is read, so ranges
+    # are released some time after they are read rather than one member at a time.
+    def release(self, start, end):
+        if hasattr(mmap, 'MADV_DONTNEED'):
+            start -= start % mmap.PAGESIZE
+            if end > start:
+                self.archive_map.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+    # yields the name and location of each member of the archive, in the order of the central
+    # directory.  The location is the (local header offset, compression method, compressed size,
+    # crc, flags) of the member.
+    def members(self):
+        archive_map = self.archive_map
+        offset = self.directory_offset
+        for index in range(self.entry_count):
+            header = struct.unpack('<4s4B4HL2L5H2L', archive_map[offset:offset + 46])
+            if header[0] != b'PK\x01\x02':
+                raise zipfile.BadZipFile('Bad magic number for central directory')
+            flags, method, crc, compressed_size, file_size = header[5], header[6], header[9], header[10], header[11]
+            name_length, extra_length, comment_length, header_offset = header[12], header[13], header[14], header[18]
+            name = archive_map[offset + 46:offset + 46 + name_length].decode('utf-8' if flags & 0x800 else 'cp437')
+            if 0xFFFFFFFF in (compressed_size, file_size, header_offset):
+                # the sizes and offset that do not fit in 32 bits are in the zip64 extra field
+                extra = archive_map[offset + 46 + name_length:offset + 46 + name_length + extra_length]
+                while len(extra) >= 4:
+                    extra_id, extra_size = struct.unpack('<2H', extra[:4])
+                    if extra_id == 1:
+                        values = list(struct.unpack('<%dQ' % (extra_size // 8), extra[4:4 + extra_size - extra_size % 8]))
+                        if file_size == 0xFFFFFFFF:
+                            file_size = values.pop(0)
+                        if compressed_size == 0xFFFFFFFF:
+                            compressed_size = values.pop(0)
+                        if header_offset == 0xFFFFFFFF:
+                            header_offset = values.pop(0)
+                        break
+                    extra = extra[4 + extra_size:]
+            yield name, (header_offset, method, compressed_size, crc, flags)
+            offset += 46 + name_length + extra_length + comment_length
+            if index % 16384 == 16383:
+                self.release(self.directory_offset, offset)
+
+    # returns the location of the named member, or None if the archive does not hold it
+    def find(self, member_name):
+        for name, location in self.members():
+            if name == member_name:
+                return location
+        return None
+
+    # returns the contents of a member, from its location (or its name, if location is None)
+    def read(self, member_name, location=None):
+        if location is None:
+            location = self.find(member_name)
+            if location is None:
+                raise KeyError('There is no item named %r in the archive' % member_name)
+        header_offset, method, compressed_size, crc, flags = location
+        if flags & 0x1 or method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            if self.zip_file is None:
+                self.zip_file = ZipFile(self.archive_map)
+            return self.zip_file.read(member_name)
+        archive_map = self.archive_map
+        local_header = struct.unpack('<4s2B4HL2L2H', archive_map[header_offset:header_offset + 30])
+        if local_header[0] != b'PK\x03\x04':
+            raise zipfile.BadZipFile('Bad magic number for file header')
+        start = header_offset + 30 + local_header[10] + local_header[11]
+        data = archive_map[start:start + compressed_size]
+        self.unreleased_bytes += start + compressed_size - header_offset
+        if self.unreleased_bytes >= 8 * 1024 * 1024:
+            self.release(0, self.directory_offset)
+            self.unreleased_bytes = 0
+        if method == zipfile.ZIP_DEFLATED:
+            data = zlib.decompress(data, -15)
+        if zlib.crc32(data) != crc:
+            raise zipfile.BadZipFile('Bad CRC-32 for file %r' % member_name)
+        return data
+
+    def close(self):
+        if self.zip_file is not None:
+            self.zip_file.close()
+        self.archive_map.close()
+
+
+# The below function returns the zip archives opened by open_archive in the current thread.  Each
+# thread keeps its own archives, so builds running in different threads never close an archive
+# that another build is reading.
+def get_open_archives():
+    if not hasattr(open_archives, 'archives'):
+        open_archives.archives = {}
+    return open_archives.archives
+
+
+# The below function opens a zip archive for reading and returns its ZipArchiveReader.  The
+# archive is kept open (until close_archives is called from the same thread) so that members can
+# be streamed to the parsers without extracting the archive to disk.
+def open_archive(archive_path):
+    archives = get_open_archives()
+    if archive_path not in archives:
+        archives[archive_path] = ZipArchiveReader(archive_path)
+    return archives[archive_path]
+
+
+# The below function closes any zip archives opened by open_archive in the current thread
+def close_archives():
+    archives = get_open_archives()
+    for archive in archives.values():
+        archive.close()
+    archives.clear()
+
+
+# The below function returns the contents of a source file.  A source is either the path of a
+# file, or an (archive path, member name, location) tuple for a file within a zip archive (see
+# ZipArchiveReader.members).  The location may be omitted, in which case the member is found by
+# its name.
+def read_source(source):
+    if isinstance(source, tuple):
+        return open_archive(source[0]).read(source[1], source[2] if len(source) > 2 else None)
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+# The below class represents a folder of source files, either on disk or within a zip archive
+class SourceTree:
+    def __init__(self, root, archive_path=None):
+        self.archive_path = archive_path
+        if archive_path is None:
+            self.root = os.path.expanduser(root)
+        else:
+            # zip member names always use '/' and never start with one
+            self.root = root.strip('/') + '/' if root.strip('/') else ''
+
+    # returns the sources in the tree whose names end with suffix.  If recursive is False, only
+    # the files directly within the tree's root folder are returned.
+    def files(self, suffix='', recursive=True):
+        return list(self.iter_files(suffix, recursive))
+
+    # yields the sources in the tree whose names end with suffix, as the tree is scanned
+    def iter_files(self, suffix='', recursive=True):
+        if self.archive_path is not None:
+            for member_name, location in open_archive(self.archive_path).members():
+                relative_path = member_name[len(self.root):]
+                if not member_name.startswith(self.root) or member_name.endswith('/'):
+                    continue
+                if not member_name.endswith(suffix) or (not recursive and '/' in relative_path):
+                    continue
+                yield self.archive_path, member_name, location
+            return
+        if not recursive:
+            for filename in os.listdir(self.root):
+                if filename.endswith(suffix) and os.path.isfile(os.path.join(self.root, filename)):
+                    yield os.path.join(self.root, filename)
+            return
+        for path, currentDirectory, files in os.walk(self.root):
+            for file in files:
+                if file.endswith(suffix):
+                    yield os.path.join(path, file)
+
+    # returns the path of a source relative to the tree's root folder
+    def relative_path(self, source):
+        if self.archive_path is not None:
+            return source[1][len(self.root):]
+        return os.path.relpath(source, self.root)
+
+    # returns the source for a path relative to the tree's root folder
+    def source(self, relative_path):
+        if self.archive_path is not None:
+            member_name = self.root + relative_path
+            return self.archive_path, member_name, open_archive(self.archive_path).find(member_name)
+        return os.path.join(self.root, relative_path)
+
+    # returns True if the tree holds a file at the path relative to the tree's root folder
+    def exists(self, relative_path):
+        if self.archive_path is not None:
+            return open_archive(self.archive_path).find(self.root + relative_path) is not None
+        return os.path.isfile(self.source(relative_path))
+
+
+# The below function returns a SourceTree for a folder path (or an existing SourceTree)
+def as_source_tree(folder):
+    if isinstance(folder, SourceTree):
+        return folder
+    return SourceTree(folder)
+
+
+# The below function reads a registry file and returns its Name, version number, source and size
+# along with the parsed document.  If header_scan is True, only the header fields of the file are
+# decoded and None is returned in place of the document, so files that are not the latest
+# version of their registry are never fully decoded.  None is returned for files that are not
+# registries.
+def read_registry_candidate(header_scan, file):
+    raw = read_source(file)
+    data = None
+    if header_scan:
+        header = read_json_header(raw, ('@odata.type', 'Id', 'Name'))
+    else:
+        header = data = json.loads(raw)
+    if '@odata.type' not in header:
+        return None
+    return header['Name'], registry_version_number(header['Id']), file, data, len(raw)
 
+
+# The below function selects the latest version of each registry from the candidates returned by
+# read_registry_candidate.  A list with an entry for each registry Name is returned, holding the
+# selected file, its version number, document (or None), size and all of the versions found.
+def select_latest_registries(candidates):
     recent_files_map = {}
-    for file in all_files:
-        with open(file, 'r') as f:
-            data = json.load(f)
-        if '@odata.type' in data:
-            if "PrivilegeRegistry" in data['Id']:
-                curr_version_number = data['Id'].split('_')[1]
+    all_versions = {}
+    for candidate in candidates:
+        if candidate is None:
+            continue
+        name, curr_version_number, file, data, size = candidate
+        all_versions.setdefault(name, set()).add(curr_version_number)
+        if name not in recent_files_map or \
+                version_key(curr_version_number) > recent_files_map[name]['versionKey']:
+            recent_files_map[name] = dict(
+                name=name, versionNumber=curr_version_number, versionKey=version_key(curr_version_number),
+                file=file, data=data, size=size)
+    for name, recent_file in recent_files_map.items():
+        recent_file['versions'] = sorted(all_versions[name], key=version_key)
+    return list(recent_files_map.values())
+
+
+# The below function returns the table name and document of a registry selected by
+# select_latest_registries, along with its registry_versions document, which records the
+# available versions of the registry and the version that was loaded.
+def shape_registry_documents(recent_file):
+    data = recent_file['data']
+    if data is None:
+        data = json.loads(read_source(recent_file['file']))
+    table_name = data['@odata.type'].split(".")[-1]
+    versions = {'Name': recent_file['name'], 'Id': data['Id'], 'Table': table_name,
+                'Versions': recent_file['versions'], 'SelectedVersion': recent_file['versionNumber']}
+    return table_name, add_odata_fields(data), versions
+
+
+# The below function parses a mockup file and shapes it for insertion into the database.
+# The table name, the document and its file size are returned, or None if the file should not
+# be loaded.
+def shape_mockup_document(file):
+    raw = read_source(file)
+    data = json.loads(raw)
+    if '@odata.type' not in data:
+        return None
+    if "MessageRegistry" in data['@odata.type']:
+        return None
+    table_name = data['@odata.type'].split(".")[-1]
+    if '@odata.id' in data:
+        table_name = 'RedfishObject'
+    return table_name, add_odata_fields(data), len(raw)
+
+
+# The below class is a template of the subtrees of a set of Redfish resources (the roots), used to
+# make copies of the subtrees with new uris.  The json text of each resource in the subtrees is
+# split once at each uri within a root's subtree, so a copy is made by joining the pieces of text
+# with the uris of the copy and parsing the result, without walking or deep copying the documents.
+# copies maps the normalized uri of each root to the number of copies to make of its subtree.
+class SubtreeTemplate:
+    uri_pattern = re.compile(r'(?<=")(/[^"\\]*)(?=")')
+
+    def __init__(self, copies):
+        self.copies = copies
+        self.documents = []
+
+    # returns the uri of a copy of a root
+    @staticmethod
+    def copy_uri(root, copy):
+        return '%s-%d' % (root, copy)
+
+    # returns the root whose subtree holds a uri, or None if the uri is not in one of the subtrees
+    def find_root(self, uri):
+        path = normalize_uri(uri)
+        while path != '':
+            if path in self.copies:
+                return path
+            path = path.rpartition('/')[0]
+        return None
+
+    # adds a resource of one of the subtrees to the template.  Each uri in the subtrees is kept as
+    # a (root, remainder) tuple between the pieces of text.
+    def add(self, data):
+        text = json.dumps({key: value for key, value in data.items() if not key.startswith('_') and key != '@odata.etag'})
+        pieces = self.uri_pattern.split(text)
+        template = [pieces[0]]
+        for index in range(1, len(pieces), 2):
+            root = self.find_root(pieces[index])
+            if root is None or not pieces[index].startswith(root):
+                template[-1] += pieces[index] + pieces[index + 1]
+            else:
+                template.extend([(root, pieces[index][len(root):]), pieces[index + 1]])
+        self.documents.append((self.find_root(data['@odata.id']), template))
+
+    # returns the resources of a copy of the subtrees.  Uris within the subtrees of the roots that
+    # have at least this number of copies are rewritten to the uris of the copy, and the Id of
+    # each root is rewritten to match its new uri.
+    def clone(self, copy):
+        documents = []
+        for owner, template in self.documents:
+            if self.copies[owner] < copy:
+                continue
+            text = ''.join(piece if isinstance(piece, str) else
+                           (self.copy_uri(piece[0], copy) if self.copies[piece[0]] >= copy else piece[0]) + piece[1]
+                           for piece in template)
+            data = json.loads(text)
+            if normalize_uri(data['@odata.id']) == self.copy_uri(owner, copy) and data.get('Id') == owner.rpartition('/')[2]:
+                data['Id'] = self.copy_uri(data['Id'], copy)
+            documents.append(data)
+        return documents
+
+
+# The below function makes a copy of the subtrees of a SubtreeTemplate and shapes its resources
+# for insertion into the database.  The BSON encoded resources, and the collection membership
+# documents of the collections among them, are returned as (table, document) tuples.
+def shape_subtree_copy(template, copy):
+    shaped = []
+    for data in template.clone(copy):
+        shaped.append(('RedfishObject', bson.encode(add_odata_fields(data))))
+        membership = collection_membership(data)
+        if membership is not None:
+            shaped.append(('collection_members', bson.encode(membership)))
+    return shaped
+
+
+# The below function compresses a payload (bytes) for the compressed storage profile.  The
+# returned entry holds the payload compressed with zstd (or zlib, if zstd is not selected or not
+# installed), the length and sha256 hash of the uncompressed payload, and precompressed gzip and
+# (when brotli is installed) br variants, each with its content length, so a server can send
+# whichever Content-Encoding a client accepts without compressing the payload for each request.
+def compress_payload(raw, compressor='zstd'):
+    if compressor == 'zstd' and zstandard is not None:
+        body = zstandard.ZstdCompressor(level=19).compress(raw)
+    else:
+        compressor = 'zlib'
+        body = zlib.compress(raw, 9)
+    variants = {}
+    gzip_body = gzip.compress(raw, 9, mtime=0)
+    variants['gzip'] = {'data': gzip_body, 'content_length': len(gzip_body)}
+    if brotli is not None:
+        br_body = brotli.compress(raw, quality=11)
+        variants['br'] = {'data': br_body, 'content_length': len(br_body)}
+    return {'format': 'compressed', 'encoding': compressor, 'data': body, 'content_length': len(raw),
+            'sha256': hashlib.sha256(raw).hexdigest(), 'variants': variants}
+
+
+# The below function returns the approximate stored size of a compressed payload entry
+def compressed_payload_size(entry):
+    return len(entry['data']) + sum(variant['content_length'] for variant in entry['variants'].values())
+
+
+# The below function returns the uncompressed payload (bytes) of an entry made by compress_payload
+def decompress_payload(entry):
+    if entry['encoding'] == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('The zstandard module is required to read zstd compressed payloads')
+        return zstandard.ZstdDecompressor().decompress(entry['data'], max_output_size=entry['content_length'])
+    return zlib.decompress(entry['data'])
+
+
+# The below function returns the text of an odata_file or metadata_file entry, whichever
+# storage profile it was stored with.
+def read_stored_payload(entry):
+    if entry.get('format') == 'compressed':
+        return decompress_payload(entry).decode('utf-8')
+    return entry['data']
+
+
+# The below function shapes an odata_file or metadata_file entry.  If compressor is given (see
+# RedfishDbBuilder.payload_compressor), the entry is in the format of the compressed storage
+# profile.  The entry and its approximate size are returned.
+def shape_payload_entry(data, content_type, compressor=None):
+    if compressor is not None:
+        entry = compress_payload(data.encode('utf-8'), compressor)
+        entry['content_type'] = content_type
+        return entry, compressed_payload_size(entry)
+    return {"data": data}, len(data)
+
+
+# The below function returns the file name of a source
+def source_name(source):
+    if isinstance(source, tuple):
+        return posixpath.basename(source[1])
+    return os.path.basename(source)
+
+
+# The below function fills in the schema of a schema cache (or closure) entry in the format
+# selected by schema_storage and compressor (see shape_schema_entry) and returns the entry's
+# approximate size, or None if it is not known without encoding the entry.
+def store_schema(entry, schema_dict, schema_storage, compressor=None):
+    if schema_storage == 'document':
+        entry['schema'] = escape_schema_keys(schema_dict)
+        entry['format'] = 'document'
+        return None
+    text = json.dumps(schema_dict)
+    if compressor is not None:
+        entry.update(compress_payload(text.encode('utf-8'), compressor))
+        entry['content_type'] = 'application/json'
+        return compressed_payload_size(entry)
+    entry['schema'] = text
+    return len(text)
+
+
+# The below function parses a schema file and shapes its schema cache entry.  schema_storage
+# selects how the schema is stored: as a json string ('string') or as a document with escaped
+# keys ('document').  If compressor is given, schema stored as json strings are compressed with
+# compress_payload instead.  The entry, its approximate size, the base name of the schema and the
+# schema's definition of its base object (or None) are returned.
+def shape_schema_entry(schema_storage, compressor, file):
+    # load the file into a dictionary
+    raw = read_source(file)
+    schema_dict = json.loads(raw)
+    objname = source_name(file)
+    entry = {'source': objname}
+    size = store_schema(entry, schema_dict, schema_storage, compressor)
+    if size is None:
+        size = len(raw)
+
+    obj_base_name = objname.split('.')[0]
+    definition = None
+    if "definitions" in schema_dict and obj_base_name in schema_dict['definitions']:
+        definition = schema_dict['definitions'][obj_base_name]
+    return entry, size, obj_base_name, definition
+
+
+# The below function escapes a key of a schema so that it can be used as a MongoDB field name.
+# Field names cannot be queried or projected if they start with '$' (e.g. '$ref') or contain '.'
+# (e.g. '@odata.id'), so these characters (and the '%' escape character) are percent-encoded.
+def escape_schema_key(key):
+    return key.replace('%', '%25').replace('$', '%24').replace('.', '%2E')
+
+
+# The below function reverses escape_schema_key
+def unescape_schema_key(key):
+    if '%' not in key:
+        return key
+    return re.sub('%(25|24|2E)', lambda match: {'25': '%', '24': '$', '2E': '.'}[match.group(1)], key)
+
+
+# The below function returns a copy of a json value with all object keys escaped
+def escape_schema_keys(value):
+    if isinstance(value, dict):
+        return {escape_schema_key(key): escape_schema_keys(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [escape_schema_keys(item) for item in value]
+    return value
+
+
+# The below function returns a copy of a json value with all object keys unescaped
+def unescape_schema_keys(value):
+    if isinstance(value, dict):
+        return {unescape_schema_key(key): unescape_schema_keys(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [unescape_schema_keys(item) for item in value]
+    return value
+
+
+# The below function reads a schema from the schema cache, whichever format it was stored in.
+# If definition is given, only that entry of the schema's definitions is returned (and, for
+# schema stored as documents, only that entry is fetched from the database).  None is returned if
+# the schema (or definition) is not in the cache.  table names the schema cache collection.
+def read_cached_schema(database, source, definition=None, table='json_schema'):
+    projection = {'_id': 0, 'format': 1}
+    if definition is None:
+        projection['schema'] = 1
+    else:
+        projection['schema.definitions.' + escape_schema_key(definition)] = 1
+    entry = database[table].find_one({'source': source}, projection)
+    if entry is None:
+        return None
+    if entry.get('format') == 'compressed':
+        # compressed schema are fetched without their precompressed variants
+        entry = database[table].find_one({'source': source},
+                                         {'_id': 0, 'format': 1, 'encoding': 1, 'data': 1, 'content_length': 1})
+    elif entry.get('format') != 'document' and 'schema' not in entry:
+        # schema stored as strings cannot be projected, so the whole schema is fetched
+        entry = database[table].find_one({'source': source}, {'_id': 0, 'schema': 1})
+    if entry.get('format') == 'document':
+        schema = unescape_schema_keys(entry['schema'])
+    elif entry.get('format') == 'compressed':
+        schema = json.loads(decompress_payload(entry))
+    else:
+        schema = json.loads(entry['schema'])
+    if definition is not None:
+        return schema.get('definitions', {}).get(definition)
+    return schema
+
+
+# The below class maps each schema file name to its parsed schema, as the schemas argument of
+# SchemaClosureBuilder does, but reads each schema from the schema cache only when it is first
+# looked up, so building a closure reads only the schema that the closure refers to
+class CachedSchemaReader:
+    def __init__(self, database, table='json_schema'):
+        self.database = database
+        self.table = table
+        self.schemas = {}
+
+    # returns the parsed schema of source, or default if it is not in the schema cache
+    def get(self, source, default=None):
+        if source not in self.schemas:
+            self.schemas[source] = read_cached_schema(self.database, source, table=self.table)
+        schema = self.schemas[source]
+        return default if schema is None else schema
+
+    def __getitem__(self, source):
+        schema = self.get(source)
+        if schema is None:
+            raise KeyError(source)
+        return schema
+
+    def __contains__(self, source):
+        return self.get(source) is not None
+
+
+# The below class builds self-contained schema for each versioned resource type (e.g.
+# ComputerSystem.v1_20_0.json) from the schema cache.  Every $ref to a definition in the same or
+# another schema file is resolved.  Definitions that are referenced once are expanded in place,
+# while definitions that are referenced from more than one place, or that are part of a reference
+# cycle, are copied once into the closure's own definitions and referenced there, so recursive
+# definitions are never expanded without limit.  References that cannot be resolved (for example,
+# to schema that are not in the cache) are left unchanged and reported.
+class SchemaClosureBuilder:
+    versioned_schema = re.compile(r'^([A-Za-z0-9]+)\.(v\d+_\d+_\d+)\.json$')
+
+    # schemas maps each schema file name to its parsed schema
+    def __init__(self, schemas):
+        self.schemas = schemas
+
+    # returns the (file name, definition name) of a $ref made from within the given file, or None
+    # if the reference is not to a definition of a cached schema
+    def resolve_ref(self, file, ref):
+        target, separator, pointer = ref.partition('#')
+        if not pointer.startswith('/definitions/') or '/' in pointer[len('/definitions/'):]:
+            return None
+        if target != '':
+            file = target.split('/')[-1]
+        name = pointer[len('/definitions/'):]
+        if name not in self.schemas.get(file, {}).get('definitions', {}):
+            return None
+        return file, name
+
+    # returns each $ref within a json value
+    @staticmethod
+    def find_refs(value):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if key == '$ref' and isinstance(item, str):
+                    yield item
+                else:
+                    yield from SchemaClosureBuilder.find_refs(item)
+        elif isinstance(value, list):
+            for item in value:
+                yield from SchemaClosureBuilder.find_refs(item)
+
+    # returns the definitions reachable from a definition, the number of references to each, and
+    # the set of definitions that are part of a reference cycle
+    def reference_graph(self, root):
+        edges = {}
+        reference_counts = {}
+        pending = [root]
+        while pending:
+            node = pending.pop()
+            if node in edges:
+                continue
+            edges[node] = []
+            for ref in self.find_refs(self.schemas[node[0]]['definitions'][node[1]]):
+                target = self.resolve_ref(node[0], ref)
+                if target is None:
+                    continue
+                edges[node].append(target)
+                reference_counts[target] = reference_counts.get(target, 0) + 1
+                pending.append(target)
+
+        # find the definitions on a cycle (Tarjan's strongly connected components, iteratively)
+        recursive = set()
+        index = {}
+        low_link = {}
+        stack = []
+        on_stack = set()
+        for start in edges:
+            if start in index:
+                continue
+            work = [(start, 0)]
+            while work:
+                node, edge_index = work.pop()
+                if edge_index == 0:
+                    index[node] = low_link[node] = len(index)
+                    stack.append(node)
+                    on_stack.add(node)
+                if edge_index < len(edges[node]):
+                    work.append((node, edge_index + 1))
+                    target = edges[node][edge_index]
+                    if target not in index:
+                        work.append((target, 0))
+                    elif target in on_stack:
+                        low_link[node] = min(low_link[node], index[target])
+                    continue
+                if low_link[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1 or node in edges[node]:
+                        recursive.update(component)
+                if work:
+                    parent = work[-1][0]
+                    low_link[parent] = min(low_link[parent], low_link[node])
+        return edges, reference_counts, recursive
+
+    # returns the closure document for a versioned schema file, or None if the file does not
+    # define a versioned resource type.  If type_name is given, the closure is built for that
+    # definition of the file instead, which may also be an unversioned file (e.g. for a resource
+    # collection).
+    def build(self, source, type_name=None):
+        match = self.versioned_schema.match(source)
+        if type_name is None:
+            if match is None:
+                return None
+            type_name = match.group(1)
+        version = match.group(2) if match is not None else None
+        if type_name not in self.schemas[source].get('definitions', {}):
+            return None
+        root = (source, type_name)
+        edges, reference_counts, recursive = self.reference_graph(root)
+        shared = set(node for node in edges if node in recursive or reference_counts.get(node, 0) > 1)
+        shared.discard(root)
+        unresolved = set()
+
+        def local_name(node):
+            return node[0][:-len('.json')] + '.' + node[1]
+
+        def expand(file, value):
+            if isinstance(value, dict):
+                ref = value.get('$ref')
+                if isinstance(ref, str):
+                    target = self.resolve_ref(file, ref)
+                    if target is None:
+                        unresolved.add(ref)
+                    elif target in shared or target == root:
+                        copy = {key: expand(file, item) for key, item in value.items()}
+                        copy['$ref'] = '#' if target == root else '#/definitions/' + local_name(target)
+                        return copy
+                    else:
+                        expanded = expand(target[0], self.schemas[target[0]]['definitions'][target[1]])
+                        if len(value) == 1:
+                            return expanded
+                        # keep any keywords that sit alongside the reference
+                        copy = {key: expand(file, item) for key, item in value.items() if key != '$ref'}
+                        copy['allOf'] = [expanded]
+                        return copy
+                return {key: expand(file, item) for key, item in value.items()}
+            if isinstance(value, list):
+                return [expand(file, item) for item in value]
+            return value
+
+        closure = expand(source, self.schemas[source]['definitions'][type_name])
+        if not isinstance(closure, dict):
+            return None
+        closure = dict(closure)
+        for key in ('$schema', 'title'):
+            if key in self.schemas[source]:
+                closure[key] = self.schemas[source][key]
+        definitions = dict(closure.get('definitions', {}))
+        for node in sorted(shared):
+            definitions[local_name(node)] = expand(node[0], self.schemas[node[0]]['definitions'][node[1]])
+        if definitions:
+            closure['definitions'] = definitions
+        return {'source': source, 'type': type_name, 'version': version,
+                'odata_type': '#' + type_name + ('.' + version if version is not None else '') + '.' + type_name,
+                'schema': closure,
+                'recursive_definitions': sorted(local_name(node) for node in recursive),
+                'unresolved_refs': sorted(unresolved)}
+
+
+# The below function returns the (namespace, major, minor, errata) of a versioned schema file
+# name (e.g. ComputerSystem.v1_20_0.json), or None for schema files that are not versioned.
+def schema_file_version(source):
+    match = SchemaClosureBuilder.versioned_schema.match(source)
+    if match is None:
+        return None
+    major, minor, errata = match.group(2)[1:].split('_')
+    return match.group(1), int(major), int(minor), int(errata)
+
+
+# The below function returns the schema file that an @odata.type resolves to, given the versions
+# of each namespace in the schema cache (a dictionary of namespace to a dictionary of version
+# tuple to schema file name) and the set of unversioned schema files.  If the exact version is
+# not cached, the newest cached version with the same major version is used.  None is returned
+# if the type cannot be resolved.
+def resolve_odata_type(odata_type, namespace_versions, unversioned_sources):
+    parts = odata_type.lstrip('#').split('.')
+    namespace = parts[0]
+    version = re.fullmatch(r'v(\d+)_(\d+)_(\d+)', parts[1]) if len(parts) > 2 else None
+    if version is None:
+        source = namespace + '.json'
+        return source if source in unversioned_sources else None
+    major, minor, errata = (int(number) for number in version.groups())
+    versions = namespace_versions.get(namespace, {})
+    if (major, minor, errata) in versions:
+        return versions[(major, minor, errata)]
+    same_major = [version_tuple for version_tuple in versions if version_tuple[0] == major]
+    if not same_major:
+        return None
+    return versions[max(same_major)]
+
+
+# The below class generates the Python source of a validator for a json schema (e.g. a schema
+# closure, see SchemaClosureBuilder).  Each distinct node of the schema becomes a function that
+# appends the (path, message) of each violation it finds to a list, and the validate function of
+# the generated module returns the violations of a document.  The keywords used by the Redfish
+# schema are checked: type, enum, const, pattern, minLength, maxLength, minimum, maximum,
+# exclusiveMinimum, exclusiveMaximum, properties, patternProperties, additionalProperties,
+# required, items, minItems, maxItems, allOf, anyOf, oneOf, not and $ref (to the root or to a
+# definition of the schema).  Other keywords (e.g. format and readonly) are not checked.
+class ValidatorCodeGenerator:
+    # the version of the generated code, which is part of the key of the validator cache
+    format_version = 2
+    type_checks = {
+        'object': 'isinstance(value, dict)',
+        'array': 'isinstance(value, list)',
+        'string': 'isinstance(value, str)',
+        'integer': '((isinstance(value, int) and not isinstance(value, bool)) or (isinstance(value, float) and value.is_integer()))',
+        'number': '(isinstance(value, (int, float)) and not isinstance(value, bool))',
+        'boolean': 'isinstance(value, bool)',
+        'null': 'value is None'}
+
+    # the equality of json values used by enum and const, which (unlike ==) does not take booleans
+    # to be equal to the numbers 0 and 1
+    equal_function = [
+        'def equal(one, two):',
+        '    if isinstance(one, bool) or isinstance(two, bool):',
+        '        return isinstance(one, bool) and isinstance(two, bool) and one == two',
+        '    if isinstance(one, dict) and isinstance(two, dict):',
+        '        return one.keys() == two.keys() and all(equal(one[key], two[key]) for key in one)',
+        '    if isinstance(one, list) and isinstance(two, list):',
+        '        return len(one) == len(two) and all(equal(a, b) for a, b in zip(one, two))',
+        '    return one == two',
+        '']
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.functions = {}
+        self.lines = ['import re', ''] + self.equal_function
+        self.constants = []
+
+    # returns the name of a module level constant holding the value of a Python expression
+    def constant(self, expression):
+        name = 'c%d' % len(self.constants)
+        self.constants.append('%s = %s' % (name, expression))
+        return name
+
+    # returns the node of the schema that a $ref refers to, or None if it is not a reference to the
+    # root or to a definition of the schema
+    def resolve_ref(self, ref):
+        if ref == '#':
+            return self.schema
+        if ref.startswith('#/definitions/'):
+            return self.schema.get('definitions', {}).get(ref[len('#/definitions/'):])
+        return None
+
+    # returns the name of the function that validates a schema node, generating it if it has not
+    # been generated yet.  Identical nodes share a function.
+    def node_function(self, node):
+        key = json.dumps(node, sort_keys=True, default=str)
+        if key in self.functions:
+            return self.functions[key]
+        name = 'v%d' % len(self.functions)
+        self.functions[key] = name
+        if node is False:
+            body = ["errors.append((path, 'is not allowed'))"]
+        elif not isinstance(node, dict):
+            body = []
+        else:
+            body = self.type_lines(node) + self.value_lines(node) + self.object_lines(node) + \
+                self.array_lines(node) + self.combinator_lines(node)
+        self.lines.append('def %s(value, path, errors):' % name)
+        self.lines.extend('    ' + line for line in body or ['pass'])
+        self.lines.append('')
+        return name
+
+    # returns the lines that check the type of a value.  The other checks of the node are skipped
+    # if the type is wrong.
+    def type_lines(self, node):
+        types = node.get('type')
+        if types is None:
+            return []
+        types = types if isinstance(types, list) else [types]
+        checks = [self.type_checks[type_name] for type_name in types if type_name in self.type_checks]
+        if not checks:
+            return []
+        return ['if not (%s):' % ' or '.join(checks),
+                '    errors.append((path, %r))' % ('is not of type ' + ', '.join(types)),
+                '    return']
+
+    # returns the lines that check the enum, const, string and numeric keywords
+    def value_lines(self, node):
+        lines = []
+        if isinstance(node.get('enum'), list):
+            values = self.constant(repr(node['enum']))
+            if all(isinstance(item, str) for item in node['enum']):
+                # strings are only equal to strings, so the faster == is used
+                lines += ['if value not in %s:' % values]
             else:
-                curr_version_number = data['Id'][data['Id'].find('.') + 1:]
-            if data['Name'] not in recent_files_map:
-                recent_files_map[data['Name']] = dict(
-                    versionNumber=curr_version_number, file=file)
+                lines += ['if not any(equal(value, item) for item in %s):' % values]
+            lines += ["    errors.append((path, '%%r is not one of %%r' %% (value, %s)))" % values]
+        if 'const' in node:
+            value = self.constant(repr(node['const']))
+            lines += ['if not equal(value, %s):' % value,
+                      "    errors.append((path, '%%r is not %%r' %% (value, %s)))" % value]
+        if isinstance(node.get('pattern'), str):
+            try:
+                re.compile(node['pattern'])
+            except re.error:
+                pass
             else:
-                prev_version_number = recent_files_map[data['Name']]["versionNumber"]
-                if compare_version_number(prev_version_number, curr_version_number) == 1:
-                    recent_files_map[data['Name']] = dict(
-                        versionNumber=curr_version_number, file=file)
-
-    for k, v in recent_files_map.items():
-        file_path = v['file']
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-        table_name = data['@odata.type'].split(".")[-1]
-        execute_mongo_query(data, table_name)
-
-
-# The below function inserts mockup data from json files into the database.
-def initialize_db(mockup_dir_path):
-    all_files = []
-    for path, currentDirectory, files in os.walk(os.path.expanduser(mockup_dir_path)):
+                pattern = self.constant('re.compile(%r)' % node['pattern'])
+                lines += ['if isinstance(value, str) and %s.search(value) is None:' % pattern,
+                          "    errors.append((path, '%%r does not match %%r' %% (value, %s.pattern)))" % pattern]
+        for keyword, operator, message in [('minLength', '<', 'is too short'), ('maxLength', '>', 'is too long')]:
+            if isinstance(node.get(keyword), int):
+                lines += ['if isinstance(value, str) and len(value) %s %d:' % (operator, node[keyword]),
+                          '    errors.append((path, %r))' % message]
+        for keyword, operator in [('minimum', '<'), ('maximum', '>'), ('exclusiveMinimum', '<='), ('exclusiveMaximum', '>=')]:
+            if isinstance(node.get(keyword), (int, float)) and not isinstance(node.get(keyword), bool):
+                lines += ['if isinstance(value, (int, float)) and not isinstance(value, bool) and value %s %r:'
+                          % (operator, node[keyword]),
+                          '    errors.append((path, %r))' % ('%s is %s' % (keyword, node[keyword]))]
+        return lines
+
+    # returns the lines that check the properties of an object
+    def object_lines(self, node):
+        lines = []
+        for required in node.get('required', []):
+            lines += ['if isinstance(value, dict) and %r not in value:' % required,
+                      '    errors.append((path, %r))' % ('%r is a required property' % required)]
+        properties = node.get('properties')
+        pattern_properties = node.get('patternProperties')
+        additional_properties = node.get('additionalProperties', True)
+        if not isinstance(properties, dict) and not isinstance(pattern_properties, dict) and additional_properties is True:
+            return lines
+        lines += ['if isinstance(value, dict):',
+                  '    for key, item in value.items():',
+                  "        item_path = path + '/' + key",
+                  '        matched = False']
+        if isinstance(properties, dict):
+            functions = self.constant('{%s}' % ', '.join('%r: %s' % (key, self.node_function(item))
+                                                          for key, item in properties.items()))
+            lines += ['        function = %s.get(key)' % functions,
+                      '        if function is not None:',
+                      '            matched = True',
+                      '            function(item, item_path, errors)']
+        if isinstance(pattern_properties, dict):
+            patterns = []
+            for pattern, item in pattern_properties.items():
+                try:
+                    re.compile(pattern)
+                except re.error:
+                    continue
+                patterns.append('(re.compile(%r), %s)' % (pattern, self.node_function(item)))
+            lines += ['        for pattern, function in %s:' % self.constant('(%s)' % ''.join(p + ', ' for p in patterns)),
+                      '            if pattern.search(key) is not None:',
+                      '                matched = True',
+                      '                function(item, item_path, errors)']
+        if additional_properties is False:
+            lines += ['        if not matched:',
+                      "            errors.append((item_path, 'is not an allowed property'))"]
+        elif isinstance(additional_properties, dict):
+            lines += ['        if not matched:',
+                      '            %s(item, item_path, errors)' % self.node_function(additional_properties)]
+        return lines
+
+    # returns the lines that check the items of an array
+    def array_lines(self, node):
+        lines = []
+        items = node.get('items')
+        if isinstance(items, dict):
+            lines += ['if isinstance(value, list):',
+                      '    for index, item in enumerate(value):',
+                      "        %s(item, path + '/' + str(index), errors)" % self.node_function(items)]
+        elif isinstance(items, list):
+            functions = self.constant('(%s)' % ''.join(self.node_function(item) + ', ' for item in items))
+            lines += ['if isinstance(value, list):',
+                      '    for index, (item, function) in enumerate(zip(value, %s)):' % functions,
+                      "        function(item, path + '/' + str(index), errors)"]
+        for keyword, operator, message in [('minItems', '<', 'has too few items'), ('maxItems', '>', 'has too many items')]:
+            if isinstance(node.get(keyword), int):
+                lines += ['if isinstance(value, list) and len(value) %s %d:' % (operator, node[keyword]),
+                          '    errors.append((path, %r))' % message]
+        return lines
+
+    # returns the lines that check $ref, allOf, anyOf, oneOf and not.  When no branch of an anyOf
+    # matches, the violations of the branch that came closest (the one whose violations are not
+    # all at the value itself, e.g. a type mismatch) are reported.
+    def combinator_lines(self, node):
+        lines = []
+        if isinstance(node.get('$ref'), str):
+            target = self.resolve_ref(node['$ref'])
+            if target is not None:
+                lines += ['%s(value, path, errors)' % self.node_function(target)]
+        for item in node.get('allOf', []) if isinstance(node.get('allOf'), list) else []:
+            lines += ['%s(value, path, errors)' % self.node_function(item)]
+        if isinstance(node.get('anyOf'), list) and node['anyOf']:
+            functions = self.constant('(%s)' % ''.join(self.node_function(item) + ', ' for item in node['anyOf']))
+            lines += ['attempts = []',
+                      'for function in %s:' % functions,
+                      '    attempt = []',
+                      '    function(value, path, attempt)',
+                      '    if not attempt:',
+                      '        break',
+                      '    attempts.append(attempt)',
+                      'else:',
+                      '    closest = min(attempts, key=lambda attempt: (all(item[0] == path for item in attempt), len(attempt)))',
+                      '    if all(item[0] == path for item in closest):',
+                      "        errors.append((path, 'is not valid under any of the given schemas'))",
+                      '    else:',
+                      '        errors.extend(closest)']
+        if isinstance(node.get('oneOf'), list) and node['oneOf']:
+            functions = self.constant('(%s)' % ''.join(self.node_function(item) + ', ' for item in node['oneOf']))
+            lines += ['matches = 0',
+                      'for function in %s:' % functions,
+                      '    attempt = []',
+                      '    function(value, path, attempt)',
+                      '    matches += not attempt',
+                      'if matches != 1:',
+                      "    errors.append((path, 'is valid under %d of the given schemas, not exactly one' % matches))"]
+        if 'not' in node:
+            lines += ['attempt = []',
+                      '%s(value, path, attempt)' % self.node_function(node['not']),
+                      'if not attempt:',
+                      "    errors.append((path, 'is valid under a schema that it must not match'))"]
+        return lines
+
+    # returns the source of the validator module
+    def generate(self):
+        root = self.node_function(self.schema)
+        return '\n'.join(self.lines + self.constants + [
+            '',
+            'def validate(document):',
+            '    errors = []',
+            "    %s(document, '', errors)" % root,
+            '    return errors',
+            ''])
+
+
+# The below function generates and compiles the validator of a schema.  validator is the (path,
+# name, schema) of the validator; its code object is written to the validator cache file at path.
+# The file is replaced atomically, so a validator that is being written by another build is never
+# read partially.
+def write_validator(validator):
+    path, name, schema = validator
+    code = compile(ValidatorCodeGenerator(schema).generate(), '<validator %s>' % name, 'exec')
+    temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(temp_fd, 'wb') as f:
+        marshal.dump(code, f)
+    os.replace(temp_path, path)
+    return path
+
+
+# The below function returns the validate function of a validator cache file, loading it once in
+# each process
+def load_validator(path):
+    validate = loaded_validators.get(path)
+    if validate is None:
+        with open(path, 'rb') as f:
+            code = marshal.load(f)
+        namespace = {}
+        exec(code, namespace)
+        validate = loaded_validators[path] = namespace['validate']
+    return validate
+
+
+# The below function validates a mockup resource with the validator of its @odata.type.
+# validator_paths maps each @odata.type to the path of its validator cache file.  The list of the
+# (path, message) of each violation is returned, or None if there is no validator for the type.
+# The fields added by the build (the internal fields and @odata.etag, see compute_etag) are not
+# part of the mockup, so they are not validated.
+def validate_resource(validator_paths, data):
+    path = validator_paths.get(data.get('@odata.type'))
+    if path is None:
+        return None
+    return load_validator(path)({key: value for key, value in data.items()
+                                 if not key.startswith('_') and key != '@odata.etag'})
+
+
+# The below class builds the security table (privileges_table).  The privilege registry is read
+# once and indexed by Entity, and the table's rows are collected by uri so that each uri is
+# written only once, in a single batch, after all the schema have been read.
+class SecurityTable:
+    # privileges_registry is the privilege registry document; if it is not given, it is read from
+    # the database
+    def __init__(self, database, privileges_registry=None):
+        self.operation_maps = {}
+        self.rows = {}
+
+        # find the security permissions for each object
+        if privileges_registry is None:
+            privileges_registry = database['PrivilegeRegistry'].find_one({})
+        if privileges_registry is not None:
+            for mapping in privileges_registry['Mappings']:
+                self.operation_maps[mapping['Entity']] = mapping['OperationMap']
+
+    # adds the rows for the uris of an object's schema definition.  source_key is the key of the
+    # schema source that the definition was read from.
+    def add_entry(self, name, json_obj, source_key=None):
+        if 'uris' not in json_obj or name not in self.operation_maps:
+            return
+
+        # search for any uris associated with this object
+        for uri in json_obj['uris']:
+            # replace any wildcard fields with regular expression syntax
+            regex_uri = re.sub('{[^}]+}', r'[^\/]+', uri)
+
+            result = {'uri': regex_uri, 'Entity': name, 'OperationMap': self.operation_maps[name]}
+
+            # overwrite any previous operation map
+            self.rows[regex_uri] = (result, source_key)
+
+
+# The below class is a trie of the uri segments of the security table.  Each edge of the trie is
+# a literal uri segment, a wildcard (any single segment) or, for segments that mix literal text
+# and wildcards, a regular expression.  A request path is resolved to its Entity and OperationMap
+# by walking the trie one segment at a time, so the cost of a lookup depends on the depth of the
+# path rather than on the number of uris in the table.  Literal edges are preferred over pattern
+# edges, and pattern edges over wildcard edges.
+class PrivilegeTrie:
+    wildcard_segment = r'[^\/]+'
+
+    # rows is an iterable of security table rows (uri, Entity and OperationMap)
+    def __init__(self, rows=()):
+        self.root = self.new_node()
+        self.operation_maps = {}
+        for row in rows:
+            self.add(row['uri'], row['Entity'], row['OperationMap'])
+
+    @staticmethod
+    def new_node():
+        return {'literal': {}, 'pattern': [], 'wildcard': None, 'entity': None}
+
+    # adds a security table uri (in its regular expression form) to the trie
+    def add(self, regex_uri, entity, operation_map):
+        node = self.root
+        # split the uri at each '/' that is not escaped (the wildcard pattern holds an escaped '/')
+        for segment in re.split(r'(?<!\\)/', regex_uri.strip('/')):
+            if segment == self.wildcard_segment:
+                if node['wildcard'] is None:
+                    node['wildcard'] = self.new_node()
+                node = node['wildcard']
+            elif '[' in segment or '\\' in segment:
+                for pattern, child in node['pattern']:
+                    if pattern.pattern == segment:
+                        node = child
+                        break
+                else:
+                    child = self.new_node()
+                    node['pattern'].append((re.compile(segment), child))
+                    node = child
+            else:
+                node = node['literal'].setdefault(segment, self.new_node())
+        node['entity'] = entity
+        self.operation_maps[entity] = operation_map
+
+    # returns the (Entity, OperationMap) pair for a request path, or None if no uri matches
+    def resolve(self, path):
+        segments = path.split('?')[0].strip('/').split('/')
+        entity = self.find(self.root, segments, 0)
+        if entity is None:
+            return None
+        return entity, self.operation_maps[entity]
+
+    def find(self, node, segments, index):
+        if index == len(segments):
+            return node['entity']
+        segment = segments[index]
+        child = node['literal'].get(segment)
+        if child is not None:
+            entity = self.find(child, segments, index + 1)
+            if entity is not None:
+                return entity
+        for pattern, child in node['pattern']:
+            if pattern.fullmatch(segment):
+                entity = self.find(child, segments, index + 1)
+                if entity is not None:
+                    return entity
+        if node['wildcard'] is not None and segment != '':
+            return self.find(node['wildcard'], segments, index + 1)
+        return None
+
+    # returns the trie as a database document.  Edges are stored as [segment, node] pairs since
+    # uri segments are not always valid field names.
+    def to_document(self):
+        def encode(node):
+            return {'literal': [[segment, encode(child)] for segment, child in node['literal'].items()],
+                    'pattern': [[pattern.pattern, encode(child)] for pattern, child in node['pattern']],
+                    'wildcard': encode(node['wildcard']) if node['wildcard'] is not None else None,
+                    'entity': node['entity']}
+        return {'trie': encode(self.root),
+                'OperationMaps': [[entity, operation_map] for entity, operation_map in self.operation_maps.items()]}
+
+    # returns a trie from a database document created by to_document
+    @classmethod
+    def from_document(cls, document):
+        def decode(encoded):
+            return {'literal': {segment: decode(child) for segment, child in encoded['literal']},
+                    'pattern': [(re.compile(pattern), decode(child)) for pattern, child in encoded['pattern']],
+                    'wildcard': decode(encoded['wildcard']) if encoded['wildcard'] is not None else None,
+                    'entity': encoded['entity']}
+        trie = cls()
+        trie.root = decode(document['trie'])
+        trie.operation_maps = {entity: operation_map for entity, operation_map in document['OperationMaps']}
+        return trie
+
+    # returns the trie stored in the database
+    @classmethod
+    def load(cls, database):
+        return cls.from_document(database['privileges_trie'].find_one({}))
+
+
+# The below class is the write stage of the async build engine.  Documents are passed to it through
+# a bounded queue, so producers wait when the writes fall behind.  Like BulkWriter, it buffers the
+# documents of each collection and writes them with bulk_write once batch_size documents or
+# batch_bytes of (estimated) BSON data are buffered, but up to concurrency bulk writes are in
+# flight at once.  database is a database of an async client, or None to run the writes of
+# sync_database in threads.  The writes are recorded in the BuildMetrics metrics.
+class AsyncBulkWriter:
+    def __init__(self, database, sync_database, metrics, batch_size=1000, batch_bytes=8 * 1024 * 1024,
+                 concurrency=4, queue_size=10000):
+        self.database = database
+        self.sync_database = sync_database
+        self.metrics = metrics
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.buffers = {}
+        self.buffer_bytes = {}
+        self.in_flight = {}
+
+    # queues a document to be inserted into the named collection.  The document must already be
+    # shaped (e.g. by shape_mockup_document), and size is its approximate encoded size, which the
+    # loaders find outside of the event loop.
+    async def insert(self, table, data, size):
+        await self.queue.put(('insert', table, data, size))
+
+    # waits until all of the documents queued for the named collection have been written
+    async def flush(self, table):
+        done = asyncio.get_running_loop().create_future()
+        await self.queue.put(('flush', table, done, 0))
+        await done
+
+    # stops the writer once all of the queued documents have been written
+    async def close(self):
+        await self.queue.put(('close', None, None, 0))
+
+    # consumes the queue until the writer is closed
+    async def run(self):
+        while True:
+            action, table, data, size = await self.queue.get()
+            if action == 'close':
+                break
+            if action == 'flush':
+                await self.write_buffer(table)
+                await self.wait_for_writes(table)
+                data.set_result(None)
+                continue
+            self.buffers.setdefault(table, []).append(pymongo.InsertOne(data))
+            self.buffer_bytes[table] = self.buffer_bytes.get(table, 0) + size
+            if len(self.buffers[table]) >= self.batch_size or self.buffer_bytes[table] >= self.batch_bytes:
+                await self.write_buffer(table)
+        for table in list(self.buffers.keys()):
+            await self.write_buffer(table)
+        for table in list(self.in_flight.keys()):
+            await self.wait_for_writes(table)
+
+    # starts a bulk write of the buffered documents of the named collection
+    async def write_buffer(self, table):
+        operations = self.buffers.pop(table, [])
+        size = self.buffer_bytes.pop(table, 0)
+        if not operations:
+            return
+        await self.semaphore.acquire()
+        task = asyncio.ensure_future(self.write(table, operations, size))
+        self.in_flight.setdefault(table, set()).add(task)
+        task.add_done_callback(lambda finished: self.semaphore.release())
+
+    # waits for the bulk writes that are in flight for the named collection, raising any error
+    async def wait_for_writes(self, table):
+        tasks = self.in_flight.pop(table, set())
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    # writes a batch of operations to the named collection
+    async def write(self, table, operations, size):
+        start_time = time.perf_counter()
+        if self.database is not None:
+            result = await self.database[table].bulk_write(operations, ordered=False)
+        else:
+            result = await asyncio.to_thread(self.sync_database[table].bulk_write, operations, ordered=False)
+        self.metrics.record_write(table, len(operations), size, time.perf_counter() - start_time)
+        logger.debug('Query Executed for : %s %s', table, result.bulk_api_result)
+
+
+# The below function shapes a mockup file for the async build engine.  The documents of the file
+# (see shape_mockup_document), followed by its collection membership document if it is a
+# collection, are returned as a list of (table name, document, size).  The documents are shaped,
+# and their sizes found, in the parse stage so that the event loop only queues them.
+def shape_mockup_documents(file):
+    shaped = shape_mockup_document(file)
+    if shaped is None:
+        return []
+    documents = [shaped]
+    membership = collection_membership(shaped[1])
+    if membership is not None:
+        documents.append(('collection_members', membership, len(bson.encode(membership))))
+    return documents
+
+
+# The below function returns the documents of a registry selected by select_latest_registries
+# (see shape_registry_documents) for the async build engine, as a list of (table name, document,
+# size)
+def shape_registry_documents_with_sizes(recent_file):
+    table_name, data, versions = shape_registry_documents(recent_file)
+    return [(table_name, data, recent_file['size']), ('registry_versions', versions, len(bson.encode(versions)))]
+
+
+# The below function parses a chunk of source files with a parse function.  It is run by the
+# parse executor of the async build engine.
+def parse_source_chunk(function, files):
+    return [function(file) for file in files]
+
+
+# The below class is the async build engine.  It loads the mockup, the privilege and message
+# registries and the schema cache in three pipelines that run at the same time.  In each pipeline
+# the bundle is downloaded (in a thread), its files are listed, read and parsed (in the parse
+# worker pool, or in a thread if parse_workers is 1) and the shaped documents are passed to an
+# AsyncBulkWriter.  Each pipeline parses up to parse_ahead chunks ahead of the writes, so reads,
+# parsing and writes overlap.  The security table is built from the privilege registry, so the
+# schema pipeline waits for the registry pipeline to finish (and for the privilege registry to be
+# written) before it writes the security table.  Incremental builds are not supported.  builder
+# is the RedfishDbBuilder that the pipeline builds for.
+class AsyncBuildPipeline:
+    def __init__(self, builder):
+        self.builder = builder
+        self.writer = None
+        self.executor = None
+        self.thread_executor = None
+        self.chunk_size = builder.get_build_option('parse_chunk_size', 64)
+        self.parse_ahead = builder.get_build_option('async_parse_ahead', 8)
+        self.privileges_registry = None
+
+    # records the enclosed block as a stage of the build
+    @contextlib.asynccontextmanager
+    async def stage(self, name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.builder.metrics.record_stage(name, start_time, time.perf_counter())
+
+    # yields the result of applying a parse function to each file of an iterable, in the same order
+    # as the files.  Files are taken from the iterable only as the results are consumed.
+    async def parse(self, function, files):
+        loop = asyncio.get_running_loop()
+        pending = collections.deque()
+        files = iter(files)
+        while True:
+            chunk = list(itertools.islice(files, self.chunk_size))
+            if not chunk:
+                break
+            pending.append(loop.run_in_executor(self.executor, parse_source_chunk, function, chunk))
+            if len(pending) >= self.parse_ahead:
+                for result in await pending.popleft():
+                    yield result
+        while pending:
+            for result in await pending.popleft():
+                yield result
+
+    # downloads (or reads from the artifact cache) the artifact at the given url
+    async def fetch(self, name, url):
+        logger.info('Downloading : %s', url)
+        async with self.stage(name + '/download'):
+            return await asyncio.to_thread(self.builder.fetch_artifact_to_cache, url)
+
+    # loads the mockup resources, collection membership and service documents
+    async def load_mockup(self):
+        if self.builder.config["mockup_file_path"] == "":
+            redfish_creds = self.builder.credentials['redfish_creds']
+            zip_file_path = await self.fetch('mockups', redfish_creds['mockup_url'] + redfish_creds['mockup_file_name'] + '.zip')
+            tree = SourceTree(redfish_creds['mockup_dir_name'], zip_file_path)
+        else:
+            tree = SourceTree(self.builder.resolve_path(self.builder.config["mockup_file_path"]))
+
+        async for documents in self.parse(shape_mockup_documents, tree.iter_files('.json')):
+            for table_name, data, size in documents:
+                await self.writer.insert(table_name, data, size)
+
+        for path, table, content_type in [('odata/index.json', 'odata_file', 'application/json'),
+                                          ('$metadata/index.xml', 'metadata_file', 'application/xml')]:
+            if tree.exists(path):
+                data = (await asyncio.to_thread(read_source, tree.source(path))).decode('utf-8')
+                entry, size = await asyncio.to_thread(shape_payload_entry, data, content_type,
+                                                      self.builder.payload_compressor())
+                await self.writer.insert(table, entry, size)
+
+    # loads the latest version of each registry.  The privilege registry is kept for the security
+    # table, and the pipeline finishes once it has been written.
+    async def load_registries(self):
+        redfish_creds = self.builder.credentials['redfish_creds']
+        zip_file_path = await self.fetch('registries', redfish_creds['mockup_url'] + redfish_creds['privilege_file_name'] + '.zip')
+        files = SourceTree('', zip_file_path).iter_files('.json')
+        header_scan = self.builder.get_build_option('registry_header_scan', True)
+        candidates = [candidate async for candidate in self.parse(
+            functools.partial(read_registry_candidate, header_scan), files)]
+        for recent_file in select_latest_registries(candidates):
+            for table_name, data, size in await asyncio.to_thread(shape_registry_documents_with_sizes, recent_file):
+                if table_name == 'PrivilegeRegistry':
+                    self.privileges_registry = data
+                await self.writer.insert(table_name, data, size)
+        await self.writer.flush('PrivilegeRegistry')
+
+    # loads the schema cache and, once the registries have been loaded, the security table
+    async def load_schema(self, registries):
+        zip_file_path = await self.fetch('schema', self.builder.credentials["schema_bundle_url"])
+        schema_files = await asyncio.to_thread(self.builder.list_schema_sources, zip_file_path)
+        shape_function = functools.partial(shape_schema_entry, self.builder.get_build_option('schema_storage', 'string'),
+                                           self.builder.payload_compressor())
+        definitions = []
+        async for entry, size, obj_base_name, definition in self.parse(shape_function, schema_files):
+            await self.writer.insert('json_schema', entry, size)
+            if definition is not None:
+                definitions.append((obj_base_name, definition))
+
+        # the security table is built from the privilege registry
+        await registries
+        async with self.stage('schema/security_table'):
+            for table_name, data, size in await asyncio.to_thread(self.shape_security_table, definitions):
+                await self.writer.insert(table_name, data, size)
+
+    # returns the privileges_table rows and the privileges_trie document of the security table built
+    # from the privilege registry and the schema definitions, as a list of (table name, document,
+    # size).  It is run in a thread, outside of the event loop.
+    def shape_security_table(self, definitions):
+        security_table = SecurityTable(None, self.privileges_registry or {'Mappings': []})
+        for obj_base_name, definition in definitions:
+            security_table.add_entry(obj_base_name, definition)
+        trie = PrivilegeTrie(result for result, source_key in security_table.rows.values())
+        documents = [('privileges_table', result, len(bson.encode(result))) for result, source_key in security_table.rows.values()]
+        trie_document = trie.to_document()
+        documents.append(('privileges_trie', trie_document, len(bson.encode(trie_document))))
+        return documents
+
+    # runs a loader as a named stage
+    async def run_stage(self, name, loader):
+        async with self.stage(name):
+            await loader
+
+    # runs the build
+    async def run(self):
+        builder = self.builder
+        self.executor = builder.get_parse_executor()
+        if self.executor is None:
+            self.thread_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+            self.executor = self.thread_executor
+        async_client = builder.open_async_mongo_client()
+        self.writer = AsyncBulkWriter(
+            builder.prefixed_database(async_client[builder.database_name]) if async_client is not None else None,
+            builder.get_mongo_database(),
+            builder.metrics,
+            builder.get_build_option('mongo_batch_size', 1000),
+            builder.get_build_option('mongo_batch_bytes', 8 * 1024 * 1024),
+            builder.get_build_option('async_write_concurrency', 4),
+            builder.get_build_option('async_queue_size', 10000))
+        writer_task = asyncio.ensure_future(self.writer.run())
+        registries = asyncio.ensure_future(self.run_stage('registries', self.load_registries()))
+        loaders = asyncio.gather(self.run_stage('mockups', self.load_mockup()), registries,
+                                 self.run_stage('schema', self.load_schema(registries)))
+        try:
+            done, pending = await asyncio.wait([loaders, writer_task], return_when=asyncio.FIRST_COMPLETED)
+            if writer_task in done:
+                # the writer only stops before it is closed if a write fails
+                writer_task.result()
+            loaders.result()
+            await self.writer.close()
+            await writer_task
+        finally:
+            for task in [loaders, writer_task]:
+                if not task.done():
+                    task.cancel()
+            if async_client is not None:
+                closed = async_client.close()
+                if inspect.isawaitable(closed):
+                    await closed
+            if self.thread_executor is not None:
+                # the parse thread keeps its own open archives (see open_archive)
+                await asyncio.get_running_loop().run_in_executor(self.thread_executor, close_archives)
+                self.thread_executor.shutdown()
+
+
+# The below class holds the registry, schema cache and security table documents of a build, each
+# encoded once as BSON.  A batch of builds over the same schema bundle and privilege registry
+# prepares these documents once and copies them into the database of each build.
+class SharedBuildArtifacts:
+    def __init__(self):
+        self.documents = {}
+
+    # adds a document to the named collection.  shaped is set for documents that were already
+    # shaped by the parse workers (see add_odata_fields), so that they are not shaped again.
+    def add(self, table, data, shaped=False):
+        if not shaped:
+            add_odata_fields(data)
+        self.documents.setdefault(table, []).append(bson.raw_bson.RawBSONDocument(bson.encode(data)))
+
+    # returns the number of documents held
+    def document_count(self):
+        return sum(len(documents) for documents in self.documents.values())
+
+
+# The below class wraps a readable file and computes the sha256 hash of the data read from it
+class HashingReader:
+    def __init__(self, f):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.sha256.update(data)
+        return data
+
+    def hexdigest(self):
+        return self.sha256.hexdigest()
+
+
+# The below function returns the index specs (in the form of index_specs) of the indexes of a
+# collection, other than the _id index
+def collection_index_specs(collection_name, collection):
+    specs = []
+    for name, index in collection.index_information().items():
+        if name == '_id_':
+            continue
+        specs.append({'collection': collection_name, 'name': name, 'keys': [[field, direction] for field, direction in index['key']],
+                      'unique': index.get('unique', False)})
+    return specs
+
+
+# The below function reads the manifest of a snapshot archive
+def read_snapshot_manifest(snapshot_path):
+    with ZipFile(snapshot_path) as archive:
+        manifest = json.loads(archive.read('manifest.json'))
+    if manifest.get('format_version') != snapshot_format_version:
+        raise RuntimeError('Unsupported snapshot format version ' + str(manifest.get('format_version')) +
+                           ' in ' + snapshot_path)
+    return manifest
+
+
+# The below function checks the documents of one collection of a snapshot archive against the
+# manifest entry of the collection, without inserting them.  A RuntimeError is raised if the member
+# is missing or unreadable, or if the hash or count of its documents does not match the manifest.
+def verify_snapshot_collection(snapshot_path, collection_name, entry):
+    raw_options = bson.CodecOptions(document_class=bson.raw_bson.RawBSONDocument)
+    try:
+        with ZipFile(snapshot_path) as archive, archive.open(entry['member']) as f:
+            reader = HashingReader(f)
+            count = sum(1 for document in bson.decode_file_iter(reader, raw_options))
+            # read any trailing bytes so that they are part of the hash
+            while reader.read(1024 * 1024):
+                pass
+    except (KeyError, zipfile.BadZipFile, bson.errors.BSONError, zlib.error) as e:
+        raise RuntimeError('Unable to read collection ' + collection_name + ' in ' + snapshot_path + ': ' + str(e))
+    if reader.hexdigest() != entry['sha256'] or count != entry['documents']:
+        raise RuntimeError('Checksum mismatch for collection ' + collection_name + ' in ' + snapshot_path)
+    return count
+
+
+# The below class builds the Redfish database described by a configuration (the contents of
+# config.json, as a dictionary).  All of the state of a build is held by the builder, and the
+# builder never changes the process's current directory, so several builders can run in one
+# process (for example, in threads of a service).  client is the pymongo MongoClient of the target
+# database; if it is not given, a client is opened from the mongo_creds of the configuration (and
+# closed by close()).  database_name names the target database, by default the mongo_database of
+# the configuration.  Relative paths in the configuration (the mockup and local schema folders, the
+# artifact cache and lockfile, and the metrics files) are resolved against work_dir, or against the
+# current directory if work_dir is not given.
+class RedfishDbBuilder:
+    def __init__(self, config, client=None, database_name=None, work_dir=None):
+        self.config = config
+        self.credentials = config.get('credentials', {})
+        self.client = client
+        self.owns_client = client is None
+        if database_name is None:
+            database_name = self.credentials['mongo_creds']['mongo_database']
+        self.database_name = database_name
+        self.work_dir = work_dir
+        self.bulk_writer = None
+        self.parse_executor = None
+        self.build_manifest = None
+        self.fetched_artifacts = {}
+        self.collection_prefix = ''
+        self.option_limits = memory_limit_options(config.get('build_options', {}).get('memory_limit_mb', 0))
+        self.metrics = BuildMetrics(self.get_build_option('trace_memory', False))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # flushes any buffered writes, stops the parse worker pool and closes the MongoClient if the
+    # builder opened it
+    def close(self):
+        self.flush_mongo_writes()
+        self.bulk_writer = None
+        self.shutdown_parse_executor()
+        if self.owns_client and self.client is not None:
+            self.client.close()
+            self.client = None
+
+    # returns a path from the configuration, resolved against the builder's work_dir
+    def resolve_path(self, path):
+        path = os.path.expanduser(path)
+        if self.work_dir is None:
+            return path
+        return os.path.join(self.work_dir, path)
+
+    # returns the builder's MongoClient, opening it from the mongo_creds of the configuration if
+    # none was given.  pymongo clients are thread-safe and maintain their own connection pool, so a
+    # single client is shared by every loader instead of opening a new connection for each document.
+    def get_mongo_client(self):
+        if self.client is None:
+            self.client = pymongo.MongoClient(self.credentials['mongo_creds']['mongo_client_url'])
+        return self.client
+
+    # returns the handle of the target database.  During a staged build, the handle names the
+    # staging collections (see PrefixedDatabase).
+    def get_mongo_database(self):
+        return self.prefixed_database(self.get_mongo_client()[self.database_name])
+
+    # returns a database handle that names the collections of the current build: the database
+    # itself, or the staging collections during a staged build.  database may be a database of the
+    # synchronous or the async client.
+    def prefixed_database(self, database):
+        if self.collection_prefix == '':
+            return database
+        return PrefixedDatabase(database, self.collection_prefix)
+
+    # returns an optional build setting from the "build_options" section of the configuration, or
+    # the supplied default when the setting has not been specified.  When a memory limit is set,
+    # the options that bound memory use are limited to a share of it (see memory_limit_options).
+    def get_build_option(self, name, default):
+        value = self.config.get('build_options', {}).get(name, default)
+        if name in self.option_limits:
+            # a parse_workers value of 0 (one worker per cpu core) is also limited
+            value = min(value, self.option_limits[name]) if value else self.option_limits[name]
+        return value
+
+    # drops a collection of the target database
+    def drop_mongo_collection(self, collection_name):
+        logger.info('Dropping Collection : %s', collection_name)
+        database = self.get_mongo_database()
+        collection = database[collection_name]
+        collection.drop()
+
+    # returns a context manager that records the enclosed block as a build phase.  With a memory
+    # limit, the build fails at the end of the first phase after which the peak memory use of the
+    # build process is over the limit.
+    @contextlib.contextmanager
+    def build_phase(self, name):
+        with self.metrics.phase(name):
+            yield
+        self.check_memory_limit(name)
+
+    # raises a RuntimeError if the peak resident memory of the build process is over
+    # build_options.memory_limit_mb
+    def check_memory_limit(self, phase_name):
+        memory_limit_mb = self.get_build_option('memory_limit_mb', 0)
+        peak = peak_rss_bytes()
+        if memory_limit_mb and peak is not None and peak > memory_limit_mb * 1024 * 1024:
+            raise RuntimeError('The peak memory use of the build (%d MB) exceeded the memory limit (%d MB) in phase %s' %
+                               (peak // (1024 * 1024), memory_limit_mb, phase_name))
+
+    # returns the BulkWriter of the build
+    def get_bulk_writer(self):
+        if self.bulk_writer is None:
+            self.bulk_writer = BulkWriter(
+                self.get_mongo_database(),
+                self.metrics,
+                self.get_build_option('mongo_batch_size', 1000),
+                self.get_build_option('mongo_batch_bytes', 8 * 1024 * 1024),
+                self.get_build_option('max_pending_bytes', 64 * 1024 * 1024))
+        return self.bulk_writer
+
+    # flushes any buffered writes to the database
+    def flush_mongo_writes(self):
+        if self.bulk_writer is not None:
+            self.bulk_writer.flush_all()
+
+    # inserts data into the target database
+    def execute_mongo_query(self, data, table):
+        collection = self.get_mongo_database()[table]
+        add_odata_fields(data)
+        result = collection.insert_one(data)
+        logger.debug('Query Executed for : %s %s', table, result)
+
+    # queues data for a batched insert into the target database.  size is an optional estimate of
+    # the encoded size of the document (e.g. its file size).  key is the stable identifier of the
+    # document; during an incremental build it becomes the document's _id and the document is only
+    # written if it has changed since the last build.  shaped is set for documents that were
+    # already shaped by the parse workers (see add_odata_fields), so that the ETag and hierarchy
+    # fields are not computed again in the build process.
+    def queue_mongo_insert(self, data, table, size=None, key=None, shaped=False):
+        if not shaped:
+            add_odata_fields(data)
+        if self.build_manifest is not None:
+            self.build_manifest.write_document(table, key, data, size)
+            return
+        self.get_bulk_writer().insert(table, data, size)
+
+    # starts an incremental build.  If no previous incremental build exists, the database is dropped
+    # so that the build starts from an empty database.
+    def begin_incremental_build(self):
+        database = self.get_mongo_database()
+        self.build_manifest = BuildManifest(database, self.get_bulk_writer())
+        if self.build_manifest.is_empty():
+            logger.info('No build manifest found, dropping database : %s', self.database_name)
+            self.get_mongo_client().drop_database(self.database_name)
+
+    # completes an incremental build
+    def finish_incremental_build(self):
+        self.build_manifest.finish()
+        self.build_manifest = None
+
+    # yields the source files of an iterable, skipping those that are unchanged since the last
+    # incremental build.  key_function returns the key of a source file.
+    def filter_unchanged_sources(self, files, key_function, extra=''):
         for file in files:
-            if file.endswith('.json'):
-                all_files.append(os.path.join(path, file))
-    for file in all_files:
-        with open(file, 'r') as f:
-            data = json.load(f)
-        if '@odata.type' in data:
-            if "MessageRegistry" in data['@odata.type']:
+            if self.build_manifest is None or not self.build_manifest.source_unchanged(key_function(file), file, extra):
+                yield file
+
+    # is called when a document is deleted from the database outside of the incremental build
+    # manifest
+    def discard_document(self, table, key, source_key=None):
+        if self.build_manifest is not None:
+            self.build_manifest.discard_document(table, key, source_key)
+
+    # mark the start and end of the documents generated from a source file
+    def begin_source(self, key):
+        if self.build_manifest is not None and key is not None:
+            self.build_manifest.begin_source(key)
+
+    def end_source(self):
+        if self.build_manifest is not None:
+            self.build_manifest.end_source()
+
+    # returns the process pool used to parse source files in parallel, or None when the build is
+    # configured to parse files serially (parse_workers of 1).  A parse_workers value of 0 uses one
+    # worker per cpu core.  With a memory limit, the build process and each worker get an equal
+    # share of the limit, and the address space of each worker is limited to its share.
+    def get_parse_executor(self):
+        workers = self.get_build_option('parse_workers', 1)
+        if workers == 0:
+            workers = os.cpu_count()
+        if workers <= 1:
+            return None
+        if self.parse_executor is None:
+            memory_limit_mb = self.get_build_option('memory_limit_mb', 0)
+            initializer = None
+            initargs = ()
+            if memory_limit_mb:
+                initializer = limit_worker_memory
+                initargs = (memory_limit_mb * 1024 * 1024 // (workers + 1),)
+            # spawn (rather than fork) the workers so that they do not inherit the open MongoClient
+            self.parse_executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                initializer=initializer, initargs=initargs)
+        return self.parse_executor
+
+    # shuts down the parse worker pool (if one has been started)
+    def shutdown_parse_executor(self):
+        if self.parse_executor is not None:
+            self.parse_executor.shutdown()
+            self.parse_executor = None
+
+    # applies a parse function to each file of an iterable, using the parse worker pool when one is
+    # configured, and yields (file, result) pairs.  Results are yielded in the same order as the
+    # files so that a parallel build writes exactly the same documents as a serial build.  Files
+    # are taken from the iterable only as the results are consumed: at most max_pending_documents
+    # files are being parsed, or have been parsed and are waiting to be consumed, at a time.
+    def stream_source_files(self, function, files):
+        executor = self.get_parse_executor()
+        if executor is None:
+            for file in files:
+                yield file, function(file)
+            return
+        chunk_size = self.get_build_option('parse_chunk_size', 64)
+        max_chunks = max(1, self.get_build_option('max_pending_documents', 4096) // chunk_size)
+        files = iter(files)
+        pending = collections.deque()
+        while True:
+            chunk = list(itertools.islice(files, chunk_size))
+            if chunk:
+                pending.append((chunk, executor.submit(parse_source_chunk, function, chunk)))
+            if not pending:
+                return
+            if not chunk or len(pending) >= max_chunks:
+                chunk, future = pending.popleft()
+                yield from zip(chunk, future.result())
+
+    # applies a parse function to each file of an iterable (see stream_source_files) and yields
+    # the results
+    def map_source_files(self, function, files):
+        return (result for file, result in self.stream_source_files(function, files))
+
+    # inserts Message Registry data into the database.  Each file is read once, keeping the document
+    # of the latest version of each registry found so far.  dir_path is a folder path or a
+    # SourceTree.
+    def initialize_message_registry_db(self, dir_path):
+        all_files = as_source_tree(dir_path).iter_files('.json')
+        header_scan = self.get_build_option('registry_header_scan', True)
+        candidates = self.map_source_files(functools.partial(read_registry_candidate, header_scan), all_files)
+
+        for recent_file in select_latest_registries(candidates):
+            table_name, data, versions = shape_registry_documents(recent_file)
+            self.queue_mongo_insert(data, table_name, recent_file['size'], data['Id'], shaped=True)
+            self.queue_mongo_insert(versions, 'registry_versions', key=versions['Name'])
+        self.flush_mongo_writes()
+
+    # inserts mockup data from json files into the database.  mockup_dir_path is a folder path or a
+    # SourceTree.
+    def initialize_db(self, mockup_dir_path):
+        tree = as_source_tree(mockup_dir_path)
+        key_function = lambda file: 'mockup:' + tree.relative_path(file)
+        all_files = self.filter_unchanged_sources(tree.iter_files('.json'), key_function)
+        for file, shaped in self.stream_source_files(shape_mockup_document, all_files):
+            if shaped is None:
+                continue
+            table_name, data, size = shaped
+            key = key_function(file)
+            self.begin_source(key)
+            self.queue_mongo_insert(data, table_name, size, data.get('@odata.id', key), shaped=True)
+            membership = collection_membership(data)
+            if membership is not None:
+                self.queue_mongo_insert(membership, 'collection_members', key=membership['collection'])
+            self.end_source()
+        self.flush_mongo_writes()
+
+    # creates the collections that hold the large payloads with the MongoDB block compressor
+    # selected by build_options.block_compressor, when the compressed storage profile is selected.
+    # Collections that already exist are left unchanged.
+    def create_storage_collections(self):
+        if self.get_build_option('storage_profile', 'plain') != 'compressed':
+            return
+        database = self.get_mongo_database()
+        existing_collections = set(database.list_collection_names())
+        block_compressor = self.get_build_option('block_compressor', 'zstd')
+        for collection_name in ['odata_file', 'metadata_file', 'json_schema', 'json_schema_closure']:
+            if collection_name in existing_collections:
+                continue
+            logger.info('Creating Collection : %s with block compressor %s', collection_name, block_compressor)
+            try:
+                database.create_collection(collection_name, storageEngine={
+                    'wiredTiger': {'configString': 'block_compressor=' + block_compressor}})
+            except pymongo.errors.PyMongoError as e:
+                logger.warning('Unable to create collection %s : %s', collection_name, e)
+
+    # inserts odata file data into the database.
+    def create_odata_file_entry(self, mockup_dir_path):
+        tree = as_source_tree(mockup_dir_path)
+        if not tree.exists('odata/index.json'):
+            return
+
+        data = read_source(tree.source('odata/index.json')).decode('utf-8')
+        entry, size = shape_payload_entry(data, 'application/json', self.payload_compressor())
+        self.queue_mongo_insert(entry, 'odata_file', size, 'odata/index.json')
+        self.flush_mongo_writes()
+
+    # inserts metadata file data into the database.
+    def create_metadata_file_entry(self, mockup_dir_path):
+        tree = as_source_tree(mockup_dir_path)
+        if not tree.exists('$metadata/index.xml'):
+            return
+
+        data = read_source(tree.source('$metadata/index.xml')).decode('utf-8')
+        entry, size = shape_payload_entry(data, 'application/xml', self.payload_compressor())
+        self.queue_mongo_insert(entry, 'metadata_file', size, '$metadata/index.xml')
+        self.flush_mongo_writes()
+
+    # scales out the loaded mockup, for load testing the server.  build_options.scale_out maps the
+    # uris of resource collections ('*' matches any one segment, e.g. /redfish/v1/Chassis/*/Sensors)
+    # to a number of copies.  The subtree of each member of the matching collections is copied that
+    # many times, with new uris (the member's uri followed by -1, -2, ...) and Ids, and the
+    # collections list the copies as members.  Collections at the same depth are copied together, so
+    # links between them (e.g. from a system to its chassis) point to the resources of the same copy.
+    # Deeper collections are scaled out after shallower ones, so they are also scaled out within the
+    # copies of the shallower collections.
+    def scale_out_mockup(self):
+        database = self.get_mongo_database()
+        scale_out = self.get_build_option('scale_out', {})
+        patterns = {}
+        for pattern, count in scale_out.items():
+            segments = normalize_uri(pattern).split('/')
+            regex = '^' + '/'.join('[^/]+' if segment == '*' else re.escape(segment) for segment in segments) + '$'
+            patterns.setdefault(len(segments), []).append((regex, count))
+
+        for depth in sorted(patterns):
+            # the members of the matching collections are the roots of the subtrees to copy
+            collections = {}
+            copies = {}
+            for regex, count in patterns[depth]:
+                for membership in database['collection_members'].find({'_collection': {'$regex': regex}}, {'_id': 0}):
+                    members = [normalize_uri(member) for member in membership['members']]
+                    collections[membership['collection']] = (members, count)
+                    for member in members:
+                        copies[member] = count
+            copies = {root: count for root, count in copies.items() if count > 0}
+            if not copies:
                 continue
-            table_name = data['@odata.type'].split(".")[-1]
-            if '@odata.id' in data:
-                table_name = 'RedfishObject'
-            execute_mongo_query(data, table_name)
-
-
-# The below function inserts odata file data into the database.
-def create_odata_file_entry(mockup_dir_path):
-    if not os.path.exists(os.path.expanduser(mockup_dir_path + '/odata/index.json')):
-        return
-
-    file = os.path.expanduser(mockup_dir_path + '/odata/index.json')
-    with open(file, 'r') as f:
-        data = f.read()
-    execute_mongo_query({"data": data}, 'odata_file')
 
+            template = SubtreeTemplate(copies)
+            for root in copies:
+                query = {'$or': [{'_odata_id': {'$in': [root, root + '/']}}, subtree_filter(root)]}
+                for data in database['RedfishObject'].find(query, {'_id': 0}):
+                    template.add(data)
+
+            writer = self.get_bulk_writer()
+            resource_count = 0
+            for shaped in self.map_source_files(functools.partial(shape_subtree_copy, template),
+                                                range(1, max(copies.values()) + 1)):
+                for table, raw in shaped:
+                    writer.insert(table, bson.raw_bson.RawBSONDocument(raw), len(raw))
+                    if table == 'RedfishObject':
+                        resource_count += 1
+
+            # list the copies as members of the collections
+            for data in database['RedfishObject'].find({'_odata_id': {'$in': list(collections)}}):
+                members, count = collections[data['_odata_id']]
+                members = members + [SubtreeTemplate.copy_uri(member, copy) for copy in range(1, count + 1) for member in members]
+                data['Members'] = [{'@odata.id': member} for member in members]
+                data['Members@odata.count'] = len(members)
+                set_etag(data)
+                writer.add('RedfishObject', pymongo.ReplaceOne({'_id': data['_id']}, data), data)
+                writer.add('collection_members', pymongo.UpdateOne(
+                    {'collection': data['_odata_id']}, {'$set': {'members': members, 'count': len(members)}}), size=0)
+            self.flush_mongo_writes()
+            logger.info('Scaled out %d collections with %d copied resources', len(collections), resource_count)
+
+    # returns the folder that holds the downloaded artifact cache
+    def get_artifact_cache_dir(self):
+        return self.resolve_path(self.get_build_option('artifact_cache_dir', '~/.cache/redfish_server_maker'))
+
+    # loads the artifact cache index.  The index maps each downloaded url to the sha256 hash of its
+    # content and the validators (ETag and Last-Modified) returned by the server.
+    def load_artifact_index(self):
+        index_path = os.path.join(self.get_artifact_cache_dir(), 'index.json')
+        if not os.path.exists(index_path):
+            return {}
+        with open(index_path, 'r') as f:
+            return json.load(f)
+
+    # records the cache entry of a url in the artifact cache index.  The index is read again and
+    # merged under artifact_cache_lock, so entries saved by other fetches running at the same time
+    # are kept, and it is written to a unique temporary file that replaces the index atomically.
+    def save_artifact_index_entry(self, url, entry):
+        cache_dir = self.get_artifact_cache_dir()
+        with artifact_cache_lock:
+            index = self.load_artifact_index()
+            index[url] = entry
+            temp_fd, temp_path = tempfile.mkstemp(dir=cache_dir, prefix='index.', suffix='.tmp')
+            with os.fdopen(temp_fd, 'w') as f:
+                json.dump(index, f, indent=2)
+            os.replace(temp_path, os.path.join(cache_dir, 'index.json'))
+
+    # loads the artifact lockfile.  The lockfile maps each artifact url to the sha256 hash that its
+    # content must have.
+    def load_artifact_lockfile(self):
+        lockfile_path = self.resolve_path(self.get_build_option('artifact_lockfile', 'artifacts.lock.json'))
+        if not os.path.exists(lockfile_path):
+            return {}
+        with open(lockfile_path, 'r') as f:
+            return json.load(f)
+
+    # writes the hashes of the artifacts used by this build to the lockfile
+    def update_artifact_lockfile(self):
+        lockfile_path = self.resolve_path(self.get_build_option('artifact_lockfile', 'artifacts.lock.json'))
+        lockfile = self.load_artifact_lockfile()
+        lockfile.update(self.fetched_artifacts)
+        with open(lockfile_path, 'w') as f:
+            json.dump(lockfile, f, indent=2, sort_keys=True)
+        logger.info('Updated artifact lockfile : %s', lockfile_path)
+
+    # checks the hash of an artifact against the lockfile
+    def verify_artifact(self, url, sha256):
+        locked_sha256 = self.load_artifact_lockfile().get(url)
+        if locked_sha256 is not None and locked_sha256 != sha256 and not self.get_build_option('update_lockfile', False):
+            raise RuntimeError('Checksum mismatch for ' + url + ': expected ' + locked_sha256 + ', got ' + sha256)
+        self.fetched_artifacts[url] = sha256
+
+    # returns the path of a cached copy of the artifact at the given url.  Cached artifacts are
+    # stored by the sha256 hash of their content and are revalidated with the server using their
+    # ETag and Last-Modified validators, so unchanged artifacts are not downloaded again.  In
+    # offline mode only the cache is used.
+    def fetch_artifact(self, url):
+        with self.build_phase('download'):
+            return self.fetch_artifact_to_cache(url)
+
+    # returns the path of a cached copy of the artifact at the given url (see fetch_artifact).
+    # Fetches of the same url into the same cache wait for each other.
+    def fetch_artifact_to_cache(self, url):
+        with artifact_cache_lock:
+            url_lock = artifact_url_locks.setdefault((self.get_artifact_cache_dir(), url), threading.Lock())
+        with url_lock:
+            return self.fetch_artifact_to_cache_locked(url)
+
+    # returns the path of a cached copy of the artifact at the given url, while holding the lock of
+    # the url (see fetch_artifact_to_cache)
+    def fetch_artifact_to_cache_locked(self, url):
+        objects_dir = os.path.join(self.get_artifact_cache_dir(), 'objects')
+        os.makedirs(objects_dir, exist_ok=True)
+        index = self.load_artifact_index()
+        entry = index.get(url)
+        cached_path = None
+        if entry is not None and os.path.exists(os.path.join(objects_dir, entry['sha256'])):
+            cached_path = os.path.join(objects_dir, entry['sha256'])
+
+        if self.get_build_option('offline', False):
+            if cached_path is None:
+                raise RuntimeError('Offline mode: no cached artifact for ' + url)
+            logger.info('Using cached artifact : %s', url)
+            self.verify_artifact(url, entry['sha256'])
+            return cached_path
+
+        request = urllib.request.Request(url)
+        if cached_path is not None:
+            if entry.get('etag'):
+                request.add_header('If-None-Match', entry['etag'])
+            if entry.get('last_modified'):
+                request.add_header('If-Modified-Since', entry['last_modified'])
+        try:
+            response = urllib.request.urlopen(request)
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and cached_path is not None:
+                logger.info('Using cached artifact (not modified) : %s', url)
+                self.verify_artifact(url, entry['sha256'])
+                return cached_path
+            raise
+
+        # stream the download into the cache, hashing it as it arrives
+        logger.info('Downloading : %s', url)
+        sha256 = hashlib.sha256()
+        size = 0
+        with response, tempfile.NamedTemporaryFile(dir=objects_dir, delete=False) as f:
+            while True:
+                chunk = response.read(1024 * 1024)
+                if not chunk:
+                    break
+                sha256.update(chunk)
+                size += len(chunk)
+                f.write(chunk)
+            temp_path = f.name
+        sha256 = sha256.hexdigest()
+        object_path = os.path.join(objects_dir, sha256)
+        os.replace(temp_path, object_path)
+        self.verify_artifact(url, sha256)
+
+        self.save_artifact_index_entry(url, {'sha256': sha256, 'size': size, 'etag': response.headers.get('ETag'),
+                                             'last_modified': response.headers.get('Last-Modified')})
+        return object_path
+
+    # inserts Privilege Registry data into the database.  The privilege registry bundle is read from
+    # the artifact cache without being extracted.
+    def create_privilege_database(self):
+        redfish_credentials = self.credentials['redfish_creds']
+        file_name = redfish_credentials['privilege_file_name']
+        zip_file_name = file_name + '.zip'
+        zip_file_url = redfish_credentials['mockup_url'] + zip_file_name
+        logger.info('Downloading the Mockups from Redfish Server : %s', zip_file_url)
+        zip_file_path = self.fetch_artifact(zip_file_url)
+        self.initialize_message_registry_db(SourceTree('', zip_file_path))
+
+    # downloads the redfish mockup data if mockup_file_path is not specified in the configuration.
+    # If mockup_file_path is specified it reads json files from that path.  The registries are
+    # loaded as well unless registries is False (batch builds copy them, see copy_shared_artifacts).
+    def download_and_initialize_redfish_mockups(self, registries=True):
+        try:
+            if self.config["mockup_file_path"] == "":
+                redfish_creds = self.credentials['redfish_creds']
+                file_name = redfish_creds['mockup_file_name']
+                zip_file_name = file_name + '.zip'
+                zip_file_url = redfish_creds['mockup_url'] + zip_file_name
+                logger.info('Downloading the Mockups from Redfish Server : %s', zip_file_url)
+                mockup_dir_name = redfish_creds['mockup_dir_name']
+
+                # read the mockup directly from the downloaded bundle
+                zip_file_path = self.fetch_artifact(zip_file_url)
+                mockup_tree = SourceTree(mockup_dir_name, zip_file_path)
+            else:
+                mockup_tree = SourceTree(self.resolve_path(self.config["mockup_file_path"]))
+
+            with self.build_phase('resources'):
+                self.initialize_db(mockup_tree)
+            with self.build_phase('service_documents'):
+                self.create_odata_file_entry(mockup_tree)
+                self.create_metadata_file_entry(mockup_tree)
+
+            # PrivilegeRegistry
+            if registries:
+                with self.build_phase('registries'):
+                    self.create_privilege_database()
+        finally:
+            self.shutdown_parse_executor()
+            close_archives()
+
+    # generates a cache of schema metadata within the mongodb database.  The cache lets the server
+    # validate post/patch information against the schema prior to making modifications to the data
+    # served.
+    def generate_schema_cache_and_security_table(self):
+        try:
+            # download the schema bundle from the specified URL
+            logger.info('Downloading the Schema Bundle from Redfish Server : %s', self.credentials["schema_bundle_url"])
+            zip_file_path = self.fetch_artifact(self.credentials["schema_bundle_url"])
+
+            # loop for each json file in the folder
+            schema_files = self.list_schema_sources(zip_file_path)
+            privilege_hash = ''
+            if self.build_manifest is not None:
+                # security table entries depend on the privilege registry as well as on the schema
+                privilege_hash = document_hash(self.get_mongo_database()['PrivilegeRegistry'].find_one({}, {'_id': 0}))
+            schema_files = self.filter_unchanged_sources(schema_files, lambda file: 'schema:' + source_name(file),
+                                                         privilege_hash)
+            security_table = SecurityTable(self.get_mongo_database())
+            shape_function = functools.partial(shape_schema_entry, self.get_build_option('schema_storage', 'string'),
+                                               self.payload_compressor())
+            with self.build_phase('schema'):
+                for file, shaped in self.stream_source_files(shape_function, schema_files):
+                    entry, size, obj_base_name, definition = shaped
+                    key = 'schema:' + source_name(file)
+                    # add schema to cache
+                    logger.debug('Adding %s to schema cache', entry['source'])
+                    self.begin_source(key)
+                    self.queue_mongo_insert(entry, 'json_schema', size, entry['source'])
+                    self.end_source()
+
+                    if definition is not None:
+                        security_table.add_entry(obj_base_name, definition, key)
+                self.flush_mongo_writes()
+            with self.build_phase('security_table'):
+                self.write_security_table(security_table)
+        finally:
+            self.shutdown_parse_executor()
+            close_archives()
+
+    # returns the sources of the json schema files to cache from the schema bundle at zip_file_path
+    # and the local schema repository
+    def list_schema_sources(self, zip_file_path):
+        # only the json-schema folder of the bundle is read.  this folder holds all
+        # the released json schema files for the current version of the schema bundle
+        schema_sources = {}
+        for source in SourceTree('json-schema', zip_file_path).files(recursive=False):
+            schema_sources[posixpath.basename(source[1])] = source
+
+        # json schema from the local schema repository replace those from the bundle
+        if not self.config['local_schema_path'] == "":
+            local_path = self.resolve_path(self.config['local_schema_path']) + '/json'
+            for source in SourceTree(local_path).files(recursive=False):
+                schema_sources[os.path.basename(source)] = source
+        return list(schema_sources.values())
+
+    # returns the payload compressor of the compressed storage profile, or None if the payloads (the
+    # odata and metadata documents and the schema stored as json strings) are stored uncompressed
+    def payload_compressor(self):
+        if self.get_build_option('storage_profile', 'plain') == 'compressed':
+            return self.get_build_option('payload_compressor', 'zstd')
+        return None
+
+    # builds a self-contained schema closure for each versioned resource type in the schema cache
+    # and stores them in the json_schema_closure table, in the same format as the json_schema table.
+    # A payload can then be validated against a resource type with a single fetch.
+    def generate_schema_closures(self):
+        database = self.get_mongo_database()
+        schemas = {}
+        for entry in database['json_schema'].find({}, {'source': 1}):
+            schemas[entry['source']] = read_cached_schema(database, entry['source'])
+
+        closure_builder = SchemaClosureBuilder(schemas)
+        schema_storage = self.get_build_option('schema_storage', 'string')
+        compressor = self.payload_compressor()
+        closure_count = 0
+        for source in sorted(schemas):
+            closure = closure_builder.build(source)
+            if closure is None:
+                continue
+            size = store_schema(closure, closure.pop('schema'), schema_storage, compressor)
+            self.queue_mongo_insert(closure, 'json_schema_closure', size, source)
+            closure_count += 1
+        self.flush_mongo_writes()
+        logger.info('Generated %d schema closures', closure_count)
+
+    # returns the path of the compiled validator of each @odata.type used by the mockup (see
+    # ValidatorCodeGenerator).  Validators are cached in the validators folder of the artifact cache,
+    # keyed by the hash of the type's schema closure, so they are only generated again when a schema
+    # in the closure (or the generated code format, or the Python version) changes.  Missing
+    # validators are compiled in the parse worker pool.
+    def compile_validators(self):
+        database = self.get_mongo_database()
+        cache_dir = os.path.join(self.get_artifact_cache_dir(), 'validators')
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # each validator is keyed by a hash of its own schema closure, so changing a schema only
+        # regenerates the validators whose closures include it.  The schema are read as the
+        # closures refer to them, and types with the same closure share a validator.
+        closure_builder = SchemaClosureBuilder(CachedSchemaReader(database))
+        validator_paths = {}
+        missing = {}
+        cached_count = 0
+        for entry in database['odata_type_schema'].find({}, {'_id': 0, 'odata_type': 1, 'source': 1}):
+            if entry['source'] is None:
+                logger.warning('No schema found for @odata.type %s, its resources are not validated', entry['odata_type'])
+                continue
+            type_name = entry['odata_type'].split('.')[-1]
+            closure = closure_builder.build(entry['source'], type_name)
+            if closure is None:
+                logger.warning('%s does not define %s, resources of type %s are not validated',
+                               entry['source'], type_name, entry['odata_type'])
+                continue
+            key = hashlib.sha256(json.dumps([ValidatorCodeGenerator.format_version, closure['schema']],
+                                            sort_keys=True).encode('utf-8')).hexdigest()
+            path = os.path.join(cache_dir, '%s.%s.bin' % (key, sys.implementation.cache_tag))
+            validator_paths[entry['odata_type']] = path
+            if os.path.exists(path):
+                cached_count += 1
+            elif path not in missing:
+                missing[path] = (path, entry['odata_type'], closure['schema'])
+
+        for validator, path in self.stream_source_files(write_validator, list(missing.values())):
+            logger.debug('Compiled the validator of %s', validator[1])
+        logger.info('Compiled %d validators, %d found in the validator cache', len(missing), cached_count)
+        return validator_paths
+
+    # validates each resource of the mockup against the schema of its @odata.type and writes the
+    # violations found to the validation_report table (one document per resource that has
+    # violations) and, if the validation_report_file build option is set, to a json file.  With the
+    # "strict" validation build option, the build fails if any violation is found.
+    def validate_mockup(self):
+        database = self.get_mongo_database()
+        validator_paths = self.compile_validators()
+        max_violations = self.get_build_option('validation_max_violations', 100)
+        checked_count = 0
+        report_count = 0
+        violation_count = 0
+        examples = []
+        # the report entries are written to the validation_report table and streamed to a temporary
+        # file as they are found, so that only the counts are kept in memory
+        report_file = None
+        if self.get_build_option('validation_report_file', '') != '':
+            report_file = tempfile.TemporaryFile('w+', encoding='utf-8')
+        validate = functools.partial(validate_resource, validator_paths)
+        # only the resources whose @odata.type has a validator are read
+        resources = database['RedfishObject'].find({'_odata_full_type': {'$in': list(validator_paths)}}, {'_id': 0})
+        for data, violations in self.stream_source_files(validate, resources):
+            if violations is None:
+                continue
+            checked_count += 1
+            if not violations:
+                continue
+            entry = {'resource': data.get('_odata_id', data.get('@odata.id')), 'odata_type': data['@odata.type'],
+                     'violation_count': len(violations),
+                     'violations': [{'path': path, 'message': message} for path, message in violations[:max_violations]]}
+            if report_file is not None:
+                report_file.write((',\n    ' if report_count else '\n    ') +
+                                  json.dumps(entry, indent=2).replace('\n', '\n    '))
+            if len(examples) < 10:
+                examples.append((entry['resource'], violations[:3]))
+            self.queue_mongo_insert(entry, 'validation_report', key=entry['resource'])
+            report_count += 1
+            violation_count += len(violations)
+        self.flush_mongo_writes()
+
+        if report_file is not None:
+            # the file has the layout of json.dump with indent=2
+            report_path = self.resolve_path(self.get_build_option('validation_report_file', ''))
+            report_file.seek(0)
+            with open(report_path, 'w') as f:
+                f.write('{\n  "checked_resources": %d,\n  "violation_count": %d,\n  "resources": [' %
+                        (checked_count, violation_count))
+                for line in report_file:
+                    f.write(line)
+                f.write('\n  ]\n}' if report_count else ']\n}')
+            report_file.close()
+        logger.info('Validated %d resources, found %d violations in %d resources', checked_count,
+                    violation_count, report_count)
+        for resource_uri, violations in examples:
+            for path, message in violations:
+                logger.info('    %s %s : %s', resource_uri, path, message)
+        if violation_count and self.get_build_option('validation', 'off') == 'strict':
+            raise RuntimeError('Mockup validation found %d violations in %d resources' % (violation_count, report_count))
+
+    # generates the schema version index.  The json_schema_index table maps the (namespace, major,
+    # minor, errata) of each versioned schema in the cache to its schema file and marks the newest
+    # version of each namespace.  The odata_type_schema table maps each @odata.type used by the
+    # loaded mockup to the schema file it resolves to.  If the schema_versions build option is
+    # "latest_and_referenced", superseded schema versions that are not used by the mockup and are
+    # not referenced (directly or indirectly) by another kept schema are removed from the schema
+    # cache.
+    def generate_schema_version_index(self):
+        database = self.get_mongo_database()
+        sources = [entry['source'] for entry in database['json_schema'].find({}, {'source': 1})]
+        namespace_versions = {}
+        unversioned_sources = set()
+        for source in sources:
+            file_version = schema_file_version(source)
+            if file_version is None:
+                unversioned_sources.add(source)
+            else:
+                namespace_versions.setdefault(file_version[0], {})[file_version[1:]] = source
+        latest_sources = set(versions[max(versions)] for versions in namespace_versions.values())
+
+        # resolve the @odata.type of each resource in the mockup
+        odata_type_sources = {}
+        pipeline = [{'$group': {'_id': '$_odata_full_type', 'count': {'$sum': 1}}}]
+        for odata_type in database['RedfishObject'].aggregate(pipeline):
+            if not isinstance(odata_type['_id'], str):
+                continue
+            source = resolve_odata_type(odata_type['_id'], namespace_versions, unversioned_sources)
+            odata_type_sources[odata_type['_id']] = source
+            self.queue_mongo_insert({'odata_type': odata_type['_id'], 'source': source, 'resource_count': odata_type['count']},
+                                    'odata_type_schema', key=odata_type['_id'])
+
+        # find the schema to keep: the unversioned and latest schema, the schema used by the
+        # mockup, and all of the schema that these refer to.  An unversioned schema (e.g.
+        # Processor.json) refers to every version of its namespace with anyOf, so these references
+        # are not followed, or every version would be kept.
+        kept_sources = set(sources)
+        if self.get_build_option('schema_versions', 'all') == 'latest_and_referenced':
+            kept_sources = set()
+            pending = list(unversioned_sources | latest_sources |
+                           set(source for source in odata_type_sources.values() if source is not None))
+            while pending:
+                source = pending.pop()
+                if source in kept_sources or source not in sources:
+                    continue
+                kept_sources.add(source)
+                namespace = source.split('.')[0] if source in unversioned_sources else None
+                for ref in SchemaClosureBuilder.find_refs(read_cached_schema(database, source)):
+                    target = ref.partition('#')[0].split('/')[-1]
+                    if target == '' or target in kept_sources:
+                        continue
+                    target_version = schema_file_version(target)
+                    if target_version is not None and target_version[0] == namespace:
+                        continue
+                    pending.append(target)
+            removed_sources = sorted(set(sources) - kept_sources)
+            for source in removed_sources:
+                self.discard_document('json_schema', source, 'schema:' + source)
+            database['json_schema'].delete_many({'source': {'$in': removed_sources}})
+            logger.info('Removed %d superseded schema versions from the schema cache', len(removed_sources))
+
+        for namespace, versions in namespace_versions.items():
+            for (major, minor, errata), source in versions.items():
+                if source not in kept_sources:
+                    continue
+                self.queue_mongo_insert({'namespace': namespace, 'major': major, 'minor': minor, 'errata': errata,
+                                         'source': source, 'latest': source in latest_sources,
+                                         'odata_types': sorted(odata_type for odata_type, odata_type_source
+                                                               in odata_type_sources.items() if odata_type_source == source)},
+                                        'json_schema_index', key=source)
+        self.flush_mongo_writes()
+
+    # writes the rows of a SecurityTable to the privileges_table, along with the uri trie built from
+    # all of the rows in the table.  In an incremental build, the rows that are no longer generated
+    # are deleted before the trie is built.
+    def write_security_table(self, security_table):
+        for regex_uri, (result, source_key) in security_table.rows.items():
+            self.begin_source(source_key)
+            self.queue_mongo_insert(result, 'privileges_table', key=regex_uri)
+            self.end_source()
+        self.flush_mongo_writes()
+        if self.build_manifest is not None:
+            self.build_manifest.remove_stale_documents(['privileges_table'])
+
+        database = self.get_mongo_database()
+        trie = PrivilegeTrie(database['privileges_table'].find({}, {'_id': 0, 'uri': 1, 'Entity': 1, 'OperationMap': 1}))
+        self.queue_mongo_insert(trie.to_document(), 'privileges_trie', key='privileges_trie')
+        self.flush_mongo_writes()
+
+    # opens a MongoClient for the async build engine: the asyncio API of pymongo (AsyncMongoClient)
+    # if it is available, otherwise motor if it is installed.  None is returned if neither is
+    # available or if build_options.async_driver is "threads", in which case the async build engine
+    # runs the writes of the builder's (synchronous) client in threads.  The async client is opened
+    # from the mongo_client_url of the configuration.
+    def open_async_mongo_client(self):
+        mongo_client_url = self.credentials.get('mongo_creds', {}).get('mongo_client_url')
+        if self.get_build_option('async_driver', 'auto') == 'threads' or mongo_client_url is None:
+            return None
+        if hasattr(pymongo, 'AsyncMongoClient'):
+            return pymongo.AsyncMongoClient(mongo_client_url)
+        try:
+            import motor.motor_asyncio
+        except ImportError:
+            return None
+        return motor.motor_asyncio.AsyncIOMotorClient(mongo_client_url)
+
+    # builds the mockup, registry, schema cache and security table collections with the async build
+    # engine (see AsyncBuildPipeline)
+    def run_async_build(self):
+        try:
+            asyncio.run(AsyncBuildPipeline(self).run())
+        finally:
+            self.shutdown_parse_executor()
+            close_archives()
+
+    # returns the key of the sources of the registries, schema cache and security table of the
+    # build.  Builds with the same key can share the documents of prepare_shared_artifacts.
+    def shared_artifact_key(self):
+        redfish_creds = self.credentials['redfish_creds']
+        local_schema_path = self.config['local_schema_path']
+        if local_schema_path != '':
+            local_schema_path = self.resolve_path(local_schema_path)
+        return json.dumps([redfish_creds['mockup_url'] + redfish_creds['privilege_file_name'],
+                           self.credentials['schema_bundle_url'], local_schema_path,
+                           self.get_build_option('schema_storage', 'string'), self.payload_compressor()])
+
+    # downloads and parses the registries, schema cache and security table of the build, without
+    # writing them to the database, and returns them as SharedBuildArtifacts
+    def prepare_shared_artifacts(self):
+        shared = SharedBuildArtifacts()
+        try:
+            with self.build_phase('prepare_shared_artifacts'):
+                redfish_creds = self.credentials['redfish_creds']
+                zip_file_url = redfish_creds['mockup_url'] + redfish_creds['privilege_file_name'] + '.zip'
+                logger.info('Downloading the Mockups from Redfish Server : %s', zip_file_url)
+                registry_files = SourceTree('', self.fetch_artifact(zip_file_url)).iter_files('.json')
+                header_scan = self.get_build_option('registry_header_scan', True)
+                candidates = self.map_source_files(functools.partial(read_registry_candidate, header_scan), registry_files)
+                privileges_registry = None
+                for recent_file in select_latest_registries(candidates):
+                    table_name, data, versions = shape_registry_documents(recent_file)
+                    if table_name == 'PrivilegeRegistry':
+                        privileges_registry = data
+                    shared.add(table_name, data, shaped=True)
+                    shared.add('registry_versions', versions)
+
+                logger.info('Downloading the Schema Bundle from Redfish Server : %s', self.credentials["schema_bundle_url"])
+                schema_files = self.list_schema_sources(self.fetch_artifact(self.credentials["schema_bundle_url"]))
+                shape_function = functools.partial(shape_schema_entry, self.get_build_option('schema_storage', 'string'),
+                                                   self.payload_compressor())
+                security_table = SecurityTable(None, privileges_registry or {'Mappings': []})
+                for entry, size, obj_base_name, definition in self.map_source_files(shape_function, schema_files):
+                    shared.add('json_schema', entry)
+                    if definition is not None:
+                        security_table.add_entry(obj_base_name, definition)
+
+                rows = [result for result, source_key in security_table.rows.values()]
+                trie = PrivilegeTrie(rows)
+                for result in rows:
+                    shared.add('privileges_table', result)
+                shared.add('privileges_trie', trie.to_document())
+        finally:
+            self.shutdown_parse_executor()
+            close_archives()
+        logger.info('Prepared %d shared documents', shared.document_count())
+        return shared
+
+    # copies the documents of a SharedBuildArtifacts into the database
+    def copy_shared_artifacts(self, shared):
+        writer = self.get_bulk_writer()
+        for table, documents in shared.documents.items():
+            for document in documents:
+                writer.insert(table, document, len(document.raw))
+        self.flush_mongo_writes()
+
+    # creates the indexes listed in index_specs (and the "indexes" build option) on the collections
+    # that exist in the database, and reports the size and build time of each. The report is
+    # returned as a list of dictionaries.
+    def create_indexes(self):
+        database = self.get_mongo_database()
+        existing_collections = set(database.list_collection_names())
+        report = []
+        for spec in index_specs + self.get_build_option('indexes', []):
+            if spec['collection'] not in existing_collections:
+                continue
+            collection = database[spec['collection']]
+            keys = [(field, direction) for field, direction in spec['keys']]
+            start_time = time.perf_counter()
+            try:
+                index_name = collection.create_index(keys, unique=spec.get('unique', False))
+            except pymongo.errors.OperationFailure as e:
+                logger.warning('Unable to create index on %s %s : %s', spec['collection'], keys, e)
+                continue
+            report.append({'collection': spec['collection'], 'index': index_name,
+                           'build_seconds': time.perf_counter() - start_time})
+
+        # look up the size of each index
+        index_sizes = {}
+        for collection_name in set(entry['collection'] for entry in report):
+            # the sizes are only reported, so a server (or stand-in) without $collStats does not
+            # fail the build
+            try:
+                for stats in database[collection_name].aggregate([{'$collStats': {'storageStats': {}}}]):
+                    index_sizes[collection_name] = stats['storageStats'].get('indexSizes', {})
+            except (NotImplementedError, pymongo.errors.OperationFailure) as e:
+                logger.warning('Index sizes of %s are not available: %s', collection_name, e)
+        for entry in report:
+            entry['size_bytes'] = index_sizes.get(entry['collection'], {}).get(entry['index'])
+            logger.info('Index %-20s %-35s %10s bytes %8.3f s',
+                        entry['collection'], entry['index'], entry['size_bytes'], entry['build_seconds'])
+        return report
+
+    # exports all of the collections of the Redfish database, with their documents, collection
+    # options (e.g. the block compressor) and indexes, to a snapshot archive.  The archive is a zip
+    # file holding a manifest.json and, for each collection, a deflate-compressed member of
+    # concatenated BSON documents.  The manifest records the snapshot format version, and the count
+    # and the sha256 hash of the documents of each collection.
+    def export_database(self, snapshot_path):
+        database = self.get_mongo_database()
+        raw_options = bson.CodecOptions(document_class=bson.raw_bson.RawBSONDocument)
+        collection_options = {info['name']: info.get('options', {}) for info in database.list_collections()}
+        manifest = {'format_version': snapshot_format_version, 'created': time.time(),
+                    'database': database.name, 'artifacts': self.load_artifact_lockfile(), 'collections': {}}
+        temp_path = snapshot_path + '.tmp'
+        with ZipFile(temp_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+            for collection_name in sorted(collection_options):
+                if collection_name.startswith(('system.', self.get_build_option('staging_prefix', 'staging.'),
+                                               self.get_build_option('previous_prefix', 'previous.'))) or \
+                        collection_name == cutover_collection:
+                    continue
+                collection = database[collection_name]
+                member_name = 'collections/' + collection_name + '.bson'
+                sha256 = hashlib.sha256()
+                count = 0
+                size = 0
+                with archive.open(member_name, 'w', force_zip64=True) as f:
+                    for document in collection.with_options(codec_options=raw_options).find({}, batch_size=self.get_build_option('mongo_batch_size', 1000)):
+                        raw = document.raw if isinstance(document, bson.raw_bson.RawBSONDocument) else bson.encode(document)
+                        sha256.update(raw)
+                        f.write(raw)
+                        count += 1
+                        size += len(raw)
+                manifest['collections'][collection_name] = {
+                    'member': member_name, 'documents': count, 'bytes': size, 'sha256': sha256.hexdigest(),
+                    'options': collection_options[collection_name],
+                    'indexes': collection_index_specs(collection_name, collection)}
+                logger.info('Exported %-20s %8d documents %12d bytes', collection_name, count, size)
+            archive.writestr('manifest.json', json.dumps(manifest, indent=2))
+        os.replace(temp_path, snapshot_path)
+        logger.info('Wrote snapshot : %s', snapshot_path)
+        return manifest
+
+    # restores one collection of a snapshot archive into a database.  The documents are inserted in
+    # batches without being decoded, and their hash and count are checked against the manifest.
+    def restore_snapshot_collection(self, snapshot_path, database, collection_name, entry):
+        raw_options = bson.CodecOptions(document_class=bson.raw_bson.RawBSONDocument)
+        options = dict(entry['options'])
+        database.create_collection(collection_name, **options)
+        collection = database[collection_name]
+        batch_size = self.get_build_option('mongo_batch_size', 1000)
+        batch_bytes = self.get_build_option('mongo_batch_bytes', 8 * 1024 * 1024)
+        count = 0
+        with ZipFile(snapshot_path) as archive, archive.open(entry['member']) as f:
+            reader = HashingReader(f)
+            batch = []
+            size = 0
+            for document in bson.decode_file_iter(reader, raw_options):
+                batch.append(document)
+                size += len(document.raw)
+                if len(batch) >= batch_size or size >= batch_bytes:
+                    collection.insert_many(batch, ordered=False)
+                    count += len(batch)
+                    batch = []
+                    size = 0
+            if batch:
+                collection.insert_many(batch, ordered=False)
+                count += len(batch)
+            if reader.hexdigest() != entry['sha256'] or count != entry['documents']:
+                raise RuntimeError('Checksum mismatch for collection ' + collection_name + ' in ' + snapshot_path)
+        for spec in entry['indexes']:
+            collection.create_index([(field, direction) for field, direction in spec['keys']],
+                                    name=spec['name'], unique=spec.get('unique', False))
+        return count
+
+    # restores a snapshot archive written by export_database into the target database (or the named
+    # database), replacing its contents.  Every collection of the snapshot is checked against the
+    # manifest before the database is dropped, so a corrupt or mismatched snapshot leaves the
+    # database unchanged.  The collections are checked, and then restored, in parallel by
+    # build_options.restore_workers threads.
+    def restore_database(self, snapshot_path, database_name=None):
+        manifest = read_snapshot_manifest(snapshot_path)
+        if database_name is None:
+            database_name = self.database_name
+        client = self.get_mongo_client()
+        database = client[database_name]
+        start_time = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.get_build_option('restore_workers', 4)) as executor:
+            futures = [executor.submit(verify_snapshot_collection, snapshot_path, collection_name, entry)
+                       for collection_name, entry in manifest['collections'].items()]
+            for future in futures:
+                future.result()
+            logger.info('Verified snapshot %s in %.3f s', snapshot_path, time.perf_counter() - start_time)
+            client.drop_database(database_name)
+            futures = {executor.submit(self.restore_snapshot_collection, snapshot_path, database, collection_name, entry): collection_name
+                       for collection_name, entry in manifest['collections'].items()}
+            for future in concurrent.futures.as_completed(futures):
+                logger.info('Restored %-20s %8d documents', futures[future], future.result())
+        logger.info('Restored snapshot %s into %s in %.3f s', snapshot_path, database_name, time.perf_counter() - start_time)
+        return manifest
+
+    # starts a staged build.  The build writes to staging collections in the Redfish database (named
+    # with build_options.staging_prefix), while the server keeps reading the collections of the
+    # previous build.  Staging collections left by an earlier build are dropped.
+    def begin_staged_build(self):
+        self.flush_mongo_writes()
+        self.bulk_writer = None
+        self.collection_prefix = ''
+        database = self.get_mongo_database()
+        self.recover_staged_cutover()
+        staging_prefix = self.get_build_option('staging_prefix', 'staging.')
+        for name in database.list_collection_names():
+            if name.startswith(staging_prefix):
+                database.drop_collection(name)
+        self.collection_prefix = staging_prefix
+        logger.info('Building into the staging collections : %s*', staging_prefix)
+
+    # checks a staged build before it is cut over.  The collections that the server cannot work
+    # without must not be empty, no collection may have fewer than
+    # build_options.staging_min_document_ratio times the documents of the live collection it
+    # replaces, and every index in index_specs (and the "indexes" build option) must exist.  A
+    # RuntimeError listing the problems is raised if the check fails.  The document and index counts
+    # of the staged and live collections are returned.
+    def validate_staged_build(self):
+        live = self.get_mongo_client()[self.database_name]
+        staged = self.prefixed_database(live)
+        min_ratio = self.get_build_option('staging_min_document_ratio', 0.5)
+        staged_names = set(staged.list_collection_names())
+        live_names = set(live.list_collection_names())
+        problems = []
+        counts = {}
+        for name in sorted(staged_names):
+            staged_count = staged[name].count_documents({})
+            live_count = live[name].count_documents({}) if name in live_names else 0
+            counts[name] = {'documents': staged_count, 'live_documents': live_count,
+                            'indexes': len(staged[name].index_information())}
+            if staged_count < live_count * min_ratio:
+                problems.append('%s has %d documents, the live collection has %d' % (name, staged_count, live_count))
+            logger.info('Staged %-20s %8d documents (live %8d) %3d indexes', name, staged_count, live_count,
+                        counts[name]['indexes'])
+        for name in ['RedfishObject', 'json_schema', 'privileges_table', 'PrivilegeRegistry']:
+            if counts.get(name, {}).get('documents', 0) == 0:
+                problems.append(name + ' is empty')
+        for spec in index_specs + self.get_build_option('indexes', []):
+            if spec['collection'] not in staged_names:
+                continue
+            keys = [[field, direction] for field, direction in spec['keys']]
+            if not any([[field, direction] for field, direction in index['key']] == keys
+                       for index in staged[spec['collection']].index_information().values()):
+                problems.append('%s has no index on %s' % (spec['collection'], keys))
+        if problems:
+            raise RuntimeError('The staged build failed validation: ' + '; '.join(problems))
+        return counts
+
+    # replaces the live collections of the Redfish database with the collections of another
+    # generation (named with source_prefix), and keeps the live collections as the displaced
+    # generation (named with displaced_prefix, replacing it).  No documents are copied: each live
+    # collection is renamed aside and the collection of the source generation is renamed into its
+    # place, so the cutover (and a rollback) takes a few metadata operations for each collection,
+    # whatever the size of the database.  Between the two renames of a collection the server finds
+    # it missing for a moment, and the collections are replaced one after another, so the server
+    # can briefly read a mix of the two generations.  The cutover is recorded in the
+    # cutover_collection while it is in progress: if the process stops part way through, the next
+    # staged build (or rollback) completes it (see recover_staged_cutover).
+    def swap_collection_generations(self, database, source_prefix, displaced_prefix):
+        generation_prefixes = (self.get_build_option('staging_prefix', 'staging.'),
+                               self.get_build_option('previous_prefix', 'previous.'))
+        names = database.list_collection_names()
+        source = set(name[len(source_prefix):] for name in names if name.startswith(source_prefix))
+        live = set(name for name in names if not name.startswith(generation_prefixes + ('system.',))
+                   and name != cutover_collection)
+        cutover = {'_id': 'cutover', 'source_prefix': source_prefix, 'displaced_prefix': displaced_prefix,
+                   'source': sorted(source), 'live': sorted(live)}
+        database[cutover_collection].replace_one({'_id': 'cutover'}, cutover, upsert=True)
+        self.complete_cutover(database, cutover)
+
+    # renames the collections of a cutover (see swap_collection_generations).  Each step checks
+    # which collections exist, so an interrupted cutover is completed by calling this again.
+    def complete_cutover(self, database, cutover):
+        source_prefix = cutover['source_prefix']
+        displaced_prefix = cutover['displaced_prefix']
+        names = set(database.list_collection_names())
+        # the displaced generation is replaced by the live collections, so its collections that no
+        # live collection replaces are dropped
+        for name in names:
+            if name.startswith(displaced_prefix) and name[len(displaced_prefix):] not in cutover['live']:
+                database.drop_collection(name)
+        for name in sorted(set(cutover['source']) | set(cutover['live'])):
+            source_exists = source_prefix + name in names
+            # a live collection is renamed aside unless its replacement is already in place
+            if name in cutover['live'] and name in names and (source_exists or name not in cutover['source']):
+                database[name].rename(displaced_prefix + name, dropTarget=True)
+            if source_exists:
+                database[source_prefix + name].rename(name, dropTarget=True)
+        database[cutover_collection].delete_one({'_id': 'cutover'})
+
+    # completes a cutover that was interrupted (e.g. by the build process being stopped)
+    def recover_staged_cutover(self):
+        database = self.get_mongo_database()
+        cutover = database[cutover_collection].find_one({'_id': 'cutover'})
+        if cutover is None:
+            return
+        logger.warning('Completing an interrupted cutover from the %s collections', cutover['source_prefix'])
+        self.complete_cutover(database, cutover)
+
+    # completes a staged build: the staged collections are validated and then renamed into place.
+    # The collections they replace are renamed to build_options.previous_prefix (replacing those
+    # kept by the build before), so the cutover can be rolled back.
+    def finish_staged_build(self):
+        self.flush_mongo_writes()
+        self.bulk_writer = None
+        self.validate_staged_build()
+        staging_prefix = self.collection_prefix
+        self.collection_prefix = ''
+        self.swap_collection_generations(self.get_mongo_database(), staging_prefix,
+                                         self.get_build_option('previous_prefix', 'previous.'))
+        logger.info('Cut over to the staged build')
+
+    # rolls back the last cutover of a staged build: the previous collections are renamed back into
+    # place, and the collections they replace are kept as staging collections.
+    def rollback_staged_build(self):
+        database = self.get_mongo_database()
+        self.recover_staged_cutover()
+        previous_prefix = self.get_build_option('previous_prefix', 'previous.')
+        if not any(name.startswith(previous_prefix) for name in database.list_collection_names()):
+            raise RuntimeError('There is no previous build to roll back to')
+        self.swap_collection_generations(database, previous_prefix,
+                                         self.get_build_option('staging_prefix', 'staging.'))
+        logger.info('Rolled back to the previous build')
+
+    # sets the password of the Administrator account of the mockup
+    def set_administrator_password(self, password='test'):
+        administrator = {'_odata_type': 'ManagerAccount', 'UserName': 'Administrator'}
+        self.get_mongo_database()['RedfishObject'].update_one(administrator, {'$set': {'Password': password}})
+        refresh_etags(self.get_mongo_database()['RedfishObject'], administrator)
+
+    # builds the database with the build engine, storage profile and build mode (full, incremental
+    # or staged) selected by the build options, and returns the build metrics report.  If shared is
+    # given (see prepare_shared_artifacts), its registries, schema cache and security table are
+    # copied into the database in place of downloading and parsing them.
+    def build(self, shared=None):
+        incremental = self.get_build_option('incremental', False)
+        staged = self.get_build_option('staged', False)
+        if shared is not None and incremental:
+            logger.warning('Batch builds do not support incremental builds, building the full database')
+            incremental = False
+        if staged and incremental:
+            logger.warning('Incremental builds update the database in place, the staged build option is ignored')
+            staged = False
+
+        with self.build_phase('prepare_database'):
+            if incremental:
+                self.begin_incremental_build()
+            elif staged:
+                self.begin_staged_build()
+            else:
+                # drop the redfish database if it exists
+                self.get_mongo_client().drop_database(self.database_name)
+
+            # create the compressed payload collections before anything is written to them
+            self.create_storage_collections()
+
+        build_engine = self.get_build_option('build_engine', 'serial')
+        if build_engine == 'async' and incremental:
+            logger.warning('The async build engine does not support incremental builds, using the serial build engine')
+            build_engine = 'serial'
+        if shared is not None:
+            # load the mockup and copy the documents that were prepared once for the batch
+            with self.build_phase('mockups'):
+                self.download_and_initialize_redfish_mockups(registries=False)
+            with self.build_phase('shared_artifacts'):
+                self.copy_shared_artifacts(shared)
+        elif build_engine == 'async':
+            # load the mockup, registries, schema cache and security table at the same time
+            with self.build_phase('pipeline'):
+                self.run_async_build()
+        else:
+            # download the mockup from the specified uri and
+            # build the mongoDB database from the mockup.
+            with self.build_phase('mockups'):
+                self.download_and_initialize_redfish_mockups()
+
+            # initialize schema cache
+            with self.build_phase('schema_cache'):
+                self.generate_schema_cache_and_security_table()
+        if incremental:
+            # the documents of the sources removed since the last build are deleted before the
+            # schema version index and the other derived collections are built from the database
+            with self.build_phase('stale_documents'):
+                self.build_manifest.remove_stale_documents(exclude=derived_collections)
+        if self.get_build_option('scale_out', {}):
+            if incremental:
+                logger.warning('Incremental builds do not support the scale_out option, the mockup is not scaled out')
+            else:
+                with self.build_phase('scale_out'):
+                    self.scale_out_mockup()
+        with self.build_phase('schema_version_index'):
+            self.generate_schema_version_index()
+        if self.get_build_option('schema_closures', False):
+            with self.build_phase('schema_closures'):
+                self.generate_schema_closures()
+        if self.get_build_option('validation', 'off') != 'off':
+            with self.build_phase('validation'):
+                self.validate_mockup()
+
+        if incremental:
+            with self.build_phase('build_manifest'):
+                self.finish_incremental_build()
+
+        # create the indexes used by the server's queries
+        with self.build_phase('indexes'):
+            self.create_indexes()
+
+        # set the administrator account password
+        with self.build_phase('administrator_account'):
+            self.set_administrator_password()
+
+        if staged:
+            with self.build_phase('cutover'):
+                self.finish_staged_build()
+
+        if self.get_build_option('update_lockfile', False):
+            self.update_artifact_lockfile()
+
+        self.shutdown_parse_executor()
+        return self.metrics.report()
+
+    # writes the build metrics report files selected by the build options
+    def write_build_metrics(self):
+        metrics = self.metrics
+        metrics.record_top_allocations()
+        if self.get_build_option('metrics_file', '') != '':
+            metrics.write_json(self.resolve_path(self.get_build_option('metrics_file', '')))
+        if self.get_build_option('metrics_textfile', '') != '':
+            metrics.write_prometheus(self.resolve_path(self.get_build_option('metrics_textfile', '')))
+
+
+# The below function builds the database of each RedfishDbBuilder in a batch, with up to workers
+# builds running at the same time.  The registries, schema cache and security table are prepared
+# once for each distinct set of sources (see shared_artifact_key) and copied into every database
+# that uses them.  The build metrics reports are returned, keyed by database name.
+def run_batch_build(builders, workers=4):
+    database_names = [builder.database_name for builder in builders]
+    duplicates = sorted(set(name for name in database_names if database_names.count(name) > 1))
+    if duplicates:
+        raise ValueError('The builds of a batch must use different databases : %s' % ', '.join(duplicates))
+
+    shared_artifacts = {}
+    for builder in builders:
+        key = builder.shared_artifact_key()
+        if key not in shared_artifacts:
+            shared_artifacts[key] = builder.prepare_shared_artifacts()
+
+    reports = {}
+    failed = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(builder.build, shared_artifacts[builder.shared_artifact_key()]): builder
+                   for builder in builders}
+        for future in concurrent.futures.as_completed(futures):
+            database_name = futures[future].database_name
+            try:
+                reports[database_name] = future.result()
+            except Exception:
+                logger.exception('The build of %s failed', database_name)
+                failed.append(database_name)
+                continue
+            logger.info('Built %s in %.3f s', database_name, reports[database_name]['wall_seconds'])
+    if failed:
+        raise RuntimeError('The builds of %s failed' % ', '.join(sorted(failed)))
+    return reports
 
-# The below function inserts metadata file data into the database.
-def create_metadata_file_entry(mockup_dir_path):
-    if not os.path.exists(os.path.expanduser(mockup_dir_path + '/$metadata/index.xml')):
-        return
 
-    file = os.path.expanduser(mockup_dir_path + '/$metadata/index.xml')
-    with open(file, 'r') as f:
-        data = f.read()
-    execute_mongo_query({"data": data}, 'metadata_file')
-
-
-# the below function is used to insert Privilege Registry data into the database.
-def create_privilege_database(mockup_dir_path):
-    temp_privilege_registry_dir_name = 'privilegeRegistry'
-    os.makedirs(temp_privilege_registry_dir_name)
-    os.chdir(temp_privilege_registry_dir_name)
-    redfish_credentials = credentials['redfish_creds']
-    file_name = redfish_credentials['privilege_file_name']
-    zip_file_name = file_name + '.zip'
-    zip_file_url = redfish_credentials['mockup_url'] + zip_file_name
-    print('Downloading the Mockups from Redfish Server : ', zip_file_url)
-    wget.download(zip_file_url)
-    mockup_zip = ZipFile(zip_file_name)
-    mockup_zip.extractall()
-    mockup_zip.close()
-    curr_dir = mockup_dir_path + "/" + temp_privilege_registry_dir_name
-    initialize_message_registry_db(curr_dir)
-
-
-# The below function downloads the redfish mockup data if mockup_file_path is not specified in config.
-# If mockup_file_path is specified it reads json files from that path.
-def download_and_initialize_redfish_mockups():
-    destination_dir = os.getcwd()
-    if configJson["mockup_file_path"] == "":
-        temp_mockup_dir_name = "mockups"
-        redfish_creds = credentials['redfish_creds']
-        mockups_dir = destination_dir + '/' + temp_mockup_dir_name
-        file_name = redfish_creds['mockup_file_name']
-        zip_file_name = file_name + '.zip'
-        zip_file_url = redfish_creds['mockup_url'] + zip_file_name
-        print('Downloading the Mockups from Redfish Server : ', zip_file_url)
-        mockup_dir_name = redfish_creds['mockup_dir_name']
-        mockup_dir_path = mockups_dir + '/' + mockup_dir_name + '/'
-
-        print(mockup_dir_path)
-
-        if os.path.exists(mockups_dir):
-            shutil.rmtree(mockups_dir)
-
-        os.makedirs(mockups_dir)
-        os.chdir(mockups_dir)
-        wget.download(zip_file_url)
-        mockup_zip = ZipFile(zip_file_name)
-        mockup_zip.extractall()
-        mockup_zip.close()
-
-        initialize_db(mockup_dir_path)
-        create_odata_file_entry(mockup_dir_path)
-        create_metadata_file_entry(mockup_dir_path)
-
-        # PrivilegeRegistry
-        create_privilege_database(mockups_dir)
-        print(mockups_dir)
-        os.chdir(destination_dir)
-        # remove mockup dir
-        if os.path.exists(mockups_dir):
-            shutil.rmtree(mockups_dir)
-    else:
-        initialize_db(configJson["mockup_file_path"])
-        create_odata_file_entry(configJson["mockup_file_path"])
-        create_metadata_file_entry(configJson["mockup_file_path"])
-        temp_mockup_dir_name = "mockups"
-        mockups_dir = destination_dir + '/' + temp_mockup_dir_name
-
-        if os.path.exists(mockups_dir):
-            shutil.rmtree(mockups_dir)
-
-        os.makedirs(mockups_dir)
-        os.chdir(mockups_dir)
-
-        create_privilege_database(mockups_dir)
-        os.chdir(destination_dir)
-
-        # remove mockup dir
-        if os.path.exists(mockups_dir):
-            shutil.rmtree(mockups_dir)
-
-    os.chdir(destination_dir)
-
-
-# The below function loads the config file
-def load_config_json_file():
-    global configJson
-    global credentials
-    with open("config.json", 'r') as f:
-        configJson = json.load(f)
-    credentials = configJson['credentials']
-
-
-# This function generates a cache of schema metadata within the mongodb database
-# The cache lets the server validate post/patch information against the schema
-# prior to making modifications to the data served.
-def generate_schema_cache_and_security_table():
-    # create a temporary folder
-    start_directory = os.getcwd()
-    if os.path.exists("./_sb_temp"):
-        shutil.rmtree('./_sb_temp')
-    os.makedirs("./_sb_temp")
-    os.chdir('./_sb_temp')
-
-    # download the schema bundle from the specified URL
-    print('Downloading the Schema Bundle from Redfish Server : ', credentials["schema_bundle_url"])
-    wget.download(credentials["schema_bundle_url"])
-
-    # unzip the schema bundle
-    zip_file_name = credentials["schema_bundle_url"].split('/')[-1]
-    bundle_zip = ZipFile(zip_file_name)
-    bundle_zip.extractall()
-    bundle_zip.close()
-
-    # change folders to the json-schema subfolder of the bundle
-    # this folder holds all the released json schema files for the
-    # current version of the schema bundle
-    os.chdir('./json-schema')
-
-    # copy json schema from local schema repository
-    if not configJson['local_schema_path'] == "":
-        local_path = os.path.expanduser(configJson['local_schema_path']) + '/json'
-        for filename in os.listdir(local_path):
-            if os.path.exists(filename):
-                os.remove(filename)
-            shutil.copy(local_path + "/" + filename, filename)
-
-    # loop for each json file in the folder
-    for filename in os.listdir():
-        # load the file into a dictionary
-        with open(filename) as jsonfile:
-            schema_dict = json.load(jsonfile)
-            objname = filename
-            entry = {'source': objname, 'schema': json.dumps(schema_dict)}
-
-            # add schema to cache
-            print('Adding ' + filename + ' to schema cache')
-            execute_mongo_query(entry, 'json_schema')
-
-            obj_base_name = objname.split('.')[0]
-            if "definitions" in schema_dict and obj_base_name in schema_dict['definitions']:
-                create_security_table_entry(obj_base_name, schema_dict['definitions'][obj_base_name])
-
-    # remove the temporary folder
-    os.chdir(start_directory)
-    shutil.rmtree('./_sb_temp')
-
-
-def create_security_table_entry(name, json_obj):
-    if 'uris' not in json_obj:
-        return
+# The below function loads a configuration file (config.json)
+def load_config_json_file(config_path):
+    with open(config_path, 'r') as f:
+        return json.load(f)
 
-    mongo_client_url, mongo_database = get_mongo_creds()
-    mongo_client = pymongo.MongoClient(mongo_client_url)
-    database = mongo_client[mongo_database]
-    collection = database['privileges_table']
 
-    # find the security permissions for the object
-    privileges_registry = database['PrivilegeRegistry'].find_one({})
-    mappings = privileges_registry['Mappings']
-    for mapping in mappings:
-        if mapping['Entity'] == name:
-            # search for any uris associated with this object
-            for uri in json_obj['uris']:
-                # replace any wildcard fields with regular expression syntax
-                # check to see if the uri exists in the security table
-                regex_uri = re.sub('{[^}]+}', '[^\/]+', uri)
+# the command line arguments that are not build options: the configuration files, and the one-shot
+# actions that are run instead of a build
+command_line_actions = ('config', 'batch', 'export', 'restore', 'rollback')
 
-                result = {'uri': regex_uri, 'Entity': name, 'OperationMap': mapping['OperationMap']}
 
-                # overwrite any previous operation map
-                collection.insert_one(result)
+# The below function copies the options given on the command line over the build options of a
+# configuration.  The actions in command_line_actions are not copied, so they do not end up in the
+# build metrics or reports.
+def apply_command_line_options(config, args):
+    build_options = config.setdefault('build_options', {})
+    for name, value in vars(args).items():
+        if value is not None and name not in command_line_actions:
+            build_options[name] = value
 
 
 # The below function is the entry point of this file
 if __name__ == "__main__":
-    # load the configuration switches from the configuration file
-    load_config_json_file()
-
-    # drop the redfish database if it exists
-    os.system('mongosh RedfishDB --eval "printjson(db.dropDatabase())"')
-
-    # download the mockup from the specified uri and
-    # build the mongoDB database from the mockup.
-    download_and_initialize_redfish_mockups()
-
-    # initialize schema cache
-    generate_schema_cache_and_security_table()
-
-    # set the administrator account password
-    os.system(
-        'mongosh RedfishDB --eval "db.RedfishObject.updateOne({_odata_type:\'ManagerAccount\', ' +
-        'UserName:\'Administrator\'},{\'\$set\':{Password:\'test\'}})"')
+    parser = argparse.ArgumentParser(description='Build the Redfish server database.')
+    parser.add_argument('--config', default='config.json',
+                        help='the path of the configuration file.  Relative paths within it are relative to its folder')
+    parser.add_argument('--incremental', action='store_true', default=None,
+                        help='update only the documents whose sources have changed since the last incremental build')
+    parser.add_argument('--offline', action='store_true', default=None,
+                        help='use only previously downloaded artifacts from the artifact cache')
+    parser.add_argument('--update-lockfile', action='store_true', default=None,
+                        help='record the hashes of the downloaded artifacts in the artifact lockfile')
+    parser.add_argument('--log-level', default=None, choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='the level of the messages that are logged')
+    parser.add_argument('--profile-file', default=None,
+                        help='profile the build with cProfile and write the statistics to this file')
+    parser.add_argument('--trace-memory', action='store_true', default=None,
+                        help='trace the memory allocated by each build phase with tracemalloc')
+    parser.add_argument('--build-engine', default=None, choices=['serial', 'async'],
+                        help='run the build phases one after another (serial) or overlap them (async)')
+    parser.add_argument('--memory-limit-mb', type=int, default=None, metavar='MB',
+                        help='limit the memory used by the build to this many megabytes, failing the build if it is exceeded')
+    parser.add_argument('--staged', action='store_true', default=None,
+                        help='build into staging collections and cut over to them once they are validated')
+    parser.add_argument('--validation', default=None, choices=['off', 'report', 'strict'],
+                        help='validate the mockup against the schema and report (or fail the build on) any violations')
+    snapshot_commands = parser.add_mutually_exclusive_group()
+    snapshot_commands.add_argument('--export', default=None, metavar='SNAPSHOT',
+                                   help='export the built database to a snapshot archive instead of building it')
+    snapshot_commands.add_argument('--restore', default=None, metavar='SNAPSHOT',
+                                   help='restore the database from a snapshot archive instead of building it')
+    snapshot_commands.add_argument('--rollback', action='store_true', default=None,
+                                   help='roll back the last cutover of a staged build instead of building')
+    snapshot_commands.add_argument('--batch', nargs='+', default=None, metavar='CONFIG',
+                                   help='build the database of each configuration file at the same time, sharing the '
+                                        'registries, schema cache and security table')
+    args = parser.parse_args()
+
+    # build the database of each configuration file of a batch
+    if args.batch is not None:
+        batch_configs = [load_config_json_file(config_path) for config_path in args.batch]
+        for batch_config in batch_configs:
+            apply_command_line_options(batch_config, args)
+        logging.basicConfig(level=batch_configs[0]['build_options'].get('log_level', 'INFO'),
+                            format='%(asctime)s %(levelname)-7s %(message)s')
+        builders = [RedfishDbBuilder(batch_config, work_dir=os.path.dirname(os.path.abspath(config_path)))
+                    for batch_config, config_path in zip(batch_configs, args.batch)]
+        try:
+            run_batch_build(builders, builders[0].get_build_option('batch_workers', 4))
+            for builder in builders:
+                builder.write_build_metrics()
+        finally:
+            for builder in builders:
+                builder.close()
+        parser.exit()
 
+    # load the configuration switches from the configuration file
+    config = load_config_json_file(args.config)
+    apply_command_line_options(config, args)
+    logging.basicConfig(level=config['build_options'].get('log_level', 'INFO'),
+                        format='%(asctime)s %(levelname)-7s %(message)s')
+
+    with RedfishDbBuilder(config, work_dir=os.path.dirname(os.path.abspath(args.config))) as builder:
+        # export or restore a snapshot of the database, or roll back a staged build
+        if args.export is not None:
+            builder.export_database(args.export)
+        elif args.restore is not None:
+            builder.restore_database(args.restore)
+        elif args.rollback:
+            builder.rollback_staged_build()
+        else:
+            profiler = None
+            if builder.get_build_option('profile_file', '') != '':
+                profiler = cProfile.Profile()
+                profiler.enable()
+
+            builder.build()
+
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(builder.resolve_path(builder.get_build_option('profile_file', '')))
+                logger.info('Wrote profile : %s', builder.get_build_option('profile_file', ''))
+            builder.write_build_metrics()